@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Form, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
 from .validations import SubmitOrderForm
 from app.model.checkout_options import CheckoutOptionsV2
 from app.services.varaint_service import VariantService
@@ -7,6 +8,7 @@ from app.services.scrape_cart_service import ScrapeCartService
 from app.services.delete_product_service import DeleteProductService
 from app.services.checkout_service import CheckoutService
 from app.repositories.postgresql_db import PostgresRepo
+from app.utils.playwright_utils import PlaywrightUtils
 from app.dependencies import (
     get_varaint_service,
     get_add_cart_service,
@@ -14,7 +16,19 @@ from app.dependencies import (
     get_delete_product_service,
     get_checkout_service,
     get_postgres_repo,
+    get_playwright_utils,
+    get_admission_controller,
+    get_cart_affinity,
+    get_request_metrics,
+    browser_admission,
 )
+from app.utils.admission import AdmissionController
+from app.utils.step_timing import StepTimer
+from app.utils.metrics import RequestMetrics, render_metrics
+from app.utils.tracing import tracer
+from app.utils.cart_affinity import CartAffinity
+from app.utils.storage_state_codec import StorageStateCodec
+from app.handlers.handler_factory import HandlerFactory
 import uuid
 from datetime import datetime
 
@@ -49,6 +63,7 @@ async def delete_cart(cart_id: str, psql: PostgresRepo = Depends(get_postgres_re
     return cart
 
 
+# The browser tier of the lookup takes its admission slot itself, the HTTP tier does not need one
 @router.get("/variations", status_code=status.HTTP_200_OK)
 async def variations(
     product_url: str = Query(None),
@@ -114,7 +129,7 @@ async def delete_order(order_id: str, psql: PostgresRepo = Depends(get_postgres_
     return order
 
 
-@router.get("/carts/{cart_id}/verify", status_code=status.HTTP_200_OK)
+@router.get("/carts/{cart_id}/verify", status_code=status.HTTP_200_OK, dependencies=[Depends(browser_admission("verify_cart"))])
 async def get_cart_data(
     cart_id: str,
     service: ScrapeCartService = Depends(get_scrape_cart_service),
@@ -145,7 +160,7 @@ async def proceed_to_checkout(
         psql.close_session(session)
 
 
-@router.get("/carts/{cart_id}/checkout-options", status_code=status.HTTP_200_OK)
+@router.get("/carts/{cart_id}/checkout-options", status_code=status.HTTP_200_OK, dependencies=[Depends(browser_admission("checkout_options"))])
 async def user_selectable_checkout(
     cart_id: str,
     checkout_service: CheckoutService = Depends(get_checkout_service),
@@ -181,7 +196,7 @@ async def submit_order(
     finally:
         psql.close_session(session)
 
-@router.get("/carts/{cart_id}/checkout-options-v2", status_code=status.HTTP_200_OK)
+@router.get("/carts/{cart_id}/checkout-options-v2", status_code=status.HTTP_200_OK, dependencies=[Depends(browser_admission("checkout_options"))])
 async def user_selectable_checkout_v2(
     cart_id: str,
     checkout_service: CheckoutService = Depends(get_checkout_service),
@@ -209,3 +224,64 @@ async def submit_order_v2(
         return response
     finally:
         psql.close_session(session)
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_stats(
+    playwright_utils: PlaywrightUtils = Depends(get_playwright_utils),
+    admission_controller: AdmissionController = Depends(get_admission_controller),
+    cart_affinity: CartAffinity = Depends(get_cart_affinity),
+    psql: PostgresRepo = Depends(get_postgres_repo),
+    variant_service: VariantService = Depends(get_varaint_service),
+):
+    return {
+        "playwright": playwright_utils.stats(),
+        "variation_fetchers": variant_service.stats(),
+        "steps": StepTimer.stats(),
+        "tracing": tracer.stats(),
+        "handlers": HandlerFactory.get_registry().stats(),
+        "admission": admission_controller.stats() if admission_controller else None,
+        "cart_locks": psql.cart_locks.stats(),
+        "cart_affinity": cart_affinity.stats() if cart_affinity else None,
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    playwright_utils: PlaywrightUtils = Depends(get_playwright_utils),
+    request_metrics: RequestMetrics = Depends(get_request_metrics),
+    psql: PostgresRepo = Depends(get_postgres_repo),
+    variant_service: VariantService = Depends(get_varaint_service),
+):
+    """
+    Prometheus metrics of the service, in the text exposition format.
+    """
+    return PlainTextResponse(
+        render_metrics(request_metrics, playwright_utils, psql.engine, variant_service.stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@router.get("/stats/storage-state", status_code=status.HTTP_200_OK)
+async def get_storage_state_report(limit: int = Query(100), psql: PostgresRepo = Depends(get_postgres_repo)):
+    """
+    Stored size of the active carts' storage states, and their size once encoded by their bot codec.
+    """
+    session = psql.create_session()
+    try:
+        carts = []
+        for cart in await psql.get_active_carts(session, limit):
+            codec = None
+            if cart.products:
+                try:
+                    codec = HandlerFactory.get_bot_handler(cart.products[0].product_url).storage_state_codec
+                except ValueError:
+                    pass
+            carts.append({"cart_id": str(cart.id), **StorageStateCodec.size_report(cart.session_storage, codec)})
+        return {
+            "carts": carts,
+            "stored_bytes": sum(cart["stored_bytes"] for cart in carts),
+            "encoded_bytes": sum(cart.get("encoded_bytes", cart["stored_bytes"]) for cart in carts),
+        }
+    finally:
+        psql.close_session(session)
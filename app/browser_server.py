@@ -0,0 +1,63 @@
+"""
+Standalone browser server the API workers connect to when BROWSER_WS_ENDPOINT is set.
+
+Runs the Playwright driver 'run-server' command, which launches one Chromium per connected
+client, and restarts it if it exits. Start it with:
+
+    python -m app.browser_server --host 0.0.0.0 --port 3000
+
+and point the API at it with BROWSER_WS_ENDPOINT=ws://<host>:3000/
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from playwright._impl._driver import compute_driver_executable, get_driver_env
+
+
+def build_command(host: str, port: int, path: str, max_clients: int):
+    command = [*compute_driver_executable(), "run-server", "--host", host, "--port", str(port), "--path", path]
+    if max_clients:
+        command += ["--max-clients", str(max_clients)]
+    return command
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Playwright browser server for the API workers")
+    parser.add_argument("--host", default=os.getenv("BROWSER_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("BROWSER_SERVER_PORT", "3000")))
+    parser.add_argument("--path", default=os.getenv("BROWSER_SERVER_PATH", "/"))
+    parser.add_argument("--max-clients", type=int, default=int(os.getenv("BROWSER_SERVER_MAX_CLIENTS", "0")))
+    args = parser.parse_args()
+
+    command = build_command(args.host, args.port, args.path, args.max_clients)
+    stopping = False
+    process = None
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        if process and process.poll() is None:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while not stopping:
+        print(f"Starting browser server on ws://{args.host}:{args.port}{args.path}")
+        started_at = time.monotonic()
+        process = subprocess.Popen(command, env=get_driver_env())
+        return_code = process.wait()
+        if stopping:
+            break
+        print(f"Browser server exited with code {return_code}, restarting it")
+        # Avoid a tight restart loop when the server cannot start at all
+        if time.monotonic() - started_at < 5:
+            time.sleep(5)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
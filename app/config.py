@@ -1,4 +1,6 @@
+import json
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,6 +10,92 @@ class Config:
     SELECTORS_PATH = os.getenv("SELECTORS_PATH")
     POSTGRES_CONN = os.getenv("POSTGRES_CONN")
 
+    # Browser supervisor: number of browsers and when to recycle one
+    BROWSER_INSTANCES = int(os.getenv("BROWSER_INSTANCES", "1"))
+    MAX_CONTEXTS_PER_BROWSER = int(os.getenv("MAX_CONTEXTS_PER_BROWSER", "200"))
+    BROWSER_RSS_LIMIT_MB = int(os.getenv("BROWSER_RSS_LIMIT_MB", "600"))
+    BROWSER_HEALTH_INTERVAL = float(os.getenv("BROWSER_HEALTH_INTERVAL", "10"))
+
+    # Per-cart serialization: how long to wait for a busy cart and what to do with
+    # identical concurrent requests (wait, coalesce or reject)
+    CART_LOCK_TIMEOUT = float(os.getenv("CART_LOCK_TIMEOUT", "30"))
+    CART_LOCK_DUPLICATES = os.getenv("CART_LOCK_DUPLICATES", "coalesce")
+
+    # Remote browser server (see app/browser_server.py), empty to launch browsers in process.
+    # Several comma separated endpoints are spread across the browser instances.
+    BROWSER_WS_ENDPOINTS = [url.strip() for url in os.getenv("BROWSER_WS_ENDPOINT", "").split(",") if url.strip()]
+    BROWSER_CONNECT_MODE = os.getenv("BROWSER_CONNECT_MODE", "playwright")  # playwright or cdp
+    BROWSER_CONNECT_TIMEOUT = float(os.getenv("BROWSER_CONNECT_TIMEOUT", "30"))
+    BROWSER_CONNECT_RETRIES = int(os.getenv("BROWSER_CONNECT_RETRIES", "5"))
+
+    # Static asset cache shared by all contexts, a size of 0 disables it
+    ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "/tmp/uni-asset-cache")
+    ASSET_CACHE_MAX_MB = int(os.getenv("ASSET_CACHE_MAX_MB", "256"))
+
+    # Warm browser context pool, a size of 0 disables it
+    CONTEXT_POOL_SIZE = int(os.getenv("CONTEXT_POOL_SIZE", "4"))
+    CONTEXT_POOL_MAX_USES = int(os.getenv("CONTEXT_POOL_MAX_USES", "50"))
+    CONTEXT_POOL_LEASE_TIMEOUT = float(os.getenv("CONTEXT_POOL_LEASE_TIMEOUT", "30"))
+
+    # Admission control in front of browser work, a limit of 0 disables it
+    ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", str(CONTEXT_POOL_SIZE or 4)))
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    # Priority classes as JSON (see DEFAULT_PRIORITY_CLASSES in app/utils/admission.py), empty for the defaults
+    ADMISSION_CLASSES = json.loads(os.getenv("ADMISSION_CLASSES") or "null")
+    ADMISSION_STARVATION_AFTER = float(os.getenv("ADMISSION_STARVATION_AFTER", "5"))
+
+    # Pre-warmed dispensary menu pages, a maximum of 0 disables them
+    HOT_DISPENSARIES = [url.strip() for url in os.getenv("HOT_DISPENSARIES", "").split(",") if url.strip()]
+    WARM_PAGES_MAX = int(os.getenv("WARM_PAGES_MAX", "4"))
+    WARM_PAGES_MAX_AGE = float(os.getenv("WARM_PAGES_MAX_AGE", "300"))
+    WARM_PAGES_REFRESH_INTERVAL = float(os.getenv("WARM_PAGES_REFRESH_INTERVAL", "60"))
+
+    # Auto-dismiss the benign modals declared in the selectors' modal_watchers instead of waiting for them
+    MODAL_WATCHERS = os.getenv("MODAL_WATCHERS", "true").lower() in ("true", "1", "t", "y", "yes")
+
+    # Scrape variants and cart items in one page.evaluate using the selectors' extraction field maps
+    DOM_EXTRACTION = os.getenv("DOM_EXTRACTION", "true").lower() in ("true", "1", "t", "y", "yes")
+
+    # Read product and cart data from the storefront API responses declared in the selectors' response_capture
+    RESPONSE_CAPTURE = os.getenv("RESPONSE_CAPTURE", "true").lower() in ("true", "1", "t", "y", "yes")
+
+    # Time the named handler steps (navigation, initial checks, variant selection...) per bot and dispensary domain
+    STEP_TIMING = os.getenv("STEP_TIMING", "true").lower() in ("true", "1", "t", "y", "yes")
+
+    # Tracing of the requests (routes, services, handler steps, navigations, SQL): exporter (off, file or otlp),
+    # where it exports and the share of the new traces sampled
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "off")
+    TRACING_FILE = os.getenv("TRACING_FILE", "/tmp/uni-traces.jsonl")
+    TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    TRACING_FLUSH_INTERVAL = float(os.getenv("TRACING_FLUSH_INTERVAL", "5"))
+    TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "uni-wtb")
+
+    # Serve /variations over plain HTTP (see the selectors' http_fetch) before rendering the page in a browser,
+    # with a pool of keep-alive connections of at most HTTP_FETCH_MAX_CONNECTIONS per upstream host
+    HTTP_FETCH = os.getenv("HTTP_FETCH", "true").lower() in ("true", "1", "t", "y", "yes")
+    HTTP_FETCH_TIMEOUT = float(os.getenv("HTTP_FETCH_TIMEOUT", "5"))
+    HTTP_FETCH_MAX_CONNECTIONS = int(os.getenv("HTTP_FETCH_MAX_CONNECTIONS", "10"))
+    HTTP_FETCH_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_FETCH_KEEPALIVE_EXPIRY", "30"))
+
+    # Quiet window (no DOM mutation, no request in flight) after which a page counts as settled
+    SETTLE_QUIET_MS = int(os.getenv("SETTLE_QUIET_MS", "250"))
+
+    # Sticky per-cart browser sessions kept between API calls, a maximum of 0 disables them
+    CART_SESSION_MAX = int(os.getenv("CART_SESSION_MAX", "0"))
+    CART_SESSION_TTL = float(os.getenv("CART_SESSION_TTL", "120"))
+
+    # Cart affinity across API nodes: off, forward (proxy to the node owning the cart) or redirect
+    # (307 hint). Nodes advertise NODE_ADDRESS, an address reachable by the other nodes.
+    CART_AFFINITY_MODE = os.getenv("CART_AFFINITY_MODE", "off")
+    CART_AFFINITY_VNODES = int(os.getenv("CART_AFFINITY_VNODES", "64"))
+    CART_AFFINITY_FORWARD_TIMEOUT = float(os.getenv("CART_AFFINITY_FORWARD_TIMEOUT", "120"))
+    NODE_ID = os.getenv("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+    NODE_ADDRESS = os.getenv("NODE_ADDRESS") or f"http://{socket.gethostname()}:{os.getenv('APP_PORT', '8000')}"
+    NODE_HEARTBEAT_INTERVAL = float(os.getenv("NODE_HEARTBEAT_INTERVAL", "5"))
+    NODE_TTL = float(os.getenv("NODE_TTL", "15"))
+
     # Detect if we are on AWS
     if os.getenv("AWS_EXECUTION_ENV") is not None:
         # Import boto3 solely if we are into AWS environment
@@ -4,8 +4,15 @@ from app.services.scrape_cart_service import ScrapeCartService
 from app.services.delete_product_service import DeleteProductService
 from app.services.varaint_service import VariantService
 from app.repositories.postgresql_db import PostgresRepo
+from app.repositories.node_registry import NodeRegistry
 from app.utils.playwright_utils import PlaywrightUtils
+from app.utils.admission import AdmissionController, admission_slot
+from app.utils.cart_affinity import CartAffinity
+from app.utils.metrics import RequestMetrics
 from app.handlers.handler_factory import HandlerFactory
+from app.handlers.handler_registry import HandlerRegistry
+from app.fetchers.browser_fetcher import BrowserFetcher
+from app.fetchers.http_fetcher import HttpFetcher
 from app.config import Config
 from app.services.selectors_service import SelectorsService
 
@@ -15,22 +22,66 @@ def initialize_services():
 
     # Load selectors once when app starts
     SelectorsService.load_all_selectors(directory=config.SELECTORS_PATH)
+    # One validated, shared handler per bot
+    HandlerFactory.registry = HandlerRegistry()
 
     # Initialize other blocks
-    postgres_repo = PostgresRepo(config.POSTGRES_CONN)
-    playwright_utils = PlaywrightUtils()
+    postgres_repo = PostgresRepo(
+        config.POSTGRES_CONN,
+        cart_lock_timeout=config.CART_LOCK_TIMEOUT,
+        cart_lock_duplicates=config.CART_LOCK_DUPLICATES,
+    )
     handler_factory = HandlerFactory()
+    playwright_utils = PlaywrightUtils(handler_factory)
+    admission_controller = None
+    if config.ADMISSION_LIMIT > 0:
+        admission_controller = AdmissionController(
+            config.ADMISSION_LIMIT,
+            queue_size=config.ADMISSION_QUEUE_SIZE,
+            queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+            classes=config.ADMISSION_CLASSES,
+            starvation_after=config.ADMISSION_STARVATION_AFTER,
+        )
+    cart_affinity = None
+    if config.CART_AFFINITY_MODE != "off":
+        registry = NodeRegistry(
+            postgres_repo.engine,
+            config.NODE_ID,
+            config.NODE_ADDRESS,
+            heartbeat_interval=config.NODE_HEARTBEAT_INTERVAL,
+            ttl=config.NODE_TTL,
+        )
+        cart_affinity = CartAffinity(
+            registry,
+            mode=config.CART_AFFINITY_MODE,
+            vnodes=config.CART_AFFINITY_VNODES,
+            forward_timeout=config.CART_AFFINITY_FORWARD_TIMEOUT,
+        )
+
+    # /variations tiers: plain HTTP first, then the browser, which takes an admission slot
+    variation_fetchers = [BrowserFetcher(playwright_utils, admission_controller)]
+    if config.HTTP_FETCH:
+        http_fetcher = HttpFetcher(
+            timeout=config.HTTP_FETCH_TIMEOUT,
+            max_connections=config.HTTP_FETCH_MAX_CONNECTIONS,
+            keepalive_expiry=config.HTTP_FETCH_KEEPALIVE_EXPIRY,
+        )
+        variation_fetchers.insert(0, http_fetcher)
 
     # Service instances
-    varaint_service = VariantService(playwright_utils, handler_factory)
-    add_cart_service = AddCartService(postgres_repo, playwright_utils, handler_factory)
+    varaint_service = VariantService(playwright_utils, handler_factory, variation_fetchers)
+    # Services working under a cart lock take their admission slot once holding it
+    add_cart_service = AddCartService(postgres_repo, playwright_utils, handler_factory, admission_controller)
     scrape_cart_service = ScrapeCartService(postgres_repo, playwright_utils, handler_factory)
-    checkout_service = CheckoutService(postgres_repo, playwright_utils, handler_factory)
-    delete_product_service = DeleteProductService(postgres_repo, playwright_utils, handler_factory)
+    checkout_service = CheckoutService(postgres_repo, playwright_utils, handler_factory, admission_controller)
+    delete_product_service = DeleteProductService(postgres_repo, playwright_utils, handler_factory, admission_controller)
 
     return {
         "postgres_repo": postgres_repo,
         "playwright_utils": playwright_utils,
+        "admission_controller": admission_controller,
+        "cart_affinity": cart_affinity,
+        "request_metrics": RequestMetrics(),
         "varaint_service": varaint_service,
         "add_cart_service": add_cart_service,
         "delete_product_service" : delete_product_service,
@@ -56,6 +107,25 @@ async def get_postgres_repo():
 async def get_playwright_utils():
     return (await get_services())["playwright_utils"]
 
+async def get_admission_controller():
+    return (await get_services())["admission_controller"]
+
+async def get_cart_affinity():
+    return (await get_services())["cart_affinity"]
+
+async def get_request_metrics():
+    return (await get_services())["request_metrics"]
+
+def browser_admission(operation: str):
+    """
+    Route dependency holding an admission slot while the request does browser work. The
+    services running their work under a cart lock take theirs once holding the lock instead.
+    """
+    async def admit():
+        async with admission_slot(await get_admission_controller(), operation):
+            yield
+    return admit
+
 async def get_varaint_service():
     return (await get_services())["varaint_service"]
 
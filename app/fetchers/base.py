@@ -0,0 +1,61 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+from app.handlers.base_handler import BaseHandlerRefactor
+from app.utils.tracing import tracer
+
+
+class FetchFailed(Exception):
+    """
+    Raised by a tier that could not reach or read its source, the next tier is tried.
+    """
+
+
+class VariationFetcher(ABC):
+    """
+    One tier of the /variations lookup. VariantService asks its fetchers in order, the
+    first one returning variations serves the request, None hands it to the next tier.
+    """
+
+    name = "fetcher"
+
+    def __init__(self):
+        self.served = 0
+        self.missed = 0
+        self.failed = 0
+        self.served_ms = 0.0
+
+    async def fetch(self, handler: BaseHandlerRefactor, product_url: str) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        with tracer.span(f"variations.{self.name}", {"bot": handler.bot_name}) as span:
+            try:
+                variations = await self._fetch(handler, product_url)
+            except FetchFailed as e:
+                self.failed += 1
+                span.set_attribute("failed", str(e))
+                print(f"{self.name} fetch of {product_url} failed, trying the next tier: {e}")
+                return None
+            span.set_attribute("served", variations is not None)
+        if variations is None:
+            self.missed += 1
+        else:
+            self.served += 1
+            self.served_ms += (time.perf_counter() - started) * 1000
+        return variations
+
+    @abstractmethod
+    async def _fetch(self, handler: BaseHandlerRefactor, product_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the get_variations result of the product, None if this tier cannot tell it.
+        """
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "served": self.served,
+            "missed": self.missed,
+            "failed": self.failed,
+            "avg_served_ms": round(self.served_ms / self.served, 1) if self.served else 0,
+        }
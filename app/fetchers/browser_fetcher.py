@@ -0,0 +1,29 @@
+from typing import Any, Dict, Optional
+from app.fetchers.base import VariationFetcher
+from app.handlers.base_handler import BaseHandlerRefactor
+from app.utils.admission import AdmissionController
+from app.utils.playwright_utils import PlaywrightUtils
+
+
+class BrowserFetcher(VariationFetcher):
+    """
+    Renders the product page in a (warm) browser page, the tier every product can be served by.
+    Holds an admission slot while doing so, the tiers before it do not need one.
+    """
+
+    name = "browser"
+
+    def __init__(self, playwright_utils: PlaywrightUtils, admission_controller: Optional[AdmissionController] = None):
+        super().__init__()
+        self.playwright_utils = playwright_utils
+        self.admission_controller = admission_controller
+
+    async def _fetch(self, handler: BaseHandlerRefactor, product_url: str) -> Optional[Dict[str, Any]]:
+        if self.admission_controller is None:
+            return await self._render(handler, product_url)
+        async with self.admission_controller.admit("variations"):
+            return await self._render(handler, product_url)
+
+    async def _render(self, handler: BaseHandlerRefactor, product_url: str) -> Optional[Dict[str, Any]]:
+        async with self.playwright_utils.lease_warm_page(product_url, network_policy=handler.get_network_policy("variations")) as (context, page, prewarmed):
+            return await handler.get_variations(page=page, product_url=product_url, prewarmed=prewarmed)
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from app.fetchers.base import FetchFailed, VariationFetcher
+from app.handlers.base_handler import BaseHandlerRefactor
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def find_key(data: Any, key: str) -> Optional[Dict[str, Any]]:
+    """
+    The first object of a JSON document holding key, breadth first.
+    """
+    queue = [data]
+    while queue:
+        value = queue.pop(0)
+        if isinstance(value, dict):
+            if key in value:
+                return value
+            queue.extend(value.values())
+        elif isinstance(value, list):
+            queue.extend(value)
+    return None
+
+
+class HttpFetcher(VariationFetcher):
+    """
+    Reads the product data straight from the storefront over HTTP, without a browser: the JSON
+    embedded in the product page or the site's API, as declared in the 'http_fetch' section of
+    a bot's selectors JSON:
+
+        "http_fetch": {
+            "url_pattern": "/stores/(?P<store_id>\\d+)/",
+            "requests": [
+                {"kind": "store", "url": "https://api.example.com/stores/{store_id}"},
+                {"kind": "product", "url": "{product_url}", "embedded": "<script id=\"__NEXT_DATA__\"[^>]*>(.*?)</script>",
+                 "search": "products", "wrap": "data"}
+            ]
+        }
+
+    URLs are formatted with product_url and the named groups of url_pattern. 'embedded' extracts
+    the JSON from an HTML document, 'search' keeps the first object holding that key and 'wrap'
+    nests it under a key. The payloads are grouped by kind and read by the handler's response
+    parsers, the same as the responses a browser page captures. Requests to the same URL are
+    made once, and each upstream host keeps its own pool of keep-alive connections.
+    """
+
+    name = "http"
+
+    def __init__(self, timeout: float = 5, max_connections: int = 10, keepalive_expiry: float = 30, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__()
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=keepalive_expiry)
+        self.transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.requests = 0
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        if host not in self._clients:
+            self._clients[host] = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                limits=self.limits,
+                timeout=self.timeout,
+                follow_redirects=True,
+                transport=self.transport,
+            )
+        return self._clients[host]
+
+    async def _fetch(self, handler: BaseHandlerRefactor, product_url: str) -> Optional[Dict[str, Any]]:
+        config = handler.http_fetch_config
+        if not config.get("requests"):
+            return None
+        params = {"product_url": product_url}
+        if config.get("url_pattern"):
+            match = re.search(config["url_pattern"], product_url)
+            if not match:
+                return None
+            params.update(match.groupdict())
+
+        documents = {}
+        payloads = await asyncio.gather(*(self._payload(spec, params, config.get("headers"), documents) for spec in config["requests"]))
+
+        grouped: Dict[str, List[Any]] = {}
+        for spec, payload in zip(config["requests"], payloads):
+            if payload is not None:
+                grouped.setdefault(spec["kind"], []).append(payload)
+        return await handler.variations_from_payloads(grouped, product_url)
+
+    async def _payload(self, spec: Dict[str, Any], params: Dict[str, str], headers: Optional[Dict[str, str]], documents: Dict[str, asyncio.Future]) -> Any:
+        url = spec["url"].format(**params)
+        if url not in documents:
+            documents[url] = asyncio.ensure_future(self._get(url, headers))
+        text = await documents[url]
+
+        try:
+            if spec.get("embedded"):
+                embedded = re.search(spec["embedded"], text, re.DOTALL)
+                if not embedded:
+                    return None
+                text = embedded.group(1)
+            data = json.loads(text)
+        except ValueError as e:
+            raise FetchFailed(f"{url} is not the expected JSON: {e}")
+
+        if spec.get("search"):
+            data = find_key(data, spec["search"])
+        if data is not None and spec.get("wrap"):
+            data = {spec["wrap"]: data}
+        return data
+
+    async def _get(self, url: str, headers: Optional[Dict[str, str]]) -> str:
+        self.requests += 1
+        try:
+            response = await self.client(url).get(url, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise FetchFailed(f"{url}: {e!r}")
+        return response.text
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "requests": self.requests, "hosts": sorted(self._clients)}
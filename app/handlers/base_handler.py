@@ -1,22 +1,126 @@
 import random
+import re
 from abc import ABC, abstractmethod
+from app.config import Config
 from app.model.models import Product
 from app.model.checkout_options import *
 from app.services.selectors_service import SelectorsService
+from app.utils.dom_extractor import DomExtractor
+from app.utils.metrics import count_http_exception
+from app.utils.modal_watcher import ModalWatcher
+from app.utils.navigation import NavigationReadiness
+from app.utils.network_policy import NetworkPolicy
+from app.utils.response_capture import PayloadCapture, ResponseCapture
+from app.utils.settle import Settler
+from app.utils.step_timing import StepTimer, instrument_steps, set_step_domain
+from app.utils.storage_state_codec import StorageStateCodec
 from fastapi import HTTPException, status
 from playwright._impl._errors import TimeoutError, Error
 from playwright.async_api import Page
 from sqlalchemy.orm import Session
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import traceback
 import uuid
 import asyncio
+from urllib.parse import urlsplit
+
+# Client-side navigation for single page apps listening to history changes
+DEFAULT_ROUTE_CHANGE_SCRIPT = """
+url => {
+    window.history.pushState({}, '', url);
+    window.dispatchEvent(new PopStateEvent('popstate', { state: {} }));
+}
+"""
+
+
+class Outcome:
+    """
+    One of the mutually exclusive states a page can end up in, raced by BaseHandlerRefactor._race_outcomes.
+    An outcome with an error message raises it as an HTTPException when it wins ('{}' is replaced
+    with the element's text), one without is a success.
+    """
+
+    def __init__(self, name: str, selector: str, error: Optional[str] = None, status_code: int = status.HTTP_400_BAD_REQUEST, has_text: Optional[str] = None):
+        self.name = name
+        self.selector = selector
+        self.error = error
+        self.status_code = status_code
+        self.has_text = has_text
+
+    def locator(self, page: Page):
+        locator = page.locator(self.selector)
+        if self.has_text:
+            locator = locator.filter(has_text=self.has_text)
+        return locator.first
 
 
 class BaseHandlerRefactor(ABC):
 
+    # Handler methods timed as named steps (see StepTimer), in this class and its subclasses
+    STEPS = {
+        "navigate_to_url": "navigate",
+        "_initial_checks": "initial_checks",
+        "_check_product_page": "product_page_check",
+        "_scrape_variations": "variations_scrape",
+        "_handle_product_variant": "variant_selection",
+        "_read_price": "price",
+        "_select_quantity": "quantity",
+        "_click_add_to_cart": "add_to_cart_click",
+        "_bag_check": "bag_check",
+        "_match_cart_item": "cart_matching",
+        "_click_on_cart": "cart_open",
+        "_handle_cart_variants": "cart_update",
+        "_fetch_checkout_options": "checkout_options",
+        "_checkout_checks": "checkout_checks",
+        "_place_order_details": "order_details",
+        "_place_order_details_v2": "order_details",
+        "_place_order": "order_placement",
+    }
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_steps(cls)
+
+    # Selectors the base flows index directly, checked by the HandlerRegistry when it builds the handler
+    REQUIRED_SELECTORS = {
+        "add_to_cart": ("prod_name", "variant_selector", "variant_name_selector", "price_selectors", "msrp_selectors",
+                        "click_add_to_cart", "bag_check_selector", "dispensary_name"),
+        "cart_verification": ("wait_for_cart_container", "subtotal"),
+        "cart_deletion": ("wait_for_cart_container", "prod_name", "product_name", "product_delete_button"),
+    }
+
     def __init__(self):
-        self.selectors = SelectorsService.get_selectors(self.bot_name)["selectors"]
+        bot_selectors = SelectorsService.get_selectors(self.bot_name)
+        self.selectors = bot_selectors["selectors"]
+        self.network_policy_config = bot_selectors.get("network_policy")
+        self.warm_pages_config = bot_selectors.get("warm_pages") or {}
+        self.http_fetch_config = bot_selectors.get("http_fetch") or {}
+        self.storage_state_codec = StorageStateCodec.for_bot(self.bot_name, bot_selectors)
+        self.modal_watcher = ModalWatcher.for_bot(self.bot_name, bot_selectors, enabled=Config.MODAL_WATCHERS)
+        self.dom_extractor = DomExtractor.for_bot(self.bot_name, bot_selectors, enabled=Config.DOM_EXTRACTION)
+        self.response_capture = ResponseCapture.for_bot(self.bot_name, bot_selectors, enabled=Config.RESPONSE_CAPTURE)
+        self.navigation = NavigationReadiness.for_bot(self.bot_name, bot_selectors)
+        self.settler = Settler.for_bot(self.bot_name, bot_selectors, quiet_ms=Config.SETTLE_QUIET_MS)
+        self.step_timer = StepTimer.for_bot(self.bot_name, enabled=Config.STEP_TIMING)
+
+    def freeze(self):
+        """
+        Makes the handler read-only, once shared by all the requests of its bot (see HandlerRegistry).
+        Per request state lives in the request's context instead (e.g. set_step_domain).
+        """
+        self._frozen = True
+        return self
+
+    def __setattr__(self, name: str, value: Any):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"{type(self).__name__} is shared between requests, '{name}' cannot be set")
+        super().__setattr__(name, value)
+
+    def get_network_policy(self, operation: str) -> Optional[NetworkPolicy]:
+        """
+        Returns the request blocking policy for an operation (e.g. 'variations', 'checkout').
+        """
+        return NetworkPolicy.from_config(self.bot_name, self.network_policy_config, operation)
 
     async def raise_http_exception(
         self,
@@ -31,6 +135,7 @@ class BaseHandlerRefactor(ABC):
                 f"Exception {context}: {exception}\nTraceback: {traceback.format_exc()}"
             )
 
+        count_http_exception(self.bot_name, status_code)
         detail = {"status": "error", "message": message}
         if variants is not None:  # Add variants to the detail if provided
             detail["variants"] = variants
@@ -38,14 +143,95 @@ class BaseHandlerRefactor(ABC):
             status_code=status_code,detail=detail
         )
 
-    async def navigate_to_url(self, page: Page, product_url: str):
+    def get_menu_url(self, url: str) -> Optional[str]:
         """
-        Common method to navigate to the product page and wait for the load state.
+        Returns the dispensary menu URL a product (or menu) URL belongs to, used to key warm pages.
         """
-        await page.goto(product_url)
-        await page.wait_for_load_state("load")
+        pattern = self.warm_pages_config.get("menu_url_pattern")
+        match = re.match(pattern, url) if pattern else None
+        return match.group(1) if match else None
 
-    async def _handle_extra_modal(self, page: Page, modal_selector: str, button_selector: str, timeout: Optional[int] = 1000):
+    async def warm_up(self, page: Page, menu_url: str):
+        """
+        Opens a dispensary menu and goes through the initial checks (age gate, etc)
+        so the page can later be handed out pre-warmed.
+        """
+        await self.navigate_to_url(page, menu_url, operation="warm_up")
+        await self._initial_checks(page)
+
+    async def navigate_to_url(self, page: Page, product_url: str, prewarmed: bool = False, resumed: bool = False, operation: str = "default") -> bool:
+        """
+        Common method to navigate to the product page and wait for it to be ready for the
+        operation (see NavigationReadiness). On a pre-warmed menu page an in-app route change
+        is tried first.
+        :param resumed: The page is left over from a previous operation on the same cart,
+                        its session already went through the initial checks.
+        :return: True if the initial checks can be skipped.
+        """
+        set_step_domain(urlsplit(product_url).netloc)
+        await self.modal_watcher.install(page)
+        self.settler.track(page)
+        capture = self.response_capture.attach(page)
+        if prewarmed:
+            if capture is not None:
+                capture.reset(route_change=True)
+            if await self._route_change(page, product_url):
+                return True
+            print(f"In-app route change to {product_url} failed, loading the page")
+
+        if capture is not None:
+            capture.reset()
+
+        await self.navigation.goto(page, product_url, operation, capture)
+        return resumed
+
+    async def _variations_from_responses(self, capture: PayloadCapture, product_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Builds the get_variations result from the captured API responses of the product page.
+        None scrapes the rendered page instead, which bots without response capture always do.
+        """
+        return None
+
+    async def variations_from_payloads(self, payloads: Dict[str, List[Any]], product_url: str) -> Optional[Dict[str, Any]]:
+        """
+        The get_variations result from API payloads fetched without a browser (see app/fetchers),
+        grouped by the kinds of the response_capture section. None if they do not tell it.
+        """
+        return await self._variations_from_responses(PayloadCapture(payloads=payloads), product_url)
+
+    async def _price_from_responses(self, capture: PayloadCapture, product_url: str, product_variant: Optional[str]) -> Optional[Tuple[float, float]]:
+        """
+        Price and MSRP of the selected variant from the captured API responses, None to read them from the page.
+        """
+        return None
+
+    async def _cart_from_responses(self, capture: PayloadCapture, wait: bool = False, after: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Cart contents from the API responses captured so far, waiting for them to arrive if wait
+        (only for the ones received after the 'after' mark, see PayloadCapture.mark):
+        {"items": [{"item_name", "product_variant", "item_price", "item_quantity"}], "subtotal"}
+        with a None subtotal when the responses do not tell it. None to scrape the cart drawer.
+        """
+        return None
+
+    async def _route_change(self, page: Page, product_url: str) -> bool:
+        timeout = self.warm_pages_config.get("route_change_timeout", 5000)
+        try:
+            await page.evaluate(self.warm_pages_config.get("route_change_script", DEFAULT_ROUTE_CHANGE_SCRIPT), product_url)
+            await page.wait_for_url(product_url, timeout=timeout)
+            await page.wait_for_selector(self.selectors["add_to_cart"]["prod_name"], timeout=timeout)
+            return True
+        except (TimeoutError, Error) as e:
+            print(f"Route change error: {e}")
+            return False
+
+    async def _handle_extra_modal(self, page: Page, modal_selector: str, button_selector: str, timeout: Optional[int] = 1000, watcher: Optional[str] = None):
+        """
+        :param watcher: Name of the modal watcher dismissing the modal, if the bot declares one.
+        """
+        if watcher and self.modal_watcher.covers(watcher):
+            # Dismissed in the background whenever it shows up
+            return
         try:
             modal_container = page.locator(modal_selector)
             await modal_container.wait_for(state="visible", timeout=timeout)
@@ -76,21 +262,81 @@ class BaseHandlerRefactor(ABC):
         except TimeoutError:
             pass
 
-    async def _check_out_of_stock(self, page: Page, out_of_stock_selector: str, inner_text: Optional[str] = None, timeout: Optional[int] = 2000):
+    async def _wait_until_settled(self, page: Page, max_wait: int, until: Optional[Dict[str, Any]] = None) -> bool:
         """
-        Checks if a product is out of stock based on the provided selector.
+        Waits for the page to settle after an action (DOM quiet, no request in flight, until
+        predicate holding), at most max_wait ms.
+        """
+        return await self.settler.wait(page, max_wait, until=until)
+
+    async def _race_outcomes(self, page: Page, outcomes: List[Outcome], timeout: int = 5000) -> Optional[str]:
         """
+        Waits for whichever of several mutually exclusive outcomes shows up first (e.g. the cart
+        drawer vs. each error modal) instead of checking them one after another.
+        Raises the winner's HTTPException if it is an error, returns its name otherwise,
+        or None when none showed up within timeout.
+        """
+        async def wait_for(outcome: Outcome) -> Outcome:
+            await outcome.locator(page).wait_for(state="visible", timeout=timeout)
+            return outcome
+
+        tasks = [asyncio.ensure_future(wait_for(outcome)) for outcome in outcomes]
+        winner = None
         try:
-            out_of_stock_element = await page.wait_for_selector(out_of_stock_selector, timeout=timeout)
+            pending = set(tasks)
+            while pending and winner is None:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # On a tie the first declared outcome wins
+                winner = next((task.result() for task in tasks if task.done() and not task.cancelled() and task.exception() is None), None)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if winner is not None and winner.error is None:
+            # An error rendered in the same frame as the success still counts
+            for outcome in outcomes:
+                if outcome.error is not None and await outcome.locator(page).is_visible():
+                    winner = outcome
+                    break
 
-            if inner_text:
-                message_text = await out_of_stock_element.inner_text()
-                if inner_text in message_text:
-                    await self.raise_http_exception("Product is out of stock", status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
-            else:
-                await self.raise_http_exception("Product is out of stock", status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if winner is None:
+            return None
+        if winner.error is not None:
+            message = winner.error
+            if "{}" in message:
+                message = message.format(await winner.locator(page).inner_text())
+            await self.raise_http_exception(message, status_code=winner.status_code)
+        return winner.name
+
+    async def _dismiss_modal(self, page: Page, modal_selector: str, button_selector: str, timeout: int = 2000):
+        """
+        Clicks a modal's button through a DOM event, which a modal watcher dismissing the same
+        modal cannot get in the way of.
+        """
+        try:
+            await page.locator(modal_selector).locator(button_selector).first.dispatch_event("click", timeout=timeout)
         except (TimeoutError, Error):
-            print("Product is available.")
+            pass
+
+    async def _check_product_page(self, page: Page, section: str, check_not_found: bool = False, timeout: int = 4000):
+        """
+        Races the product page becoming ready (add to cart button) against the out of stock
+        and, optionally, the page not found markers.
+        """
+        selectors = self.selectors[section]
+        outcomes = [Outcome("ready", self.selectors["add_to_cart"]["click_add_to_cart"])]
+        if check_not_found:
+            outcomes.append(Outcome(
+                "not_found", selectors["page_not_found"], "Requested product page does not exist.",
+                status_code=status.HTTP_404_NOT_FOUND,
+            ))
+        outcomes.append(Outcome(
+            "out_of_stock", selectors["out_of_stock_selector"], "Product is out of stock",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, has_text=selectors.get("out_of_stock_inner_text"),
+        ))
+        if await self._race_outcomes(page, outcomes, timeout=timeout) is None:
+            print("Product page readiness not detected, proceeding.")
 
     async def _handle_product_variant(self, page: Page, product_variant_selector: Dict[str, str], provided_variant: Optional[str] = None):
         """
@@ -108,17 +354,13 @@ class BaseHandlerRefactor(ABC):
             return {"message": "No variants available, proceeding with the product."}
 
         # Collect all available variants
-        for element in variant_elements:
-            variant_name_element = await element.query_selector(product_variant_selector['variant_name_selector'])
-            price_selector = product_variant_selector.get('variant_price_selector')
-
-            if isinstance(price_selector, str):
-                price_element = await element.query_selector(price_selector)
-            else:
-                price_element = price_selector
+        variant_records = await self.dom_extractor.extract(page, "product_variants", variant_elements)
+        if variant_records is None:
+            variant_records = [await self._read_variant(element, product_variant_selector) for element in variant_elements]
 
-            variant_name = await variant_name_element.inner_text() if variant_name_element else None
-            price = await price_element.inner_text() if price_element else None
+        for element, variant_record in zip(variant_elements, variant_records):
+            variant_name = variant_record.get("variant_name")
+            price = variant_record.get("price")
 
             available_variants.append({"variant_name": variant_name, "price": price})
 
@@ -146,6 +388,22 @@ class BaseHandlerRefactor(ABC):
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
         )
 
+    async def _read_variant(self, element, product_variant_selector: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """
+        Element by element fallback of the 'product_variants' extraction.
+        """
+        variant_name_element = await element.query_selector(product_variant_selector['variant_name_selector'])
+        price_selector = product_variant_selector.get('variant_price_selector')
+
+        if isinstance(price_selector, str):
+            price_element = await element.query_selector(price_selector)
+        else:
+            price_element = price_selector
+
+        variant_name = await variant_name_element.inner_text() if variant_name_element else None
+        price = await price_element.inner_text() if price_element else None
+        return {"variant_name": variant_name, "price": price}
+
     async def _extract_price_and_msrp(
             self, page: Page, price_selector: str, msrp_selector: str
     ):
@@ -338,12 +596,46 @@ class BaseHandlerRefactor(ABC):
             print("Captcha did not appear")
             pass
 
-    async def get_variations(self, page: Page, product_url: str):
-        await self.navigate_to_url(page, product_url)
-        await self._initial_checks(page)
+    async def get_variations(self, page: Page, product_url: str, prewarmed: bool = False):
+        # The API responses the page renders from are enough, no need to wait for the rendering
+        capture = self.response_capture.attach(page)
+        skip_checks = await self.navigate_to_url(page, product_url, prewarmed=prewarmed, operation="variations")
+        if capture is not None:
+            variations = await self._variations_from_responses(capture, product_url)
+            self.response_capture.record_served("variations", variations is not None)
+            if variations is not None:
+                return variations
+            await page.wait_for_load_state("domcontentloaded")
+
+        # The age gate was already handled on a pre-warmed page
+        if not skip_checks:
+            await self._initial_checks(page)
+
+        await self._check_product_page(page, "variant")
+
+        variations = await self.dom_extractor.extract_one(page, "variations")
+        if variations is not None:
+            variants = [
+                {k: v for k, v in variant.items() if v is not None}
+                for variant in variations.pop("variants") or []
+            ]
+            if not variants:
+                # If no variant elements are found, the general price and msrp of the page
+                variants = [{k: v for k, v in [("price", variations.pop("price", None)), ("msrp", variations.pop("msrp", None))] if v is not None}]
+            base_details = {key: variations.get(key) for key in ("dispensary_name", "dispensary_image_url", "product_name", "product_image_url")}
+            return {
+                "variations": {
+                    **base_details,
+                    "variants": variants
+                }
+            }
 
-        await self._check_out_of_stock(page, out_of_stock_selector=self.selectors["variant"]["out_of_stock_selector"])
+        return await self._scrape_variations(page)
 
+    async def _scrape_variations(self, page: Page):
+        """
+        Element by element fallback of the 'variations' extraction.
+        """
         product_variant_selector = {
             "dispensary_name": self.selectors["variant"].get("dispensary_name"),
             "dispensary_image_element": self.selectors["variant"].get("dispensary_image_element"),
@@ -417,29 +709,13 @@ class BaseHandlerRefactor(ABC):
             }
         }
 
+    async def add_product(self, page, product_url, quantity, exst_quantity, product_variant, prewarmed: bool = False, resumed: bool = False):
+        # Handle other initial checks, already done on a pre-warmed or resumed page
+        if not await self.navigate_to_url(page, product_url, prewarmed=prewarmed, resumed=resumed, operation="add_to_cart"):
+            await self._initial_checks(page)
 
-
-    async def add_product(self, page, product_url, quantity, exst_quantity, product_variant):
-        await self.navigate_to_url(page, product_url)
-
-        # Handle other initial checks
-        await self._initial_checks(page)
-
-        # Check non-existing product page
-        await self._handle_imp_modal(
-            page,
-            modal_selector=self.selectors["add_to_cart"]["page_not_found"],
-            exc_message="Requested product page does not exist.",
-            timeout=2000,
-            status_code=status.HTTP_404_NOT_FOUND
-        )
-
-        # Check out of stock
-        await self._check_out_of_stock(
-            page,
-            out_of_stock_selector=self.selectors["add_to_cart"]["out_of_stock_selector"],
-            inner_text=self.selectors["add_to_cart"].get("out_of_stock_inner_text")
-        )
+        # Check non-existing product page and out of stock
+        await self._check_product_page(page, "add_to_cart", check_not_found=True)
 
         product_variant_selector = {
             "variant_selector" : self.selectors["add_to_cart"]["variant_selector"],
@@ -456,7 +732,28 @@ class BaseHandlerRefactor(ABC):
         product_name_element = await page.wait_for_selector(self.selectors["add_to_cart"]["prod_name"])
         prod_name = await product_name_element.inner_text()
         
-        # Extract price and MSRP
+        capture = self.response_capture.attach(page)
+        price, msrp = await self._read_price(page, capture, product_url, product_variant)
+
+        await self._select_quantity(page, quantity, exst_quantity)
+        # Only a cart payload received after the click tells the cart with the product added
+        cart_mark = capture.mark("cart") if capture else 0
+        await self._click_add_to_cart(page, add_to_cart_selector=self.selectors["add_to_cart"]["click_add_to_cart"])
+        await self._bag_check(page)
+
+        cart_details = await self._match_cart_item(page, capture, prod_name, product_variant, cart_mark)
+        return price, msrp, cart_details
+
+    async def _read_price(self, page: Page, capture: Optional[PayloadCapture], product_url: str, product_variant: Optional[str]) -> Tuple[Any, Any]:
+        """
+        Price and MSRP of the product, from the captured API responses or the page.
+        """
+        captured_price = await self._price_from_responses(capture, product_url, product_variant) if capture else None
+        if capture is not None:
+            self.response_capture.record_served("product_price", captured_price is not None)
+        if captured_price is not None:
+            return captured_price
+        price = msrp = None
         for price_selector, msrp_selector in zip(self.selectors["add_to_cart"]["price_selectors"].values(),
                                                  self.selectors["add_to_cart"]["msrp_selectors"].values()):
             if await page.is_visible(price_selector):
@@ -466,11 +763,13 @@ class BaseHandlerRefactor(ABC):
                     msrp_selector=msrp_selector,
                 )
                 break
+        return price, msrp
 
-        await self._select_quantity(page, quantity, exst_quantity)
-        await self._click_add_to_cart(page, add_to_cart_selector=self.selectors["add_to_cart"]["click_add_to_cart"])
-        await self._bag_check(page)
-
+    async def _match_cart_item(self, page: Page, capture: Optional[PayloadCapture], prod_name: str, product_variant: Optional[str], cart_mark: int = 0) -> Dict[str, Any]:
+        """
+        Finds the added product in the cart drawer opened by the add to cart.
+        :param cart_mark: Mark of the cart payloads before the add to cart, see PayloadCapture.mark.
+        """
         cart_container = await page.wait_for_selector(self.selectors["cart_verification"]["wait_for_cart_container"], timeout=5000)
         await self._check_cart_empty(page, cart_container)
 
@@ -479,55 +778,72 @@ class BaseHandlerRefactor(ABC):
         dispensary_name_element = await disp_check.query_selector(self.selectors["add_to_cart"]["dispensary_name"])
         dispensary_name = await dispensary_name_element.inner_text() if dispensary_name_element else "Unknown Dispensary"
 
-        cart_item_containers = await self._get_cart_item_containers(page, cart_container)
-
-        for cart_item_container in cart_item_containers:
+        # The cart API response of the add to cart, when captured with the product in it, spares scraping the drawer
+        captured_cart = await self._cart_from_responses(capture, wait=True, after=cart_mark) if capture else None
+        if captured_cart is not None and not any(prod_name in (cart_item.get("item_name") or "") for cart_item in captured_cart["items"]):
+            captured_cart = None
+        if capture is not None:
+            self.response_capture.record_served("added_cart_items", captured_cart is not None)
+        if captured_cart is not None:
+            cart_items = captured_cart["items"]
+        else:
+            cart_item_containers = await self._get_cart_item_containers(page, cart_container)
+            cart_items = await self.dom_extractor.extract(page, "added_cart_items", cart_item_containers)
+        if cart_items is None:
+            cart_items = [
+                await self._read_cart_item(cart_item_container, "add_to_cart", ("item_name", "product_variant", "item_price", "item_quantity"))
+                for cart_item_container in cart_item_containers
+            ]
+
+        cart_details = None
+        for cart_item in cart_items:
             # Match product name
-            item_name_elem = await cart_item_container.query_selector(self.selectors["add_to_cart"]["item_name"])
-            product_name = await item_name_elem.inner_text() if item_name_elem else "N/A"
-
-            if prod_name in product_name:
-                # If a variant is provided, match it
-                if product_variant:
-                    product_variant_elem = await cart_item_container.query_selector(self.selectors["add_to_cart"]["product_variant"])
-                    if product_variant_elem:
-                        if await self._match_product_variant(product_variant_elem, product_variant, product_name):
-                            # If variant matches, extract product details
-                            cart_details = await self._extract_cart_item_details(cart_item_container, product_name, dispensary_name)
-                            break
-                        else:
-                            await self.raise_http_exception("Variant mismatch in cart", status_code=status.HTTP_404_NOT_FOUND)
-                else:
-                    cart_details = await self._extract_cart_item_details(cart_item_container, product_name, dispensary_name)
-                    break
+            product_name = cart_item.get("item_name") or "N/A"
+            if prod_name not in product_name:
+                continue
+
+            # If a variant is provided, match it
+            if product_variant:
+                if cart_item.get("product_variant") is None:
+                    continue
+                if not self._match_product_variant(cart_item["product_variant"], product_variant):
+                    await self.raise_http_exception("Variant mismatch in cart", status_code=status.HTTP_404_NOT_FOUND)
+
+            cart_details = {
+                "dispensary_name": dispensary_name,
+                "item_name": product_name,
+                "item_price": cart_item.get("item_price") or 'N/A',
+                "item_quantity": cart_item.get("item_quantity") or 'N/A'
+            }
+            break
 
         if not cart_details:
             await self.raise_http_exception(f"Product {prod_name} not found in cart", status_code=status.HTTP_404_NOT_FOUND)
 
-        return price, msrp, cart_details
+        return cart_details
 
-    async def _extract_cart_item_details(self, cart_item_container, product_name: str, dispensary_name: str) -> Dict[str, Any]:
+    @staticmethod
+    def _sum_item_prices(cart_items: List[Dict[str, Any]]) -> str:
+        try:
+            return f"{sum(float(cart_item['item_price'].strip('$')) for cart_item in cart_items):.2f}"
+        except (AttributeError, ValueError):
+            return 'N/A'
+
+    async def _read_cart_item(self, cart_item_container, section: str, fields) -> Dict[str, Optional[str]]:
         """
-        Extracts and returns the details (name, price, quantity) of a product from a cart item container.
+        Element by element fallback of the cart item extractions: the text of each field's
+        selector in the section, None when it is missing.
         """
-        item_price_elem = await cart_item_container.query_selector(self.selectors["add_to_cart"]["item_price"])
-        item_price = await item_price_elem.inner_text() if item_price_elem else 'N/A'
-
-        item_quantity_elem = await cart_item_container.query_selector(self.selectors["add_to_cart"]["item_quantity"])
-        item_quantity = await item_quantity_elem.inner_text() if item_quantity_elem else 'N/A'
+        cart_item = {}
+        for field in fields:
+            element = await cart_item_container.query_selector(self.selectors[section][field])
+            cart_item[field] = await element.inner_text() if element else None
+        return cart_item
 
-        return {
-            "dispensary_name": dispensary_name,
-            "item_name": product_name,
-            "item_price": item_price,
-            "item_quantity": item_quantity
-        }
-
-    async def _match_product_variant(self, product_variant_elem, product_variant, product_name) -> bool:
+    def _match_product_variant(self, cart_variant_text: str, product_variant: str) -> bool:
         """
         Dutchie-specific logic for matching product variants.
         """
-        cart_variant_text = await product_variant_elem.inner_text()
         if '$' in cart_variant_text:
             price_segment = cart_variant_text.split("$")[1]
             cart_variant_value = price_segment.split("/")[1].strip()
@@ -535,56 +851,67 @@ class BaseHandlerRefactor(ABC):
 
         return product_variant in cart_variant_text
 
-    async def fetch_cart_details(self, page, product_url):
-        await self.navigate_to_url(page, product_url)
-        await self._initial_checks(page)
-
-        await self._click_on_cart(page)
-
-        # Wait for cart items container to be visible
-        cart_container = await page.wait_for_selector(self.selectors["cart_verification"]["wait_for_cart_container"], timeout=5000)
+    async def fetch_cart_details(self, page, product_url, resumed: bool = False):
+        # The cart the page fetches while loading answers without opening the cart drawer
+        capture = self.response_capture.attach(page)
+        skip_checks = await self.navigate_to_url(page, product_url, resumed=resumed, operation="cart_verification")
+        captured_cart = await self._cart_from_responses(capture, wait=True) if capture else None
+        # An empty cart may be fetched before the session is restored, the drawer confirms it
+        if captured_cart is not None and not captured_cart["items"]:
+            captured_cart = None
+        if capture is not None:
+            self.response_capture.record_served("cart_items", captured_cart is not None)
+
+        if captured_cart is not None:
+            cart_items = captured_cart["items"]
+        else:
+            if capture is not None:
+                await page.wait_for_load_state("domcontentloaded")
+            if not skip_checks:
+                await self._initial_checks(page)
 
-        await self._check_cart_empty(page, cart_container)
+            await self._click_on_cart(page)
 
-        cart_item_containers = await self._get_cart_item_containers(page, cart_container)
+            # Wait for cart items container to be visible
+            cart_container = await page.wait_for_selector(self.selectors["cart_verification"]["wait_for_cart_container"], timeout=5000)
 
-        cart_data = []
-        for cart_item_container in cart_item_containers:
-            # Extract item details
-            item_name_elem = await cart_item_container.query_selector(self.selectors["cart_verification"]["item_name"])
-            item_name = await item_name_elem.inner_text() if item_name_elem else 'N/A'
+            await self._check_cart_empty(page, cart_container)
 
-            item_price_elem = await cart_item_container.query_selector(self.selectors["cart_verification"]["item_price"])
-            item_price = await item_price_elem.inner_text() if item_price_elem else 'N/A'
+            cart_item_containers = await self._get_cart_item_containers(page, cart_container)
+            cart_items = await self.dom_extractor.extract(page, "cart_items", cart_item_containers)
 
-            item_quantity_elem = await cart_item_container.query_selector(self.selectors["cart_verification"]["item_quantity"])
-            item_quantity = await item_quantity_elem.inner_text() if item_quantity_elem else 'N/A'
+        if cart_items is None:
+            cart_items = [
+                await self._read_cart_item(cart_item_container, "cart_verification", ("item_name", "item_price", "item_quantity"))
+                for cart_item_container in cart_item_containers
+            ]
 
-            cart_data.append({
-                "item_name": item_name,
-                "item_price": item_price,
-                "item_quantity": item_quantity
-            })
+        cart_data = [
+            {field: cart_item.get(field) or 'N/A' for field in ("item_name", "item_price", "item_quantity")}
+            for cart_item in cart_items
+        ]
 
         # Fetch subtotal
-        subtotal_element = await page.query_selector(self.selectors["cart_verification"]["subtotal"])
-        if subtotal_element:
-            subtotal_str = await subtotal_element.inner_text()
-            price = subtotal_str.strip('$').strip()
+        if captured_cart is not None:
+            price = captured_cart.get("subtotal") or self._sum_item_prices(cart_items)
         else:
-            price = 'N/A'
+            subtotal_element = await page.query_selector(self.selectors["cart_verification"]["subtotal"])
+            if subtotal_element:
+                subtotal_str = await subtotal_element.inner_text()
+                price = subtotal_str.strip('$').strip()
+            else:
+                price = 'N/A'
 
         return {
             "cart_items": cart_data,
             "subtotal": price
         }
 
-    async def delete_item_product(self, page, product_id: uuid.UUID, session: Session):
+    async def delete_item_product(self, page, product_id: uuid.UUID, session: Session, resumed: bool = False):
         product = session.query(Product).filter(Product.id == product_id).first()
         product_url = product.product_url
-        await self.navigate_to_url(page, product_url)
-
-        await self._initial_checks(page)
+        if not await self.navigate_to_url(page, product_url, resumed=resumed, operation="cart_deletion"):
+            await self._initial_checks(page)
 
         product_name_element = await page.wait_for_selector(self.selectors["cart_deletion"]["prod_name"])
         prod_name = await product_name_element.inner_text()
@@ -618,14 +945,14 @@ class BaseHandlerRefactor(ABC):
         print(f"Proceeding to delete product: {product_name}")
         delete_buttons = await page.query_selector_all(self.selectors["cart_deletion"]["product_delete_button"])
         delete_button = delete_buttons[matched_index]
-        await asyncio.sleep(2)
+        await self._wait_until_settled(page, max_wait=2000)
         await delete_button.click()
         return {"message": "Product successfully deleted from cart."}
 
-    async def get_checkout_options(self, page: Page):
+    async def get_checkout_options(self, page: Page, resumed: bool = False):
         checkout_url = SelectorsService.get_checkout_url(self._get_bot_name())
-        await self.navigate_to_url(page, checkout_url)
-        await self._initial_checks(page)
+        if not await self.navigate_to_url(page, checkout_url, resumed=resumed, operation="checkout_fetch"):
+            await self._initial_checks(page)
         
         data = await self._fetch_checkout_options(page)
 
@@ -643,10 +970,10 @@ class BaseHandlerRefactor(ABC):
 
         return checkout_options.to_dict()
 
-    async def get_checkout_options_v2(self, page: Page):
+    async def get_checkout_options_v2(self, page: Page, resumed: bool = False):
         checkout_url = SelectorsService.get_checkout_url(self._get_bot_name())
-        await self.navigate_to_url(page, checkout_url)
-        await self._initial_checks(page)
+        if not await self.navigate_to_url(page, checkout_url, resumed=resumed, operation="checkout_fetch"):
+            await self._initial_checks(page)
 
         data = await self._fetch_checkout_options(page)
 
@@ -669,10 +996,10 @@ class BaseHandlerRefactor(ABC):
 
         return checkout_options
 
-    async def submit_order(self, page: Page, user_info: Dict[str, Any]) -> Dict[str, Any]:
+    async def submit_order(self, page: Page, user_info: Dict[str, Any], resumed: bool = False) -> Dict[str, Any]:
         checkout_url = SelectorsService.get_checkout_url(self._get_bot_name())
-        await self.navigate_to_url(page, checkout_url)
-        await self._initial_checks(page)
+        if not await self.navigate_to_url(page, checkout_url, resumed=resumed, operation="checkout"):
+            await self._initial_checks(page)
         await self._checkout_checks(page)
 
         await self._fill_user_form(page, user_info, self._get_checkout_selectors())
@@ -680,10 +1007,10 @@ class BaseHandlerRefactor(ABC):
         order_details = await self._place_order_details(page, user_info)
         return order_details
 
-    async def submit_order_v2(self, page: Page, checkout_options: CheckoutOptionsV2) -> Dict[str, Any]:
+    async def submit_order_v2(self, page: Page, checkout_options: CheckoutOptionsV2, resumed: bool = False) -> Dict[str, Any]:
         checkout_url = SelectorsService.get_checkout_url(self._get_bot_name())
-        await self.navigate_to_url(page, checkout_url)
-        await self._initial_checks(page)
+        if not await self.navigate_to_url(page, checkout_url, resumed=resumed, operation="checkout"):
+            await self._initial_checks(page)
         await self._checkout_checks(page)
 
         await self._fill_user_form_v2(page, checkout_options, self._get_checkout_selectors())
@@ -774,3 +1101,7 @@ class BaseHandlerRefactor(ABC):
         """
         Abstract method to extract variation price
         """
+
+
+# The steps the base handler implements, its subclasses time their own overrides
+instrument_steps(BaseHandlerRefactor)
@@ -1,22 +1,26 @@
+import asyncio
 import json
+import re
 
-from app.handlers.base_handler import BaseHandlerRefactor
+from app.handlers.base_handler import BaseHandlerRefactor, Outcome
+from app.utils.settle import element_present
 from app.services.selectors_service import SelectorsService
 from playwright.async_api import Page
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 from app.model.models import Product
 from app.model.checkout_options import CheckoutOptions, CheckoutOptionsV2
+from app.utils.response_capture import PayloadCapture
 from fastapi import status
 
+PRODUCT_SLUG = re.compile(r"/product/([^/?#]+)")
+
 
 class DutchieHandler(BaseHandlerRefactor):
     """
     Dutchie Cart Handler - Handles adding products to the cart on the Dutchie website.
     """
 
-    def __init__(self):
-        self.bot_name = "dutchie"
-        super().__init__()
+    bot_name = "dutchie"
 
     def _get_bot_name(self):
         return "dutchie"
@@ -114,7 +118,8 @@ class DutchieHandler(BaseHandlerRefactor):
             page,
             modal_selector=self.selectors["add_to_cart"]["age_rstr_container"],
             button_selector=self.selectors["add_to_cart"]["age_rstr_btn"],
-            timeout=3000
+            timeout=3000,
+            watcher="age_gate"
         )
 
     async def _handle_cart_variants(self, matched_product, matched_index, page: Page, product_url: str, product: Product):
@@ -137,36 +142,23 @@ class DutchieHandler(BaseHandlerRefactor):
             print("Product variant not found or timed out. Proceeding without variant check.")   
 
     async def _bag_check(self, page: Page):
-        # Dispensary closed-but modal check
-        await self._handle_extra_modal(
-            page,
-            modal_selector=self.selectors["add_to_cart"]["closed_but_modal_selector"],
-            button_selector=self.selectors["add_to_cart"]["closed_but_modal_selector_continue"].split(" ")[-1],
-            timeout=2000
-        )
-
-        # Dispensary closed modal check
-        await self._handle_imp_modal(
-            page,
-            modal_selector=self.selectors["add_to_cart"]["fully_closed_modal_selector"],
-            exc_message="Dispensary is closed, cannot add to cart",
-            timeout=2000
-        )
-
-        # Modal check for other dispensary products in cart
-        await self._handle_imp_modal(
-            page,
-            modal_selector=self.selectors["add_to_cart"]["clear_cart_selector"],
-            exc_message="Clear the cart before adding products from a new dispensary",
-            timeout=2000
-        )
-
-        # Minimum purchase limit notification check
-        await self._handle_error_notification(
-            page,
-            notification_selector=self.selectors["add_to_cart"]["purchase_limit_selector"],
-            exc_message="Minimum purchase limit reached: {}"
-        )
+        add_to_cart = self.selectors["add_to_cart"]
+        added = Outcome("added", add_to_cart["bag_check_selector"])
+        errors = [
+            Outcome("closed", add_to_cart["fully_closed_modal_selector"], "Dispensary is closed, cannot add to cart"),
+            Outcome("clear_cart", add_to_cart["clear_cart_selector"], "Clear the cart before adding products from a new dispensary"),
+            Outcome("purchase_limit", add_to_cart["purchase_limit_selector"], "Minimum purchase limit reached: {}"),
+        ]
+        closed_but_open = Outcome("closed_but_open", add_to_cart["closed_but_modal_selector"])
+
+        if await self._race_outcomes(page, [added, closed_but_open, *errors]) == "closed_but_open":
+            # The dispensary takes orders for later: confirm, then wait for the product to land in the cart
+            await self._dismiss_modal(
+                page,
+                modal_selector=add_to_cart["closed_but_modal_selector"],
+                button_selector=add_to_cart["closed_but_modal_selector_continue"].split(" ")[-1],
+            )
+            await self._race_outcomes(page, [added, *errors])
 
     async def _select_quantity(self, page: Page, quantity: int, exst_quantity: Optional[int]):
         """
@@ -228,6 +220,8 @@ class DutchieHandler(BaseHandlerRefactor):
         """
         Handles the rewards popup that may appear on Dutchie.
         """
+        if self.modal_watcher.covers("rewards_popup"):
+            return
         rewards_popup = page.locator(self.selectors["checkout"]["rewards_popup"])
         if await rewards_popup.is_visible(timeout=20000):
             print("'Connect to Rewards' popup has appeared.")
@@ -294,98 +288,54 @@ class DutchieHandler(BaseHandlerRefactor):
         section_selector = await page.query_selector(self.selectors["checkout_fetch"]["section_selector"])
         if not section_selector:
             await self.raise_http_exception("Checkout section not found", status_code=status.HTTP_404_NOT_FOUND)
-        
-        # Annotate customer info fields with label and type
-        section_elements = await section_selector.query_selector_all("input")
-        customer_info = [
-            {"label": await input_element.get_attribute('name') or await input_element.get_attribute('id'), "type": "input"}
-            for input_element in section_elements if input_element
-        ]
-
-        # Annotate state selection options with type 'select'
-        state_selection_selector = self.selectors["checkout_fetch"].get("state_selection_selector")
-        state_options = []
-
-        state_selection = await page.query_selector(state_selection_selector)
-        if state_selection:
-            options = await state_selection.query_selector_all("option")
-            for option in options:
-                option_value = await option.get_attribute("value")
-                option_text = await option.inner_text()
-                if option_value:
-                    state_options.append({"label": option_text, "type": "select"})
 
-        change_button_selector = self.selectors["checkout_fetch"]["change_button"]
-        change_button = await page.query_selector(change_button_selector)
-        if change_button:
-            await change_button.click()
-
-        # Handling order type radio buttons
-        order_type_section_selector = self.selectors["checkout_fetch"]["order_type_section"]
-        order_type_section = await page.wait_for_selector(order_type_section_selector, timeout=5000)
+        timings = {}
+        # The customer fields are read while the order types open, neither depends on the other
+        (customer_info, state_options), order_type_section = await asyncio.gather(
+            self.dom_extractor.timed(timings, "customer_info", self._fetch_customer_fields(page, section_selector)),
+            self.dom_extractor.timed(timings, "order_type_section", self._open_order_types(page)),
+        )
 
         radio_options = self.selectors["checkout_fetch"]["order_type_radio"]
         radio_option_elements = await order_type_section.query_selector_all(radio_options)
+        order_types = await self.dom_extractor.timed(timings, "order_types", self._read_radios(page, radio_option_elements))
 
         order_type_details = {}
         final_data = {"Order_type_details": order_type_details}
+        medical_section_details = []
+        switched = False
 
-        for option in radio_option_elements:
-            value = await option.get_attribute("value")
-            aria_checked = await option.get_attribute("aria-checked")
-            # Attempt to retrieve the type attribute, with a fallback
-            input_type = await option.get_attribute("type")
-
-            # Default to a more general type if type is None or unrecognized
-            input_type = input_type if input_type in ["radio", "checkbox", "text"] else "text"
-
-            label_elem = self.selectors["checkout_fetch"]["get_extra_value"]
-            label_element = await option.query_selector(label_elem)
-            label_text = await label_element.inner_text() if label_element else value
+        for option, order_type in zip(radio_option_elements, order_types):
+            value = order_type["value"]
+            aria_checked = order_type["checked"]
+            if switched and aria_checked == "true":
+                # Selecting another order type unchecked this one
+                aria_checked = "false"
 
             # Construct order_type_details with the dynamically detected type
             order_type_details[value] = {
-                "label": label_text,
-                "type": input_type,
+                "label": order_type["label"] if order_type["label"] is not None else value,
+                "type": order_type["type"],
                 "checked": aria_checked == "true"
             }
 
-
             if aria_checked == "true":
-                selected_order_data = await self._fetch_payment_and_schedules(page, value)
-
-                extra_fields = await self._fetch_additional_fields(page)
-                if extra_fields:
-                    selected_order_data["Address_Details"] = extra_fields
-                    
-                medical_section_details = await self.fetch_medical_section_details(page)
-                if medical_section_details:
-                    selected_order_data["Medical_details"] = medical_section_details
-
-                final_data[value] = selected_order_data
+                final_data[value], medical_section_details = await self._fetch_order_type_data(page, value, timings)
             elif aria_checked == "false":
                 try:
                     await option.scroll_into_view_if_needed()
-                    is_disabled = await option.get_attribute("disabled")
-                    if is_disabled is not None:
+                    if order_type["disabled"]:
                         order_type_details[value]["label"] += " (disabled)"
                         continue
                     await option.click(force=True)
+                    switched = True
 
-                    selected_order_data = await self._fetch_payment_and_schedules(page, value)
-
-                    extra_fields = await self._fetch_additional_fields(page)
-                    if extra_fields:
-                        selected_order_data["Address_Details"] = extra_fields
-
-                    medical_section_details = await self.fetch_medical_section_details(page)
-                    if medical_section_details:
-                        selected_order_data["Medical_details"] = medical_section_details
-
-                    final_data[value] = selected_order_data
+                    final_data[value], medical_section_details = await self._fetch_order_type_data(page, value, timings)
                 except Exception as e:
                     print(f"Failed to click on {value}: {str(e)}")
 
+        self.dom_extractor.record_sections("checkout_options", timings)
+
         checkout_options = CheckoutOptions(
             customer_info=customer_info,
             state_selection=state_options,
@@ -397,7 +347,109 @@ class DutchieHandler(BaseHandlerRefactor):
 
         return checkout_options.to_dict()
 
-    async def _fetch_payment_and_schedules(self, page: Page, order_type: str) -> Dict[str, Any]:
+    async def _fetch_customer_fields(self, page: Page, section_element):
+        """
+        Returns the customer info fields and the state selection options.
+        """
+        fields = await self.dom_extractor.extract_one(page, "checkout_customer")
+        if fields is not None:
+            customer_info = [{"label": label, "type": "input"} for label in fields["customer_info"]]
+            state_options = [{"label": option["label"], "type": "select"} for option in fields["state_options"] if option["value"]]
+            return customer_info, state_options
+
+        # Annotate customer info fields with label and type
+        section_elements = await section_element.query_selector_all("input")
+        customer_info = [
+            {"label": await input_element.get_attribute('name') or await input_element.get_attribute('id'), "type": "input"}
+            for input_element in section_elements if input_element
+        ]
+
+        # Annotate state selection options with type 'select'
+        state_selection_selector = self.selectors["checkout_fetch"].get("state_selection_selector")
+        state_options = []
+
+        state_selection = await page.query_selector(state_selection_selector)
+        if state_selection:
+            options = await state_selection.query_selector_all("option")
+            for option in options:
+                option_value = await option.get_attribute("value")
+                option_text = await option.inner_text()
+                if option_value:
+                    state_options.append({"label": option_text, "type": "select"})
+
+        return customer_info, state_options
+
+    async def _open_order_types(self, page: Page):
+        change_button_selector = self.selectors["checkout_fetch"]["change_button"]
+        change_button = await page.query_selector(change_button_selector)
+        if change_button:
+            await change_button.click()
+
+        # Handling order type radio buttons
+        order_type_section_selector = self.selectors["checkout_fetch"]["order_type_section"]
+        return await page.wait_for_selector(order_type_section_selector, timeout=5000)
+
+    async def _read_radios(self, page: Page, radio_elements) -> List[Dict[str, Any]]:
+        """
+        Reads the value, state and label of radio inputs (order types, order times).
+        """
+        radios = await self.dom_extractor.extract(page, "checkout_radios", radio_elements)
+        if radios is None:
+            radios = []
+            for radio in radio_elements:
+                label_element = await radio.query_selector(self.selectors["checkout_fetch"]["get_extra_value"])
+                radios.append({
+                    "value": await radio.get_attribute("value"),
+                    "checked": await radio.get_attribute("aria-checked"),
+                    "type": await radio.get_attribute("type"),
+                    "disabled": await radio.get_attribute("disabled") is not None,
+                    "label": await label_element.inner_text() if label_element else None,
+                })
+
+        for radio in radios:
+            # Default to a more general type if type is None or unrecognized
+            radio["type"] = radio["type"] if radio["type"] in ["radio", "checkbox", "text"] else "text"
+        return radios
+
+    async def _fetch_order_type_data(self, page: Page, order_type: str, timings: Dict[str, float]):
+        """
+        Scrapes the options of the selected order type, returns them with its medical section details.
+        """
+        # Both only read the page, the schedules and the medical section need clicks
+        payment_details, extra_fields = await asyncio.gather(
+            self.dom_extractor.timed(timings, f"{order_type}.payment_details", self._fetch_payment_details(page)),
+            self.dom_extractor.timed(timings, f"{order_type}.address_details", self._fetch_additional_fields(page)),
+        )
+        selected_order_data = {"Payment_details": payment_details}
+
+        scheduled_orders = await self.dom_extractor.timed(timings, f"{order_type}.scheduled_orders", self._fetch_schedules(page))
+        if scheduled_orders:
+            selected_order_data["Scheduled_orders"] = scheduled_orders
+
+        if extra_fields:
+            selected_order_data["Address_Details"] = extra_fields
+
+        medical_section_details = await self.dom_extractor.timed(timings, f"{order_type}.medical_details", self.fetch_medical_section_details(page))
+        if medical_section_details:
+            selected_order_data["Medical_details"] = medical_section_details
+
+        return selected_order_data, medical_section_details
+
+    async def _fetch_payment_details(self, page: Page) -> List[Dict[str, str]]:
+        payments = await self.dom_extractor.extract_one(page, "checkout_payments")
+        if payments is not None:
+            if not payments["section"]:
+                return []
+            section = payments["section"][0]
+            payment_details = []
+            for payment in section["types"] or section["options"]:
+                # Define label and type for each payment option
+                payment_option = {"label": payment["label"], "type": payment["type"] or "text"}
+                if payment["disabled"]:
+                    payment_option["label"] += " (disabled)"
+                payment_details.append(payment_option)
+            return payment_details
+
         payment_details = []
         payment_section_selector = self.selectors["checkout_fetch"]["payment_delivery_section"]
         payment_section = None
@@ -432,6 +484,19 @@ class DutchieHandler(BaseHandlerRefactor):
                     payment_option["label"] += " (disabled)"
                 payment_details.append(payment_option)
 
+        return payment_details
+
+    async def _read_option_labels(self, page: Page, extraction: str, option_selector: str) -> List[Dict[str, str]]:
+        """
+        Labels of the options of an opened dropdown.
+        """
+        options = await self.dom_extractor.extract_one(page, extraction)
+        if options is not None:
+            return [{"label": label, "type": "select"} for label in options["labels"]]
+        option_elements = await page.query_selector_all(option_selector)
+        return [{"label": await option.inner_text(), "type": "select"} for option in option_elements]
+
+    async def _fetch_schedules(self, page: Page) -> Dict[str, Any]:
         # Fetch scheduled orders data
         scheduled_orders = {}
         scheduled_option_selector = self.selectors["checkout_fetch"]["scheduled_option"]
@@ -443,24 +508,21 @@ class DutchieHandler(BaseHandlerRefactor):
         if scheduled_option:
             scheduled_radio_group_selector = self.selectors["checkout_fetch"]["radio_group"]
             scheduled_radio_elements = await page.query_selector_all(scheduled_radio_group_selector)
-            
-            for scheduled_radio in scheduled_radio_elements:
-                if scheduled_radio:
-                    scheduled_label_element = self.selectors["checkout_fetch"]["get_extra_value"]
-                    scheduled_label_elem = await scheduled_radio.query_selector(scheduled_label_element)
-                    scheduled_label_text = await scheduled_label_elem.inner_text() if scheduled_label_elem else ""
-                    scheduled_aria_checked = await scheduled_radio.get_attribute("aria-checked")
-                    is_disabled = await scheduled_radio.get_attribute("disabled")
-
-                    if is_disabled is not None:
-                        scheduled_label_text = f"{scheduled_label_text} (disabled)"
-                    
-                    if ("asap" in scheduled_label_text.lower() or "ASAP" in scheduled_label_text.upper()) and scheduled_aria_checked == "true":
-                        scheduled_orders["ASAP"] = scheduled_label_text
-                    
-                    if "Scheduled" in scheduled_label_text and scheduled_aria_checked == "false":
-                        scheduled_orders["Scheduled"] = scheduled_label_text
-                        await scheduled_radio.click(force=True)
+            scheduled_radios = await self._read_radios(page, scheduled_radio_elements)
+
+            for scheduled_radio, radio in zip(scheduled_radio_elements, scheduled_radios):
+                scheduled_label_text = radio["label"] or ""
+                scheduled_aria_checked = radio["checked"]
+
+                if radio["disabled"]:
+                    scheduled_label_text = f"{scheduled_label_text} (disabled)"
+
+                if ("asap" in scheduled_label_text.lower() or "ASAP" in scheduled_label_text.upper()) and scheduled_aria_checked == "true":
+                    scheduled_orders["ASAP"] = scheduled_label_text
+
+                if "Scheduled" in scheduled_label_text and scheduled_aria_checked == "false":
+                    scheduled_orders["Scheduled"] = scheduled_label_text
+                    await scheduled_radio.click(force=True)
 
             # Fetch day options
             day_arrow_selector = self.selectors["checkout_fetch"].get("day_arrow_selector")
@@ -468,9 +530,7 @@ class DutchieHandler(BaseHandlerRefactor):
             
             if day_arrow:
                 await day_arrow.click()
-                day_option_selector = self.selectors["checkout_fetch"].get("day_option")
-                day_option_elements = await page.query_selector_all(day_option_selector)
-                day_options = [{"label": await day_option.inner_text(), "type": "select"} for day_option in day_option_elements]
+                day_options = await self._read_option_labels(page, "checkout_day_options", self.selectors["checkout_fetch"].get("day_option"))
 
             # Fetch time slot options
             time_arrow_selector = self.selectors["checkout_fetch"]["time_arrow_selector"]
@@ -478,19 +538,16 @@ class DutchieHandler(BaseHandlerRefactor):
             
             if time_arrow_elements:
                 time_arrow_to_click = time_arrow_elements[1] if len(time_arrow_elements) > 1 else time_arrow_elements[0]
+                time_option_selector = self.selectors["checkout_fetch"]["time_options"]
                 await time_arrow_to_click.click()
-                await page.wait_for_timeout(1000)
+                await self._wait_until_settled(page, max_wait=1000, until=element_present(time_option_selector))
 
-                time_option_selector = self.selectors["checkout_fetch"]["time_options"]
-                time_option_elements = await page.query_selector_all(time_option_selector)
+                time_slots = await self._read_option_labels(page, "checkout_time_options", time_option_selector)
 
-                if not time_option_elements:
+                if not time_slots:
                     await time_arrow_to_click.click()
-                    await page.wait_for_timeout(1000)
-                    time_option_elements = await page.query_selector_all(time_option_selector)
-
-                if time_option_elements:
-                    time_slots = [{"label": await time_option.inner_text(), "type": "select"} for time_option in time_option_elements]
+                    await self._wait_until_settled(page, max_wait=1000, until=element_present(time_option_selector))
+                    time_slots = await self._read_option_labels(page, "checkout_time_options", time_option_selector)
 
         if day_options or time_slots:
             scheduled_orders["Scheduled"] = {
@@ -498,15 +555,13 @@ class DutchieHandler(BaseHandlerRefactor):
                                 "time_slots": time_slots if time_slots else []
                             }
 
-        result = {
-            "Payment_details": payment_details
-        }
-        if scheduled_orders:
-            result["Scheduled_orders"] = scheduled_orders
-
-        return result
+        return scheduled_orders
 
     async def _fetch_additional_fields(self, page: Page) -> List[Dict[str, str]]:
+        fields = await self.dom_extractor.extract_one(page, "checkout_address_fields")
+        if fields is not None:
+            return [{"label": fields[field], "type": "input"} for field in ("address", "apartment") if fields[field] is not None]
+
         extra_fields = []
         
         address_field_selector = self.selectors["checkout_fetch"].get("delivery_address_input")
@@ -540,12 +595,131 @@ class DutchieHandler(BaseHandlerRefactor):
 
             expanded_details = await page.wait_for_selector(expanded_details_selector, timeout=5000)
             if expanded_details:
+                labels = await self.dom_extractor.extract_one(page, "checkout_medical_labels")
+                if labels is not None:
+                    return [{"label": label, "type": "input"} for label in labels["labels"]]
                 labels = await expanded_details.query_selector_all(label_selector)
                 # Annotate each label with a type
                 label_texts = [{"label": await label.inner_text(), "type": "input"} for label in labels]
 
         return label_texts
 
+    async def _variations_from_responses(self, capture: PayloadCapture, product_url: str) -> Optional[Dict[str, Any]]:
+        product = await capture.wait_for("product", lambda payload: self._find_product(payload, product_url))
+        if product is None:
+            return None
+        dispensary = await capture.wait_for("dispensary", self._find_dispensary)
+        if dispensary is None:
+            return None
+        await self._check_product_status(product)
+
+        variants = []
+        for option, price, msrp in self._product_options(product):
+            variant_details = {"price": f"${price:.2f}"}
+            if msrp != price:
+                variant_details["msrp"] = f"${msrp:.2f}"
+            if option:
+                variant_details = {"variant_name": option, **variant_details}
+            variants.append(variant_details)
+
+        return {
+            "variations": {
+                "dispensary_name": dispensary.get("name"),
+                "dispensary_image_url": dispensary.get("logoImage"),
+                "product_name": product.get("Name"),
+                "product_image_url": product.get("Image"),
+                "variants": variants,
+            }
+        }
+
+    async def _price_from_responses(self, capture: PayloadCapture, product_url: str, product_variant: Optional[str]) -> Optional[Tuple[float, float]]:
+        # The product page was rendered by then, its response already arrived
+        product = await capture.wait_for("product", lambda payload: self._find_product(payload, product_url), timeout=0)
+        if product is None:
+            return None
+        for option, price, msrp in self._product_options(product):
+            if not product_variant or option == product_variant:
+                return price, msrp
+        return None
+
+    async def _cart_from_responses(self, capture: PayloadCapture, wait: bool = False, after: int = 0) -> Optional[Dict[str, Any]]:
+        if wait:
+            return await capture.wait_for("cart", self._find_cart, after=after)
+        return capture.latest("cart", self._find_cart)
+
+    @staticmethod
+    def _find_product(payload: Dict[str, Any], product_url: str) -> Optional[Dict[str, Any]]:
+        """
+        The product of the page in a FilteredProducts response, matched on its URL slug.
+        """
+        slug = PRODUCT_SLUG.search(product_url)
+        products = payload["data"]["filteredProducts"]["products"]
+        for product in products:
+            if slug and product.get("cName") == slug.group(1):
+                return product
+        # A single result is the product queried by id rather than by slug
+        return products[0] if len(products) == 1 and not slug else None
+
+    @staticmethod
+    def _find_dispensary(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        dispensaries = payload["data"]["filteredDispensaries"]
+        return dispensaries[0] if dispensaries else None
+
+    @staticmethod
+    def _product_options(product: Dict[str, Any]) -> List[Tuple[Optional[str], float, float]]:
+        """
+        (option, price, msrp) of each variant, the special price when the product is on special.
+        A single 'N/A' option is a product sold without variants.
+        """
+        options = product.get("Options") or ["N/A"]
+        prices = product.get("recPrices") or product.get("Prices") or []
+        special_prices = (product.get("recSpecialPrices") or []) if product.get("special") else []
+        result = []
+        for index, option in enumerate(options):
+            if index >= len(prices) or prices[index] is None:
+                continue
+            msrp = float(prices[index])
+            special = special_prices[index] if index < len(special_prices) else None
+            price = float(special) if special else msrp
+            result.append((None if option == "N/A" and len(options) == 1 else option, price, msrp))
+        return result
+
+    async def _check_product_status(self, product: Dict[str, Any]):
+        stock = (product.get("POSMetaData") or {}).get("children") or []
+        sold_out = stock and all((option.get("quantityAvailable") or 0) <= 0 for option in stock)
+        if product.get("Status", "Active") != "Active" or sold_out:
+            await self.raise_http_exception("Product is out of stock", status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    @classmethod
+    def _find_cart(cls, payload: Any) -> Optional[Dict[str, Any]]:
+        """
+        Cart items of a Checkout response: the first object holding an 'items' list of products.
+        """
+        if isinstance(payload, list):
+            for value in payload:
+                cart = cls._find_cart(value)
+                if cart is not None:
+                    return cart
+            return None
+        if not isinstance(payload, dict):
+            return None
+        items = payload.get("items")
+        if isinstance(items, list) and all(isinstance(item, dict) and "product" in item for item in items):
+            subtotal = payload.get("subtotal") if payload.get("subtotal") is not None else (payload.get("priceSummary") or {}).get("subtotal")
+            return {
+                "items": [
+                    {
+                        "item_name": item["product"].get("Name"),
+                        "product_variant": item.get("option"),
+                        "item_price": f"${float(item['price']):.2f}" if item.get("price") is not None else None,
+                        "item_quantity": str(item["quantity"]) if item.get("quantity") is not None else None,
+                    }
+                    for item in items
+                ],
+                "subtotal": f"{float(subtotal):.2f}" if subtotal is not None else None,
+            }
+        return cls._find_cart(list(payload.values()))
+
     async def _extract_variation_price_and_msrp(self, page, variation_element):
         # Extract price
         variant_price_selector = self.selectors["variant"]["price_selectors"].get("variant")
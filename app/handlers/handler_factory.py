@@ -1,20 +1,22 @@
-from app.handlers.dutchie_handler import DutchieHandler
-from app.handlers.iheartjane_handler import IHeartJaneHandler
+from typing import Optional
+from app.handlers.handler_registry import HandlerRegistry
 
 
 class HandlerFactory:
     """
-    Factory class responsible for creating the appropriate cart and checkout handlers
-    based on the URL of the website.
+    Factory class responsible for handing out the appropriate cart and checkout handlers
+    based on the URL of the website. The handlers come from a HandlerRegistry, built on
+    first use unless set at startup.
     """
 
-    @staticmethod
-    def get_bot_handler(website_url: str):
-        if "dutchie.com" in website_url:
-            return DutchieHandler()
-        elif "iheartjane.com" in website_url:
-            return IHeartJaneHandler()
-        else:
-            raise ValueError(
-                f"No bot handler available for the website: {website_url}"
-            )
\ No newline at end of file
+    registry: Optional[HandlerRegistry] = None
+
+    @classmethod
+    def get_registry(cls) -> HandlerRegistry:
+        if cls.registry is None:
+            cls.registry = HandlerRegistry()
+        return cls.registry
+
+    @classmethod
+    def get_bot_handler(cls, website_url: str):
+        return cls.get_registry().get_bot_handler(website_url)
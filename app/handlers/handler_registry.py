@@ -0,0 +1,95 @@
+from typing import Any, Dict, Iterable, List, Optional, Type
+from urllib.parse import urlsplit
+from app.handlers.base_handler import BaseHandlerRefactor
+from app.handlers.dutchie_handler import DutchieHandler
+from app.handlers.iheartjane_handler import IHeartJaneHandler
+from app.services.selectors_service import SelectorsService
+
+HANDLER_CLASSES = (DutchieHandler, IHeartJaneHandler)
+
+
+class HandlerRegistry:
+    """
+    One handler per bot, built once: the bot's selectors are validated and their references
+    resolved, then the handler is frozen and shared by all the requests. Bots are indexed by
+    the 'domains' of their selectors JSON, a URL's host matching one of them exactly or as a
+    subdomain (e.g. 'www.dutchie.com' for 'dutchie.com').
+    """
+
+    def __init__(self, handler_classes: Iterable[Type[BaseHandlerRefactor]] = HANDLER_CLASSES):
+        self.handlers: Dict[str, BaseHandlerRefactor] = {}
+        self._domains: Dict[str, BaseHandlerRefactor] = {}
+        self._hosts: Dict[str, BaseHandlerRefactor] = {}
+        for handler_class in handler_classes:
+            self.register(handler_class)
+
+    def register(self, handler_class: Type[BaseHandlerRefactor]) -> BaseHandlerRefactor:
+        bot_name = handler_class.bot_name
+        errors = self.validate(bot_name, SelectorsService.get_selectors(bot_name), handler_class.REQUIRED_SELECTORS)
+        if errors:
+            raise ValueError(f"Invalid selectors for bot '{bot_name}': " + "; ".join(errors))
+        bot_selectors = SelectorsService.resolve_references(bot_name)
+
+        handler = handler_class().freeze()
+        self.handlers[bot_name] = handler
+        for domain in bot_selectors["domains"]:
+            domain = domain.lower()
+            if domain in self._domains and self._domains[domain] is not handler:
+                raise ValueError(f"Domain {domain} of bot '{bot_name}' is already registered for bot '{self._domains[domain].bot_name}'")
+            self._domains[domain] = handler
+        return handler
+
+    @staticmethod
+    def validate(bot_name: str, bot_selectors: Dict[str, Any], required: Dict[str, Iterable[str]]) -> List[str]:
+        """
+        Problems of a bot's selectors: missing domains, sections or required selectors.
+        """
+        errors = []
+        domains = bot_selectors.get("domains")
+        if not domains or not isinstance(domains, list) or not all(isinstance(domain, str) and domain for domain in domains):
+            errors.append("'domains' must be a non-empty list of host names")
+        selectors = bot_selectors.get("selectors")
+        if not isinstance(selectors, dict):
+            return errors + ["'selectors' is missing"]
+        for section, keys in required.items():
+            if not isinstance(selectors.get(section), dict):
+                errors.append(f"section '{section}' is missing")
+                continue
+            missing = [key for key in keys if key not in selectors[section]]
+            if missing:
+                errors.append(f"section '{section}' misses {', '.join(missing)}")
+        return errors
+
+    @staticmethod
+    def _host(url: str) -> str:
+        parts = urlsplit(url if "//" in url else f"//{url}")
+        return (parts.hostname or "").lower()
+
+    def find(self, url: str) -> Optional[BaseHandlerRefactor]:
+        host = self._host(url)
+        handler = self._hosts.get(host)
+        if handler is not None:
+            return handler
+        # The host itself, then its parent domains
+        labels = host.split(".")
+        for start in range(len(labels) - 1):
+            handler = self._domains.get(".".join(labels[start:]))
+            if handler is not None:
+                self._hosts[host] = handler
+                return handler
+        return None
+
+    def get_bot_handler(self, website_url: str) -> BaseHandlerRefactor:
+        handler = self.find(website_url)
+        if handler is None:
+            raise ValueError(
+                f"No bot handler available for the website: {website_url}"
+            )
+        return handler
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bots": sorted(self.handlers),
+            "domains": {domain: handler.bot_name for domain, handler in sorted(self._domains.items())},
+            "hosts_seen": len(self._hosts),
+        }
@@ -1,23 +1,45 @@
-from app.handlers.base_handler import BaseHandlerRefactor
+from app.handlers.base_handler import BaseHandlerRefactor, Outcome
 from app.services.selectors_service import SelectorsService
+from app.utils.response_capture import PayloadCapture
 from playwright.async_api import Page
 from playwright._impl._errors import TimeoutError
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 from sqlalchemy.orm import Session
 from app.model.models import Product
-from app.model.checkout_options import CheckoutOptions
+from app.model.checkout_options import CheckoutOptions, CheckoutOptionsV2
 from fastapi import status
 import random
 import asyncio
 import os
+import re
+import time
+
+PRODUCT_ID = re.compile(r"/products/(\d+)")
+
+# Weights of the menu product API, as the product page labels its variants
+WEIGHT_LABELS = {
+    "half gram": "0.5g",
+    "gram": "1g",
+    "two gram": "2g",
+    "eighth ounce": "1/8oz",
+    "quarter ounce": "1/4oz",
+    "half ounce": "1/2oz",
+    "ounce": "1oz",
+    "each": None,
+}
+
+# Upload fields of the customer information step, asked by medical stores
+ID_UPLOAD_FIELDS = [
+    {"label": "Government ID upload required", "type": "file"},
+    {"label": "Medical front of card upload required", "type": "file"},
+    {"label": "Medical back of card upload required", "type": "file"},
+]
 
 class IHeartJaneHandler(BaseHandlerRefactor):
     """
     iHeartJane Add Cart Handler - Handles adding products to the cart on the iHeartJane website.
     """
-    def __init__(self):
-        self.bot_name = "iheartjane"
-        super().__init__()
+    bot_name = "iheartjane"
 
     def _get_bot_name(self):
         return "iheartjane"
@@ -63,13 +85,17 @@ class IHeartJaneHandler(BaseHandlerRefactor):
         }
         return order_details
 
+    async def _place_order_details_v2(self, page: Page, checkout_options: CheckoutOptionsV2):
+        await self.raise_http_exception("Checkout options v2 are not supported for iHeartJane yet", status_code=status.HTTP_501_NOT_IMPLEMENTED)
+
     async def _initial_checks(self, page: Page):
         # Handle age restriction
         await self._handle_extra_modal(
             page,
             modal_selector=self.selectors["add_to_cart"]["age_rstr_container"],
             button_selector=self.selectors["add_to_cart"]["age_rstr_btn"],
-            timeout=2000
+            timeout=2000,
+            watcher="age_gate"
         )
 
         # Handle user preferences/location modal
@@ -77,7 +103,8 @@ class IHeartJaneHandler(BaseHandlerRefactor):
             page,
             modal_selector=self.selectors["add_to_cart"]["user_pref_container"],
             button_selector=self.selectors["add_to_cart"]["user_pref_container_dismiss_button"],
-            timeout=2000
+            timeout=2000,
+            watcher="user_preferences"
         )
 
         await self._check_not_available(
@@ -86,17 +113,12 @@ class IHeartJaneHandler(BaseHandlerRefactor):
             )
 
     async def _bag_check(self, page: Page):
-        # Modal check for other dispensary products in cart
-        await self._handle_imp_modal(
-            page,
-            modal_selector=self.selectors["add_to_cart"]["clear_cart_selector"],
-            exc_message="Clear the cart before adding products from a new dispensary",
-            timeout=2000
-        )
-        
-        cart_drawer = page.locator(self.selectors["add_to_cart"]["bag_check_selector"])
-        flag = await cart_drawer.is_visible(timeout=2000)
-        if not flag:
+        # The cart drawer opens by itself, unless products of another dispensary are in the cart
+        outcome = await self._race_outcomes(page, [
+            Outcome("drawer_open", self.selectors["add_to_cart"]["bag_check_selector"]),
+            Outcome("clear_cart", self.selectors["add_to_cart"]["clear_cart_selector"], "Clear the cart before adding products from a new dispensary"),
+        ], timeout=2000)
+        if outcome is None:
             await self._click_on_cart(page)
 
     async def _select_quantity(self, page: Page, quantity: int, exst_quantity: Optional[int]):
@@ -227,8 +249,8 @@ class IHeartJaneHandler(BaseHandlerRefactor):
             # Check if the selected continue button is visible
             await continue_button.wait_for(state='visible', timeout=timeout)
 
-            # Check if the Continue button is disabled
-            await asyncio.sleep(3)
+            # Check if the Continue button is disabled, once the form validation is done
+            await self._wait_until_settled(page, max_wait=3000)
             is_disabled = await continue_button.get_attribute("disabled") is not None
 
             if is_disabled:
@@ -256,6 +278,14 @@ class IHeartJaneHandler(BaseHandlerRefactor):
 
 
     async def _fetch_checkout_options(self, page: Page) -> Dict[str, Any]:
+        # The store and reservation data the checkout page fetched spare walking through its steps
+        capture = self.response_capture.attach(page)
+        if capture is not None:
+            checkout_options = await self._checkout_options_from_responses(capture)
+            self.response_capture.record_served("checkout_options", checkout_options is not None)
+            if checkout_options is not None:
+                return checkout_options
+
         pickup_button_selector = self.selectors["checkout_fetch"].get("pickup_button")
         selected_order_type = "pickup"
 
@@ -273,35 +303,17 @@ class IHeartJaneHandler(BaseHandlerRefactor):
         if not accordion_content:
             return {"error": "Accordion content not found"}
 
-        # Annotate pickup slots with type
+        timings = {}
         pickup_options_selector = self.selectors["checkout_fetch"]["pickup_options_selector"]
         await page.wait_for_selector(pickup_options_selector, timeout=5000)
-        pickup_options_element = await page.query_selector(pickup_options_selector)
-
-        pickup_slots = []
-        option_elements = await pickup_options_element.query_selector_all("option")
-        for option in option_elements:
-            option_text = await option.inner_text()
-            pickup_slots.append({"label": option_text, "type": "select"})
 
-        # Annotate pickup instructions with type
-        checkbox_selector = self.selectors["checkout_fetch"]["checkbox_selector"]
-        checkboxes = await accordion_content.query_selector_all(checkbox_selector)
-        for checkbox in checkboxes:
-            if not await checkbox.is_checked():
-                await checkbox.click()
-
-        pickup_instructions_class = self.selectors["checkout_fetch"]["pickup_instructions_class"]
-        pickup_instructions_container = await page.query_selector(pickup_instructions_class)
-        pickup_instructions_selector = self.selectors["checkout_fetch"]["pickup_instructions_selector"]
-
-        if not pickup_instructions_container:
-            pickup_instructions_texts = [{"label": "Pickup instructions container not found", "type": ""}]
-        else:
-            pickup_instruction_elements = await pickup_instructions_container.query_selector_all(pickup_instructions_selector)
-            pickup_instructions_texts = [{"label": await elem.inner_text(), "type": "checkbox"} for elem in pickup_instruction_elements] if pickup_instruction_elements else [{"label": "No pickup instructions", "type": ""}]
+        # The pickup options are read while the consent checkboxes get ticked
+        (pickup_slots, pickup_instructions_texts), _ = await asyncio.gather(
+            self.dom_extractor.timed(timings, "pickup_options", self._fetch_pickup_options(page)),
+            self.dom_extractor.timed(timings, "pickup_consent", self._check_pickup_consent(accordion_content)),
+        )
 
-        await self._click_continue(page, timeout=2000, button_index=0)
+        await self.dom_extractor.timed(timings, "continue_to_customer_info", self._click_continue(page, timeout=2000, button_index=0))
 
         accordion_content_info_selector = self.selectors["checkout_fetch"]["accordion_content_info_selector"]
         accordion_content_info = await page.wait_for_selector(accordion_content_info_selector, timeout=5000)
@@ -309,11 +321,7 @@ class IHeartJaneHandler(BaseHandlerRefactor):
         # Annotate customer info with type
         customer_info = []
         if accordion_content_info:
-            label_elem = self.selectors["checkout_fetch"]["label_elem"]
-            label_elements = await accordion_content_info.query_selector_all(label_elem)
-            for label in label_elements:
-                label_text = await label.inner_text()
-                customer_info.append({"label": label_text, "type": "input"})
+            customer_info = await self.dom_extractor.timed(timings, "customer_info", self._fetch_customer_labels(page, accordion_content_info))
 
         # Annotate file upload fields
         gov_id_path = "static_file/government_id.jpg"
@@ -336,6 +344,7 @@ class IHeartJaneHandler(BaseHandlerRefactor):
             'mmj_id': str(random.randint(100000000, 999999999))
         }
 
+        form_started = time.perf_counter()
         for index, file_info in enumerate(file_paths):
             file_path = file_info["path"]
 
@@ -358,13 +367,93 @@ class IHeartJaneHandler(BaseHandlerRefactor):
         await self._fill_field(page, self.selectors["checkout_fetch"].get('mobile_phone'), dummy_data['mobile_phone'])
         await self._fill_field(page, self.selectors["checkout_fetch"].get('birthdate'), dummy_data['birthdate'])
 
-        await self._click_continue(page, timeout=5000, button_index=1)
+        timings["customer_form"] = round((time.perf_counter() - form_started) * 1000, 1)
+
+        await self.dom_extractor.timed(timings, "continue_to_payment", self._click_continue(page, timeout=5000, button_index=1))
 
         # Annotate payment details with type
         payment_details = []
         payment_accordion_selector = self.selectors["checkout_fetch"]["payment_accordion_selector"]
         payment_accordion = await page.wait_for_selector(payment_accordion_selector, timeout=5000)
 
+        if payment_accordion:
+            payment_details = await self.dom_extractor.timed(timings, "payment_details", self._fetch_payment_details(page, payment_accordion))
+
+        self.dom_extractor.record_sections("checkout_options", timings)
+
+        checkout_options = CheckoutOptions(
+            pickup_slots=pickup_slots,
+            pickup_instructions=pickup_instructions_texts,
+            customer_info=customer_info,
+            payment_details=payment_details
+        )
+
+        return checkout_options.to_dict()
+
+    async def _fetch_pickup_options(self, page: Page):
+        """
+        Returns the pickup slots and the pickup instructions, annotated with their type.
+        """
+        pickup = await self.dom_extractor.extract_one(page, "checkout_pickup")
+        if pickup is not None:
+            pickup_slots = [{"label": label, "type": "select"} for label in pickup["slots"]]
+            if not pickup["has_instructions"]:
+                pickup_instructions_texts = [{"label": "Pickup instructions container not found", "type": ""}]
+            else:
+                pickup_instructions_texts = [{"label": label, "type": "checkbox"} for label in pickup["instructions"]] or [{"label": "No pickup instructions", "type": ""}]
+            return pickup_slots, pickup_instructions_texts
+
+        pickup_options_selector = self.selectors["checkout_fetch"]["pickup_options_selector"]
+        pickup_options_element = await page.query_selector(pickup_options_selector)
+
+        pickup_slots = []
+        option_elements = await pickup_options_element.query_selector_all("option")
+        for option in option_elements:
+            option_text = await option.inner_text()
+            pickup_slots.append({"label": option_text, "type": "select"})
+
+        pickup_instructions_class = self.selectors["checkout_fetch"]["pickup_instructions_class"]
+        pickup_instructions_container = await page.query_selector(pickup_instructions_class)
+        pickup_instructions_selector = self.selectors["checkout_fetch"]["pickup_instructions_selector"]
+
+        if not pickup_instructions_container:
+            pickup_instructions_texts = [{"label": "Pickup instructions container not found", "type": ""}]
+        else:
+            pickup_instruction_elements = await pickup_instructions_container.query_selector_all(pickup_instructions_selector)
+            pickup_instructions_texts = [{"label": await elem.inner_text(), "type": "checkbox"} for elem in pickup_instruction_elements] if pickup_instruction_elements else [{"label": "No pickup instructions", "type": ""}]
+
+        return pickup_slots, pickup_instructions_texts
+
+    async def _check_pickup_consent(self, accordion_content):
+        checkbox_selector = self.selectors["checkout_fetch"]["checkbox_selector"]
+        checkboxes = await accordion_content.query_selector_all(checkbox_selector)
+        for checkbox in checkboxes:
+            if not await checkbox.is_checked():
+                await checkbox.click()
+
+    async def _fetch_customer_labels(self, page: Page, accordion_content_info) -> List[Dict[str, str]]:
+        customer_labels = await self.dom_extractor.extract_one(page, "checkout_customer_info")
+        if customer_labels is not None:
+            return [{"label": label, "type": "input"} for label in customer_labels["labels"]]
+
+        customer_info = []
+        label_elem = self.selectors["checkout_fetch"]["label_elem"]
+        label_elements = await accordion_content_info.query_selector_all(label_elem)
+        for label in label_elements:
+            label_text = await label.inner_text()
+            customer_info.append({"label": label_text, "type": "input"})
+        return customer_info
+
+    async def _fetch_payment_details(self, page: Page, payment_accordion) -> List[Dict[str, str]]:
+        payments = await self.dom_extractor.extract_one(page, "checkout_payments")
+        if payments is not None:
+            payment_details = [{"label": "JanePay", "type": "radio"}] if payments["jane_pay"] else []
+            for button in payments["buttons"]:
+                if button["id"] and button["id"] != "accordion-item-jane_pay" and "Pay by linking" not in button["label"]:
+                    payment_details.append({"label": button["label"].strip(), "type": "radio"})
+            return payment_details
+
+        payment_details = []
         if payment_accordion:
             jane_pay_selector = self.selectors["checkout_fetch"]["jane_pay_selector"]
             jane_pay_option = await payment_accordion.query_selector(jane_pay_selector)
@@ -380,15 +469,152 @@ class IHeartJaneHandler(BaseHandlerRefactor):
                         button_text = await button.inner_text()
                         payment_details.append({"label": button_text.strip(), "type": "radio"})
 
+        return payment_details
+
+    async def _variations_from_responses(self, capture: PayloadCapture, product_url: str) -> Optional[Dict[str, Any]]:
+        product = await capture.wait_for("product", lambda payload: self._find_product(payload, product_url))
+        if product is None:
+            return None
+        store = await capture.wait_for("store", self._find_store)
+        options = self._product_options(product)
+        if store is None or not options:
+            # Without a priced weight the product page tells if it is out of stock
+            return None
+
+        variants = []
+        for option, price, msrp in options:
+            variant_details = {"price": f"${price:.2f}"}
+            if msrp != price:
+                variant_details["msrp"] = f"${msrp:.2f}"
+            if option:
+                variant_details = {"variant_name": option, **variant_details}
+            variants.append(variant_details)
+
+        return {
+            "variations": {
+                "dispensary_name": store.get("name"),
+                "dispensary_image_url": store.get("photo"),
+                "product_name": product.get("name"),
+                "product_image_url": (product.get("image_urls") or [None])[0],
+                "variants": variants,
+            }
+        }
+
+    async def _price_from_responses(self, capture: PayloadCapture, product_url: str, product_variant: Optional[str]) -> Optional[Tuple[float, float]]:
+        product = await capture.wait_for("product", lambda payload: self._find_product(payload, product_url), timeout=0)
+        if product is None:
+            return None
+        for option, price, msrp in self._product_options(product):
+            if not product_variant or option == product_variant:
+                return price, msrp
+        return None
+
+    async def _cart_from_responses(self, capture: PayloadCapture, wait: bool = False, after: int = 0) -> Optional[Dict[str, Any]]:
+        if wait:
+            return await capture.wait_for("cart", self._find_cart, after=after)
+        return capture.latest("cart", self._find_cart)
+
+    async def _checkout_options_from_responses(self, capture: PayloadCapture) -> Optional[Dict[str, Any]]:
+        store = await capture.wait_for("store", self._find_store)
+        reservation = await capture.wait_for("checkout", self._find_reservation)
+        if store is None or reservation is None:
+            return None
+
+        customer_info = [{"label": label, "type": "input"} for label in self.response_capture.config.get("customer_fields", [])]
+        if store.get("medical"):
+            customer_info.extend(dict(field) for field in ID_UPLOAD_FIELDS)
+        payment_details = [
+            {"label": "JanePay" if option == "jane_pay" else option.replace("_", " ").title(), "type": "radio"}
+            for option in store.get("store_payment_options") or []
+        ]
+        instructions = reservation.get("consent_items") or []
+
         checkout_options = CheckoutOptions(
-            pickup_slots=pickup_slots,
-            pickup_instructions=pickup_instructions_texts,
+            pickup_slots=[{"label": slot, "type": "select"} for slot in reservation["slots"]],
+            pickup_instructions=[{"label": label, "type": "checkbox"} for label in instructions] or [{"label": "No pickup instructions", "type": ""}],
             customer_info=customer_info,
             payment_details=payment_details
         )
-
         return checkout_options.to_dict()
 
+    @staticmethod
+    def _menu_products(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Menu products of a product API response or of an Algolia search response.
+        """
+        for key in ("menu_product", "product"):
+            if isinstance(payload.get(key), dict):
+                return [payload[key]]
+        if "results" in payload:
+            return [hit for result in payload["results"] for hit in result.get("hits", [])]
+        return payload.get("hits") or payload.get("products") or []
+
+    @classmethod
+    def _find_product(cls, payload: Dict[str, Any], product_url: str) -> Optional[Dict[str, Any]]:
+        product_id = PRODUCT_ID.search(product_url)
+        if not product_id:
+            return None
+        for product in cls._menu_products(payload):
+            if str(product.get("product_id", product.get("id"))) == product_id.group(1):
+                return product
+        return None
+
+    @staticmethod
+    def _find_store(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return payload["store"] if isinstance(payload.get("store"), dict) else None
+
+    @staticmethod
+    def _product_options(product: Dict[str, Any]) -> List[Tuple[Optional[str], float, float]]:
+        """
+        (option, price, msrp) of each priced weight, the discounted price when there is one.
+        """
+        result = []
+        for weight in product.get("available_weights") or ["each"]:
+            key = weight.replace(" ", "_")
+            msrp = product.get(f"price_{key}")
+            if msrp is None:
+                continue
+            discounted = product.get(f"discounted_price_{key}")
+            price = float(discounted) if discounted else float(msrp)
+            result.append((WEIGHT_LABELS.get(weight, weight), price, float(msrp)))
+        return result
+
+    @staticmethod
+    def _find_cart(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Cart items of a cart response: its products with the weight ('price_id') and count chosen.
+        """
+        cart = payload["cart"]
+        items = []
+        for product in cart["products"]:
+            weight = product.get("price_id") or "each"
+            key = weight.replace(" ", "_")
+            unit_price = product.get(f"discounted_price_{key}") or product.get(f"price_{key}")
+            items.append({
+                "item_name": product["name"],
+                "product_variant": WEIGHT_LABELS.get(weight, weight),
+                "item_price": f"${float(unit_price) * product['count']:.2f}" if unit_price is not None else None,
+                "item_quantity": str(product["count"]),
+            })
+        subtotal = cart.get("subtotal")
+        return {"items": items, "subtotal": f"{float(subtotal):.2f}" if subtotal is not None else None}
+
+    @staticmethod
+    def _find_reservation(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Pickup slots and consent items of a reservation response, labelled as the checkout shows them.
+        """
+        reservation = payload.get("reservation") or payload.get("checkout")
+        if not isinstance(reservation, dict):
+            return None
+        slots = reservation.get("pickup_slots") or reservation.get("reservation_slots")
+        if not slots:
+            return None
+        return {
+            "slots": [slot if isinstance(slot, str) else slot["label"] for slot in slots],
+            "consent_items": [item if isinstance(item, str) else item["label"] for item in reservation.get("consent_items") or []],
+        }
+
     async def _extract_variation_price_and_msrp(self, page, variation_element):
         product_details = await page.query_selector(self.selectors["variant"]["product_details"])
         price_element = await product_details.query_selector(self.selectors["variant"]["variant_price_selector"])
@@ -1,26 +1,107 @@
 import os
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
-from .dependencies import initialize_services, get_playwright_utils
+from app.config import Config
+from app.utils.step_timing import collect_steps, server_timing
+from app.utils.tracing import FileExporter, OtlpExporter, RatioSampler, tracer
+from .dependencies import initialize_services, get_playwright_utils, get_cart_affinity, get_varaint_service, get_request_metrics
 
 @asynccontextmanager
 async def lifespan(application: FastAPI):
     # Startup event
     print("Startup event triggered")
     initialize_services()
+    if Config.TRACING_EXPORTER in ("file", "otlp"):
+        if Config.TRACING_EXPORTER == "file":
+            exporter = FileExporter(Config.TRACING_FILE)
+        else:
+            exporter = OtlpExporter(Config.TRACING_OTLP_ENDPOINT, Config.TRACING_SERVICE_NAME)
+        tracer.configure(exporter, RatioSampler(Config.TRACING_SAMPLE_RATIO), flush_interval=Config.TRACING_FLUSH_INTERVAL)
+        await tracer.start()
     playwright_utils = await get_playwright_utils()
     await playwright_utils.start()
+    cart_affinity = await get_cart_affinity()
+    if cart_affinity:
+        await cart_affinity.start()
 
     yield
     # Shutdown event
     print("Shutdown event triggered")
+    if cart_affinity:
+        # Leaving the registry hands this node's carts over right away
+        await cart_affinity.stop()
+    await (await get_varaint_service()).close()
     await playwright_utils.stop()
+    await tracer.stop()
 
 # Creation of FastAPI application
 app = FastAPI(lifespan=lifespan)
 
+
+@app.middleware("http")
+async def route_by_cart(request: Request, call_next):
+    cart_affinity = await get_cart_affinity()
+    if cart_affinity is None:
+        return await call_next(request)
+    return await cart_affinity.dispatch(request, call_next)
+
+
+@app.middleware("http")
+async def summarize_steps(request: Request, call_next):
+    """
+    Logs the handler steps a request went through and returns them in a Server-Timing header.
+    """
+    if not Config.STEP_TIMING:
+        return await call_next(request)
+    started = time.perf_counter()
+    status_code = 500
+    with collect_steps() as steps:
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            if steps:
+                response.headers["Server-Timing"] = server_timing(steps)
+            return response
+        finally:
+            if steps:
+                summary = " ".join(f"{step['step']}={step['ms']:.0f}ms({step['outcome']})" for step in steps)
+                print(f"{request.method} {request.url.path} {status_code} in {(time.perf_counter() - started) * 1000:.0f}ms: {summary}")
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    return await (await get_request_metrics()).dispatch(request, call_next)
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """
+    Root span of a request, continuing the caller's trace when it sends a traceparent header.
+    """
+    if not tracer.enabled:
+        return await call_next(request)
+    with tracer.span(f"{request.method} {request.url.path}", {"http.method": request.method}, tracer.extract(request.headers.get("traceparent"))) as span:
+        response = await call_next(request)
+        # Named after the route template once routed, the path holds ids
+        route = request.scope.get("route")
+        if route is not None:
+            span.name = f"{request.method} {route.path}"
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("cart_id", request.scope.get("path_params", {}).get("cart_id"))
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.error = f"HTTP {response.status_code}"
+        if span.recording:
+            response.headers["traceparent"] = span.traceparent
+        return response
+
+# Registered last so it is the outermost middleware: preflights are answered and the
+# responses of the middlewares above (e.g. a cart affinity redirect) get CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,4 +109,5 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
 app.include_router(router)
@@ -1,5 +1,5 @@
 from typing import List
-from sqlalchemy import Boolean, Column, ForeignKey, String, Integer, Float, JSON, Date, Enum
+from sqlalchemy import Boolean, Column, ForeignKey, String, Integer, Float, JSON, Date, DateTime, Enum
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -44,4 +44,12 @@ class Order(Base):
     order_type: Mapped[str] = mapped_column(String())       # Pickup, Drive-thru, pick-up, etc
     payment_type: Mapped[str] = mapped_column(String())     # Cash, Credit card, Debit card, etc
     pickup_time: Mapped[str] = mapped_column(String())
-    cart: Mapped["Cart"] = relationship("Cart")
\ No newline at end of file
+    cart: Mapped["Cart"] = relationship("Cart")
+
+class ApiNode(Base):
+    __tablename__ = "api_nodes"
+
+    node_id: Mapped[str] = mapped_column(String(), primary_key=True)
+    address: Mapped[str] = mapped_column(String())          # Internal base URL, e.g. http://10.0.1.12:8000
+    started_at = mapped_column(DateTime(timezone=True))
+    heartbeat_at = mapped_column(DateTime(timezone=True))
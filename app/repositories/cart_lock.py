@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# What to do with a request identical to one already running on the same cart
+DUPLICATE_POLICIES = ("wait", "coalesce", "reject")
+
+
+def advisory_key(cart_id: uuid.UUID) -> int:
+    """
+    Folds a cart UUID into the signed 64-bit key space of pg_advisory_lock.
+    """
+    raw = uuid.UUID(str(cart_id)).bytes
+    high = int.from_bytes(raw[:8], "big", signed=True)
+    low = int.from_bytes(raw[8:], "big", signed=True)
+    return high ^ low
+
+
+class CartLockManager:
+    """
+    Serializes the work done on a cart across tasks, processes and nodes. Callers of this
+    process queue on an asyncio lock first, then the holder takes a session-level Postgres
+    advisory lock on a dedicated connection, polled with pg_try_advisory_lock until the wait
+    timeout. Identical in-flight requests can wait their turn, share the running one's result
+    (coalesce) or be rejected. The lock connections come from engine, which should not be the
+    one the request sessions pool from (see PostgresRepo).
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        wait_timeout: float = 30.0,
+        poll_interval: float = 0.1,
+        duplicates: str = "coalesce",
+    ):
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy {duplicates}, expected one of {DUPLICATE_POLICIES}")
+        self.engine = engine
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.duplicates = duplicates
+        self.advisory = engine.dialect.name == "postgresql"
+
+        self._local_locks: Dict[int, asyncio.Lock] = {}
+        self._local_users: Dict[int, int] = {}
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+        self._acquired = 0
+        self._timeouts = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._contended = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def run(
+        self,
+        cart_id: uuid.UUID,
+        work: Callable[[], Awaitable[Any]],
+        fingerprint: Optional[Hashable] = None,
+    ) -> Any:
+        """
+        Runs work while holding the cart lock.
+        :param fingerprint: Identifies identical requests (e.g. operation and its arguments)
+                            for the duplicate policy, None to always wait.
+        """
+        duplicate_key = (str(cart_id), fingerprint) if fingerprint is not None else None
+        running = self._in_flight.get(duplicate_key) if duplicate_key else None
+        if running is not None and self.duplicates == "coalesce":
+            self._coalesced += 1
+            return await asyncio.shield(running)
+        if running is not None and self.duplicates == "reject":
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"status": "error", "message": "The same request is already in progress for this cart"},
+            )
+
+        result = None
+        if duplicate_key and running is None:
+            result = asyncio.get_running_loop().create_future()
+            self._in_flight[duplicate_key] = result
+        try:
+            async with self._hold(advisory_key(cart_id)):
+                value = await work()
+            if result is not None:
+                result.set_result(value)
+            return value
+        except BaseException as e:
+            if result is not None:
+                result.set_exception(e if isinstance(e, Exception) else HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={"status": "error", "message": "The identical request was interrupted, try again"},
+                ))
+                # Mark it retrieved, nobody may be waiting on it
+                result.exception()
+            raise
+        finally:
+            if result is not None:
+                self._in_flight.pop(duplicate_key, None)
+
+    @asynccontextmanager
+    async def _hold(self, key: int):
+        started = time.monotonic()
+        local_lock = self._local_locks.setdefault(key, asyncio.Lock())
+        self._local_users[key] = self._local_users.get(key, 0) + 1
+        if self._local_users[key] > 1:
+            self._contended += 1
+        try:
+            try:
+                await asyncio.wait_for(local_lock.acquire(), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise self._busy()
+            try:
+                connection = await self._lock_advisory(key, started + self.wait_timeout) if self.advisory else None
+                waited = time.monotonic() - started
+                self._acquired += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                try:
+                    yield
+                finally:
+                    if connection is not None:
+                        await asyncio.to_thread(self._unlock, connection, key)
+            finally:
+                local_lock.release()
+        finally:
+            self._local_users[key] -= 1
+            if self._local_users[key] <= 0:
+                del self._local_users[key]
+                self._local_locks.pop(key, None)
+
+    async def _lock_advisory(self, key: int, deadline: float):
+        connection = await asyncio.to_thread(self.engine.connect)
+        try:
+            while not await asyncio.to_thread(self._try_lock, connection, key):
+                if time.monotonic() >= deadline:
+                    raise self._busy()
+                await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            # The lock may have been granted while we were interrupted, dropping the session releases it
+            connection.invalidate()
+            connection.close()
+            raise
+        return connection
+
+    def _busy(self) -> HTTPException:
+        self._timeouts += 1
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"status": "error", "message": "Cart is busy with another request, try again later"},
+            headers={"Retry-After": "1"},
+        )
+
+    @staticmethod
+    def _try_lock(connection, key: int) -> bool:
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        # Keep the connection out of a transaction while the lock is held
+        connection.commit()
+        return bool(locked)
+
+    @staticmethod
+    def _unlock(connection, key: int):
+        try:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+            connection.commit()
+        except Exception as e:
+            # Session-level locks go away with the session, drop the connection instead of pooling it
+            print(f"Failed to release advisory lock {key}: {e}")
+            connection.invalidate()
+        connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "advisory": self.advisory,
+            "held": sum(1 for lock in self._local_locks.values() if lock.locked()),
+            "acquired": self._acquired,
+            "contended": self._contended,
+            "timeouts": self._timeouts,
+            "coalesced": self._coalesced,
+            "rejected_duplicates": self._rejected,
+            "wait_avg_ms": round(self._wait_total / self._acquired * 1000, 2) if self._acquired else 0.0,
+            "wait_max_ms": round(self._wait_max * 1000, 2),
+        }
+
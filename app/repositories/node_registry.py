@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.model.models import ApiNode
+
+
+class NodeRegistry:
+    """
+    Membership of the API nodes sharing the database. Every node upserts its row in api_nodes
+    on a heartbeat and reads back the nodes seen alive within the ttl; a node leaving cleanly
+    deletes its row, a crashed one drops out once its heartbeat expires. on_change is called
+    with the new {node_id: address} map whenever the membership changes.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        node_id: str,
+        address: str,
+        heartbeat_interval: float = 5.0,
+        ttl: float = 15.0,
+        on_change: Optional[Callable[[Dict[str, str]], None]] = None,
+    ):
+        self.engine = engine
+        self.node_id = node_id
+        self.address = address
+        self.heartbeat_interval = heartbeat_interval
+        self.ttl = ttl
+        self.on_change = on_change
+        self.started_at = datetime.now(timezone.utc)
+        self.nodes: Dict[str, str] = {}
+
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.heartbeats = 0
+        self.failures = 0
+        self.changes = 0
+
+    async def start(self):
+        await asyncio.to_thread(self.heartbeat)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        try:
+            await asyncio.to_thread(self.leave)
+        except Exception as e:
+            print(f"Failed to leave the node registry: {e}")
+
+    def heartbeat(self) -> Dict[str, str]:
+        """
+        Refreshes this node's row and returns the live nodes.
+        """
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as session:
+            node = session.get(ApiNode, self.node_id)
+            if node is None:
+                session.add(ApiNode(node_id=self.node_id, address=self.address, started_at=self.started_at, heartbeat_at=now))
+            else:
+                node.address = self.address
+                node.heartbeat_at = now
+            # Rows of nodes gone for a while are only noise
+            session.query(ApiNode).filter(ApiNode.heartbeat_at < now - timedelta(seconds=self.ttl * 10)).delete()
+            session.commit()
+
+            live = (session.query(ApiNode)
+                    .filter(ApiNode.heartbeat_at >= now - timedelta(seconds=self.ttl))
+                    .all())
+            nodes = {node.node_id: node.address for node in live}
+
+        self.heartbeats += 1
+        self._update(nodes)
+        return nodes
+
+    def leave(self):
+        with Session(self.engine) as session:
+            session.query(ApiNode).filter(ApiNode.node_id == self.node_id).delete()
+            session.commit()
+        self._update({})
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await asyncio.to_thread(self.heartbeat)
+            except Exception as e:
+                # Keep the last known membership, peers expire this node if it stays unreachable
+                self.failures += 1
+                print(f"Node heartbeat failed: {e}")
+
+    def _update(self, nodes: Dict[str, str]):
+        if nodes == self.nodes:
+            return
+        self.nodes = nodes
+        self.changes += 1
+        if self.on_change:
+            self.on_change(dict(nodes))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "node_id": self.node_id,
+            "address": self.address,
+            "nodes": sorted(self.nodes),
+            "heartbeats": self.heartbeats,
+            "heartbeat_failures": self.failures,
+            "membership_changes": self.changes,
+        }
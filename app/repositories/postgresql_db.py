@@ -1,14 +1,23 @@
 from fastapi import HTTPException, status
 from app.model.models import Cart, Product, Order, CartStatus
+from app.repositories.cart_lock import CartLockManager
+from app.utils.metrics import TimedQueuePool
+from app.utils.tracing import instrument_engine
 from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 import uuid
 from typing import Optional
 from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
 class PostgresRepo:
-    def __init__(self, postgres_url: str):
-        self.engine = create_engine(postgres_url)
+    def __init__(self, postgres_url: str, cart_lock_timeout: float = 30.0, cart_lock_duplicates: str = "coalesce"):
+        self.engine = create_engine(postgres_url, poolclass=TimedQueuePool)
+        instrument_engine(self.engine)
+        # An advisory lock pins its connection for the whole cart operation, lock holders get
+        # their own connections so they cannot drain the pool the request sessions use
+        self.lock_engine = create_engine(postgres_url, poolclass=NullPool)
+        self.cart_locks = CartLockManager(self.lock_engine, wait_timeout=cart_lock_timeout, duplicates=cart_lock_duplicates)
 
     def create_session(self):
         return Session(self.engine)
@@ -58,6 +67,9 @@ class PostgresRepo:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cart ID {cart_id} is {cart.status.value}")
         return cart
 
+    async def get_active_carts(self, session: Session, limit: int = 100):
+        return session.query(Cart).filter(Cart.status == CartStatus.active).limit(limit).all()
+
     async def delete_cart(self, session: Session, cart_id: uuid):
         session.query(Product).filter_by(cart_id=cart_id).delete()
         session.query(Order).filter_by(cart_id=cart_id).delete()
@@ -1,7 +1,7 @@
 from app.repositories.postgresql_db import PostgresRepo
 from app.utils.playwright_utils import PlaywrightUtils
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import traceback
 import uuid
 from app.model.models import CartStatus
@@ -9,18 +9,23 @@ from fastapi import HTTPException,status
 from urllib.parse import urlparse
 from fastapi import HTTPException
 from app.handlers.handler_factory import HandlerFactory
+from app.utils.admission import AdmissionController, admission_slot
+from app.utils.tracing import traced
 
 class AddCartService:
     def __init__(
         self,
         psql_repo: PostgresRepo,
         playwright_utils: PlaywrightUtils,
-        handler_factory: HandlerFactory
+        handler_factory: HandlerFactory,
+        admission_controller: Optional[AdmissionController] = None
     ):
         self.psql_repo = psql_repo
         self.playwright_utils = playwright_utils
         self.handler_factory = handler_factory
+        self.admission_controller = admission_controller
 
+    @traced("AddCartService.add_to_cart", ("cart_id", "product_url"))
     async def add_to_cart(
         self,
         psql_session: Session,
@@ -28,6 +33,24 @@ class AddCartService:
         product_url: str,
         product_variant: str,
         quantity: int,
+    ) -> Dict[str, Any]:
+        # Requests on the same cart run one at a time, identical ones (e.g. a double click) are deduplicated.
+        # The admission slot is only taken once the cart is ours, waiting on it does not hold a browser.
+        async def work():
+            async with admission_slot(self.admission_controller, "add_product"):
+                return await self._add_to_cart(psql_session, cart_id, product_url, product_variant, quantity)
+
+        return await self.psql_repo.cart_locks.run(
+            cart_id, work, fingerprint=("add_product", product_url, product_variant, quantity)
+        )
+
+    async def _add_to_cart(
+        self,
+        psql_session: Session,
+        cart_id: uuid,
+        product_url: str,
+        product_variant: str,
+        quantity: int,
     ) -> Dict[str, Any]:
         try:
             cart = await self.psql_repo.get_cart_by_id(psql_session, cart_id)
@@ -54,17 +77,18 @@ class AddCartService:
             
             # Create a handler based on the website
             handler = self.handler_factory.get_bot_handler(website_url=product_url)            
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    price, msrp, cart_details = await handler.add_product(page=page, quantity=quantity, exst_quantity=exst_quantity or None, product_variant=product_variant, product_url=product_url)
-                    storage_state = await self.playwright_utils.get_storage_state(context)
-                    product_id = await self.psql_repo.save_product(psql_session, cart_id, product_url, product_variant, updated_quantity or quantity, price, msrp, storage_state, exst_id or None)
-                    psql_session.commit()
-                    
-                    return {
-                    "product_id": product_id,
-                    "cart_details": cart_details
-                }
+            # A warm menu page is only handed out while the cart has no session yet
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("add_to_cart"), product_url=product_url) as (context, page, prewarmed, resumed):
+                price, msrp, cart_details = await handler.add_product(page=page, quantity=quantity, exst_quantity=exst_quantity or None, product_variant=product_variant, product_url=product_url, prewarmed=prewarmed, resumed=resumed)
+                storage_state = handler.storage_state_codec.encode(await self.playwright_utils.get_storage_state(context))
+                product_id = await self.psql_repo.save_product(psql_session, cart_id, product_url, product_variant, updated_quantity or quantity, price, msrp, storage_state, exst_id or None)
+                psql_session.commit()
+                self.playwright_utils.cart_state_persisted(cart_id, context, storage_state)
+                
+                return {
+                "product_id": product_id,
+                "cart_details": cart_details
+            }
         except HTTPException as e:
             psql_session.rollback()
             raise e
@@ -1,13 +1,15 @@
 from app.model.checkout_options import CheckoutOptionsV2
 from app.repositories.postgresql_db import PostgresRepo
 from app.utils.playwright_utils import PlaywrightUtils
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
 import uuid
 from fastapi import HTTPException, status
 from app.model.models import CartStatus
 import traceback
 from app.handlers.handler_factory import HandlerFactory
+from app.utils.admission import AdmissionController, admission_slot
+from app.utils.tracing import traced
 
 
 
@@ -16,12 +18,15 @@ class CheckoutService:
         self,
         psql_repo: PostgresRepo,
         playwright_utils: PlaywrightUtils,
-        handler_factory: HandlerFactory
+        handler_factory: HandlerFactory,
+        admission_controller: Optional[AdmissionController] = None
     ):
         self.psql_repo = psql_repo
         self.playwright_utils = playwright_utils
         self.handler_factory = handler_factory
+        self.admission_controller = admission_controller
 
+    @traced("CheckoutService.get_checkout_options", ("cart_id",))
     async def get_checkout_options(self, session: Session, cart_id: uuid.UUID) -> Dict[str, Any]:
         try:
             cart = await self.psql_repo.get_cart_by_id(session, cart_id)
@@ -33,15 +38,15 @@ class CheckoutService:
             product_url = products[0].product_url
             handler = self.handler_factory.get_bot_handler(website_url=product_url)
 
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    details = await handler.get_checkout_options(page=page)
-                    return details
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("checkout_fetch")) as (context, page, _, resumed):
+                details = await handler.get_checkout_options(page=page, resumed=resumed)
+                return details
 
         except HTTPException as e:
             session.rollback()
             raise e
 
+    @traced("CheckoutService.get_checkout_options_v2", ("cart_id",))
     async def get_checkout_options_v2(self, session: Session, cart_id: uuid.UUID) -> CheckoutOptionsV2:
         try:
             cart = await self.psql_repo.get_cart_by_id(session, cart_id)
@@ -53,16 +58,25 @@ class CheckoutService:
             product_url = products[0].product_url
             handler = self.handler_factory.get_bot_handler(website_url=product_url)
 
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    details = await handler.get_checkout_options_v2(page=page)
-                    return details
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("checkout_fetch")) as (context, page, _, resumed):
+                details = await handler.get_checkout_options_v2(page=page, resumed=resumed)
+                return details
 
         except HTTPException as e:
             session.rollback()
             raise e
 
+    @traced("CheckoutService.submit_order", ("cart_id",))
     async def submit_order(self, session: Session, cart_id: uuid.UUID, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        # A cart is ordered once: concurrent submissions share the running one's outcome,
+        # the admission slot is taken once holding the cart
+        async def work():
+            async with admission_slot(self.admission_controller, "submit_order"):
+                return await self._submit_order(session, cart_id, user_info)
+
+        return await self.psql_repo.cart_locks.run(cart_id, work, fingerprint=("submit_order", "v1"))
+
+    async def _submit_order(self, session: Session, cart_id: uuid.UUID, user_info: Dict[str, Any]) -> Dict[str, Any]:
         try:
             cart = await self.psql_repo.get_cart_by_id(session, cart_id)
 
@@ -73,18 +87,19 @@ class CheckoutService:
             product_url = products[0].product_url
             handler = self.handler_factory.get_bot_handler(website_url=product_url)
             
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    details = await handler.submit_order(page=page, user_info=user_info)
-                    order_id = await self.psql_repo.save_order(
-                        session,
-                        cart,
-                        details.get("order_type"),
-                        details.get("payment_type"),
-                        details.get("pickup_time"),
-                    )
-                    session.commit()
-                    return {"order_id":order_id}
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("checkout")) as (context, page, _, resumed):
+                details = await handler.submit_order(page=page, user_info=user_info, resumed=resumed)
+                order_id = await self.psql_repo.save_order(
+                    session,
+                    cart,
+                    details.get("order_type"),
+                    details.get("payment_type"),
+                    details.get("pickup_time"),
+                )
+                session.commit()
+                # The cart is ordered, its browser session is no longer needed
+                self.playwright_utils.end_cart_session(cart_id)
+                return {"order_id":order_id}
             
         except HTTPException as e:
             session.rollback()
@@ -94,7 +109,17 @@ class CheckoutService:
             print(f"Exception submit_order {str(e)}", traceback.format_exc())
             raise HTTPException(status_code=500, detail=f"Failed to submit order")
 
+    @traced("CheckoutService.submit_order_v2", ("cart_id",))
     async def submit_order_v2(self, session: Session, cart_id: uuid.UUID, checkout_options: CheckoutOptionsV2) -> Dict[str, Any]:
+        # A cart is ordered once: concurrent submissions share the running one's outcome,
+        # the admission slot is taken once holding the cart
+        async def work():
+            async with admission_slot(self.admission_controller, "submit_order"):
+                return await self._submit_order_v2(session, cart_id, checkout_options)
+
+        return await self.psql_repo.cart_locks.run(cart_id, work, fingerprint=("submit_order", "v2"))
+
+    async def _submit_order_v2(self, session: Session, cart_id: uuid.UUID, checkout_options: CheckoutOptionsV2) -> Dict[str, Any]:
         try:
             cart = await self.psql_repo.get_cart_by_id(session, cart_id)
 
@@ -105,18 +130,18 @@ class CheckoutService:
             product_url = products[0].product_url
             handler = self.handler_factory.get_bot_handler(website_url=product_url)
 
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    details = await handler.submit_order_v2(page=page, checkout_options=checkout_options)
-                    order_id = await self.psql_repo.save_order(
-                        session,
-                        cart,
-                        details.get("order_type"),
-                        details.get("payment_type"),
-                        details.get("pickup_time"),
-                    )
-                    session.commit()
-                    return {"order_id": order_id}
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("checkout")) as (context, page, _, resumed):
+                details = await handler.submit_order_v2(page=page, checkout_options=checkout_options, resumed=resumed)
+                order_id = await self.psql_repo.save_order(
+                    session,
+                    cart,
+                    details.get("order_type"),
+                    details.get("payment_type"),
+                    details.get("pickup_time"),
+                )
+                session.commit()
+                self.playwright_utils.end_cart_session(cart_id)
+                return {"order_id": order_id}
 
         except HTTPException as e:
             session.rollback()
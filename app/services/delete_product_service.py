@@ -1,12 +1,14 @@
 from app.repositories.postgresql_db import PostgresRepo
 from app.utils.playwright_utils import PlaywrightUtils
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import uuid
 import traceback
 from fastapi import HTTPException, status
 from app.model.models import CartStatus
 from app.handlers.handler_factory import HandlerFactory
+from app.utils.admission import AdmissionController, admission_slot
+from app.utils.tracing import traced
 from sqlalchemy.ext.asyncio import AsyncSession
 
 class DeleteProductService:
@@ -14,14 +16,28 @@ class DeleteProductService:
         self,
         psql_repo: PostgresRepo,
         playwright_utils: PlaywrightUtils,
-        handler_factory: HandlerFactory
+        handler_factory: HandlerFactory,
+        admission_controller: Optional[AdmissionController] = None
     ):
         self.psql_repo = psql_repo
         self.playwright_utils = playwright_utils
         self.handler_factory = handler_factory
+        self.admission_controller = admission_controller
 
+    @traced("DeleteProductService.delete_product", ("cart_id", "product_id"))
     async def delete_product(
         self, psql_session: Session, cart_id: uuid.UUID, product_id: uuid.UUID
+    ) -> Dict[str, Any]:
+        # Requests on the same cart run one at a time, identical ones are deduplicated,
+        # the admission slot is taken once holding the cart
+        async def work():
+            async with admission_slot(self.admission_controller, "delete_product"):
+                return await self._delete_product(psql_session, cart_id, product_id)
+
+        return await self.psql_repo.cart_locks.run(cart_id, work, fingerprint=("delete_product", str(product_id)))
+
+    async def _delete_product(
+        self, psql_session: Session, cart_id: uuid.UUID, product_id: uuid.UUID
     ) -> Dict[str, Any]:
         try:
 
@@ -36,14 +52,14 @@ class DeleteProductService:
             handler = self.handler_factory.get_bot_handler(website_url=product.product_url)
 
             # Use Playwright to open the cart and remove the item
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    await handler.delete_item_product(page=page, product_id=product_id, session=psql_session)
-                    storage_state = await self.playwright_utils.get_storage_state(context)
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("cart_deletion")) as (context, page, _, resumed):
+                await handler.delete_item_product(page=page, product_id=product_id, session=psql_session, resumed=resumed)
+                storage_state = handler.storage_state_codec.encode(await self.playwright_utils.get_storage_state(context))
 
             # Now delete the product from the database
             await self.psql_repo.delete_product(psql_session, product_id)
             await self.psql_repo.save_cart(psql_session, cart_id=cart_id, session_storage=storage_state)
+            self.playwright_utils.cart_state_persisted(cart_id, context, storage_state)
             # Verify the product is deleted
             product_after_deletion = await self.psql_repo.get_product_by_cart_and_id(psql_session, cart_id, product_id)
             if product_after_deletion:
@@ -7,6 +7,7 @@ import uuid
 import traceback
 from fastapi import HTTPException, status
 from app.handlers.handler_factory import HandlerFactory
+from app.utils.tracing import traced
 
 class ScrapeCartService:
     def __init__(
@@ -19,6 +20,7 @@ class ScrapeCartService:
         self.playwright_utils = playwright_utils
         self.handler_factory = handler_factory
 
+    @traced("ScrapeCartService.scrape_cart", ("cart_id",))
     async def scrape_cart(
         self, psql_session: Session, cart_id: uuid.UUID
     ) -> Dict[str, Any]:
@@ -33,9 +35,8 @@ class ScrapeCartService:
             product_url = products[0].product_url
             
             handler = self.handler_factory.get_bot_handler(website_url=product_url)
-            async with await self.playwright_utils.new_context(storage_state=cart.session_storage) as context:
-                async with await self.playwright_utils.new_page(context) as page:
-                    return await handler.fetch_cart_details(page=page, product_url=product_url)
+            async with self.playwright_utils.lease_cart_page(cart_id, storage_state=cart.session_storage, network_policy=handler.get_network_policy("cart_verification")) as (context, page, _, resumed):
+                return await handler.fetch_cart_details(page=page, product_url=product_url, resumed=resumed)
             
         except HTTPException as e:
             raise e
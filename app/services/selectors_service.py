@@ -1,6 +1,7 @@
 import json
 from pathlib import Path
 from typing import Dict, Optional
+from app.utils.dom_extractor import resolve_field_map
 
 class SelectorsService:
     _selectors = {}
@@ -38,6 +39,27 @@ class SelectorsService:
         else:
             return selectors
     
+    @staticmethod
+    def resolve_references(bot_name: str) -> Dict:
+        """
+        Replaces, once, the '$section.key' selector references of a bot's sections (navigation,
+        extraction...) by the selectors they point to, so they are not resolved per use.
+        :param bot_name: The name of the bot (e.g., 'dutchie').
+        :return: The resolved selectors of the bot.
+        """
+        selectors = SelectorsService.get_selectors(bot_name)
+        resolved = {}
+        for section, value in selectors.items():
+            if section == "selectors":
+                resolved[section] = value
+                continue
+            try:
+                resolved[section] = resolve_field_map(value, selectors.get("selectors", {}))
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Selectors of bot '{bot_name}': {section} references a missing selector {e}")
+        SelectorsService._selectors[bot_name.lower()] = resolved
+        return resolved
+
     @staticmethod
     def get_checkout_url(bot_name: str) -> str:
         """
@@ -1,27 +1,42 @@
 from app.repositories.postgresql_db import PostgresRepo
 from app.utils.playwright_utils import PlaywrightUtils
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import traceback
 import uuid
 from playwright.async_api import Page
 from fastapi import HTTPException
 from fastapi import APIRouter, Form, Depends, HTTPException, status
+from app.fetchers.base import VariationFetcher
+from app.fetchers.browser_fetcher import BrowserFetcher
 from app.handlers.handler_factory import HandlerFactory
+from app.utils.tracing import traced
 
 class VariantService:
     def __init__(
         self,
         playwright_utils: PlaywrightUtils,
-        handler_factory: HandlerFactory
+        handler_factory: HandlerFactory,
+        fetchers: Optional[List[VariationFetcher]] = None
     ):
         self.playwright_utils = playwright_utils
         self.handler_factory = handler_factory
+        # Cheapest tier first, the browser last as it can serve any product
+        self.fetchers = fetchers or [BrowserFetcher(playwright_utils)]
 
     
+    @traced("VariantService.product_variations", ("product_url",))
     async def product_variations(self,product_url: str):
         handler = self.handler_factory.get_bot_handler(website_url=product_url)
-        async with await self.playwright_utils.new_context() as context:
-            async with await self.playwright_utils.new_page(context) as page:
-                variant_data = await handler.get_variations(page=page, product_url=product_url)
-                return variant_data 
+        for fetcher in self.fetchers:
+            variant_data = await fetcher.fetch(handler, product_url)
+            if variant_data is not None:
+                return variant_data
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product variations not found")
+
+    async def close(self):
+        for fetcher in self.fetchers:
+            await fetcher.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {fetcher.name: fetcher.stats() for fetcher in self.fetchers}
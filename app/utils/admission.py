@@ -0,0 +1,264 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+from fastapi import HTTPException, status
+
+# Priority classes of browser work. weight is the share of freed slots a backlogged class gets,
+# max_concurrency caps the slots it can hold at once (0 means the global limit).
+DEFAULT_PRIORITY_CLASSES = {
+    "checkout": {"weight": 8, "max_concurrency": 0, "queue_timeout": 30},
+    "cart": {"weight": 4, "max_concurrency": 0},
+    "read": {"weight": 2, "max_concurrency": 0},
+    "catalog": {"weight": 1, "max_concurrency": 0.5, "queue_size": 16},
+}
+
+OPERATION_CLASSES = {
+    "submit_order": "checkout",
+    "add_product": "cart",
+    "delete_product": "cart",
+    "verify_cart": "read",
+    "checkout_options": "read",
+    "variations": "catalog",
+}
+
+DEFAULT_CLASS = "read"
+
+
+class _Waiter:
+    def __init__(self, future: asyncio.Future, operation: str):
+        self.future = future
+        self.operation = operation
+        self.enqueued_at = time.monotonic()
+
+
+class PriorityClass:
+    """
+    Scheduling state of one priority class.
+    """
+
+    def __init__(self, name: str, weight: float, max_concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self.waiters: Deque[_Waiter] = deque()
+        self.virtual_time = 0.0
+
+        self.admitted = 0
+        self.dequeued = 0
+        self.rejected = 0
+        self.promoted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def has_room(self) -> bool:
+        return self.active < self.max_concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "starvation_promotions": self.promoted,
+            "wait_avg_ms": round(self.wait_total / self.dequeued * 1000, 2) if self.dequeued else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+class AdmissionController:
+    """
+    Caps the number of requests doing browser work at the same time and schedules the
+    waiting ones by priority class. Freed slots go to the backlogged class with the lowest
+    weighted virtual time (stride scheduling), so higher classes get a larger share without
+    shutting lower ones out; a request waiting longer than starvation_after is served first
+    regardless. Each class has a concurrency cap, a bounded queue and a wait budget, and is
+    rejected with 429 (queue full) or 503 (budget exceeded) plus a Retry-After.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        queue_size: int = 32,
+        queue_timeout: float = 10.0,
+        classes: Optional[Dict[str, Dict[str, Any]]] = None,
+        starvation_after: float = 5.0,
+    ):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.starvation_after = starvation_after
+        self.classes: Dict[str, PriorityClass] = {
+            name: self._build_class(name, settings)
+            for name, settings in (classes or DEFAULT_PRIORITY_CLASSES).items()
+        }
+
+        self._active = 0
+        self._virtual_time = 0.0
+        self._service_time = 5.0
+        self._operations: Dict[str, Dict[str, int]] = {}
+
+    def _build_class(self, name: str, settings: Dict[str, Any]) -> PriorityClass:
+        # A fractional cap is a share of the global limit
+        cap = settings.get("max_concurrency") or self.limit
+        if cap < 1:
+            cap = max(1, int(self.limit * cap))
+        return PriorityClass(
+            name,
+            weight=float(settings.get("weight", 1)),
+            max_concurrency=min(int(cap), self.limit),
+            queue_size=int(settings.get("queue_size", self.queue_size)),
+            queue_timeout=float(settings.get("queue_timeout", self.queue_timeout)),
+        )
+
+    def class_of(self, operation: str) -> PriorityClass:
+        name = OPERATION_CLASSES.get(operation, DEFAULT_CLASS)
+        return self.classes.get(name) or self.classes[next(iter(self.classes))]
+
+    @asynccontextmanager
+    async def admit(self, operation: str = "default"):
+        """
+        Holds an admission slot for the duration of the block.
+        """
+        priority_class = self.class_of(operation)
+        waited = await self._acquire(priority_class, operation)
+        self._record(operation, "admitted")
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            # Exponentially weighted service time, used for Retry-After
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self._release(priority_class)
+
+    async def _acquire(self, priority_class: PriorityClass, operation: str) -> float:
+        self._catch_up(priority_class)
+        if self._active < self.limit and priority_class.has_room and not self._has_eligible_waiters():
+            self._grant(priority_class)
+            return 0.0
+
+        if len(priority_class.waiters) >= priority_class.queue_size:
+            priority_class.rejected += 1
+            self._record(operation, "rejected")
+            raise self._rejection(priority_class, status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests in progress, try again later")
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), operation)
+        priority_class.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=priority_class.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(priority_class, waiter)
+            priority_class.rejected += 1
+            self._record(operation, "rejected")
+            raise self._rejection(priority_class, status.HTTP_503_SERVICE_UNAVAILABLE, "Request waited too long for a browser, try again later")
+        except BaseException:
+            self._abandon(priority_class, waiter)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        priority_class.dequeued += 1
+        priority_class.wait_total += waited
+        priority_class.wait_max = max(priority_class.wait_max, waited)
+        return waited
+
+    def _catch_up(self, priority_class: PriorityClass):
+        # An idle class does not bank credit while it had nothing to run
+        if not priority_class.waiters and priority_class.active == 0:
+            priority_class.virtual_time = max(priority_class.virtual_time, self._virtual_time)
+
+    def _grant(self, priority_class: PriorityClass):
+        self._active += 1
+        priority_class.active += 1
+        priority_class.admitted += 1
+        # The system virtual time follows the start tag of the latest grant
+        self._virtual_time = max(self._virtual_time, priority_class.virtual_time)
+        priority_class.virtual_time += 1.0 / priority_class.weight
+
+    def _abandon(self, priority_class: PriorityClass, waiter: _Waiter):
+        if waiter.future.done() and not waiter.future.cancelled():
+            # The slot was granted right as the wait ended, give it back
+            self._release(priority_class)
+        else:
+            waiter.future.cancel()
+            if waiter in priority_class.waiters:
+                priority_class.waiters.remove(waiter)
+
+    def _release(self, priority_class: PriorityClass):
+        self._active -= 1
+        priority_class.active -= 1
+        self._dispatch()
+
+    def _has_eligible_waiters(self) -> bool:
+        return any(c.waiters and c.has_room for c in self.classes.values())
+
+    def _dispatch(self):
+        while self._active < self.limit:
+            priority_class = self._pick_class()
+            if priority_class is None:
+                return
+            waiter = priority_class.waiters.popleft()
+            if waiter.future.done():
+                continue
+            self._grant(priority_class)
+            waiter.future.set_result(None)
+
+    def _pick_class(self) -> Optional[PriorityClass]:
+        eligible = [c for c in self.classes.values() if c.waiters and c.has_room]
+        if not eligible:
+            return None
+
+        now = time.monotonic()
+        starving = [c for c in eligible if now - c.waiters[0].enqueued_at >= self.starvation_after]
+        if starving:
+            priority_class = min(starving, key=lambda c: c.waiters[0].enqueued_at)
+            priority_class.promoted += 1
+            return priority_class
+        return min(eligible, key=lambda c: (c.virtual_time, -c.weight))
+
+    def retry_after(self, priority_class: PriorityClass) -> int:
+        backlog = sum(len(c.waiters) for c in self.classes.values() if c.weight >= priority_class.weight) + 1
+        return max(1, math.ceil(self._service_time * backlog / max(1, self.limit)))
+
+    def _rejection(self, priority_class: PriorityClass, status_code: int, message: str) -> HTTPException:
+        return HTTPException(
+            status_code=status_code,
+            detail={"status": "error", "message": message},
+            headers={"Retry-After": str(self.retry_after(priority_class))},
+        )
+
+    def _record(self, operation: str, outcome: str):
+        counters = self._operations.setdefault(operation, {"admitted": 0, "rejected": 0})
+        counters[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self._active,
+            "queue_depth": sum(len(c.waiters) for c in self.classes.values()),
+            "admitted": sum(c.admitted for c in self.classes.values()),
+            "rejected": sum(c.rejected for c in self.classes.values()),
+            "service_time_ms": round(self._service_time * 1000, 2),
+            "classes": {name: c.stats() for name, c in self.classes.items()},
+            "operations": {name: dict(counters) for name, counters in self._operations.items()},
+        }
+
+
+@asynccontextmanager
+async def admission_slot(admission_controller: Optional[AdmissionController], operation: str):
+    """
+    Holds an admission slot for the block, none when admission control is off.
+    """
+    if admission_controller is None:
+        yield 0.0
+        return
+    async with admission_controller.admit(operation) as waited:
+        yield waited
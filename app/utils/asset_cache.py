@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Bundler output with a content hash in its name (webpack/next chunks, vite assets, etc)
+DEFAULT_IMMUTABLE_PATTERNS = (
+    r"/_next/static/",
+    r"[.\-_][0-9a-f]{8,}\.(?:chunk\.)?(?:js|mjs|css|woff2?)(?:\?|$)",
+)
+
+CACHEABLE_RESOURCE_TYPES = ("script", "stylesheet", "font")
+
+# Playwright hands back decoded bodies, so encoding and framing headers must not be replayed
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+INDEX_FILE = "index.json"
+BLOBS_DIR = "blobs"
+
+
+class AssetCache:
+    """
+    Content-addressed, size-bounded LRU cache of immutable static assets shared by every
+    browser context. Bodies are stored once per sha256 under the cache directory and an
+    index maps URLs to them, so the cache survives warm Lambda invocations and restarts.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        immutable_patterns: Iterable[str] = DEFAULT_IMMUTABLE_PATTERNS,
+        resource_types: Iterable[str] = CACHEABLE_RESOURCE_TYPES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.immutable_patterns = tuple(re.compile(pattern) for pattern in immutable_patterns)
+        self.resource_types = frozenset(resource_types)
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._blob_refs: Dict[str, int] = {}
+        self._size = 0
+        self._dirty = False
+        self._index_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+        os.makedirs(os.path.join(directory, BLOBS_DIR), exist_ok=True)
+        self._load_index()
+
+    def is_cacheable(self, request) -> bool:
+        return (
+            request.method == "GET"
+            and request.resource_type in self.resource_types
+            and any(pattern.search(request.url) for pattern in self.immutable_patterns)
+        )
+
+    async def get(self, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        entry = self._entries.get(url)
+        if entry is None or (entry["expires"] is not None and entry["expires"] < time.time()):
+            if entry is not None:
+                self._remove(url)
+            self.misses += 1
+            return None
+
+        try:
+            body = await asyncio.to_thread(self._read_blob, entry["digest"])
+        except OSError:
+            self._remove(url)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(url)
+        self.hits += 1
+        self.bytes_saved += entry["size"]
+        return entry["status"], entry["headers"], body
+
+    async def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> bool:
+        """
+        Stores a response body if its status and cache headers allow it.
+        :return: True when the asset was stored.
+        """
+        expires = self._expiry(url, status, headers)
+        if expires is False or len(body) > self.max_bytes:
+            return False
+
+        digest = hashlib.sha256(body).hexdigest()
+        if url in self._entries:
+            self._remove(url)
+        if digest not in self._blob_refs:
+            await asyncio.to_thread(self._write_blob, digest, body)
+
+        self._entries[url] = {
+            "digest": digest,
+            "size": len(body),
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS},
+            "expires": expires,
+        }
+        self._blob_refs[digest] = self._blob_refs.get(digest, 0) + 1
+        if self._blob_refs[digest] == 1:
+            self._size += len(body)
+        self.stores += 1
+        self._dirty = True
+
+        self._evict()
+        self._dirty = False
+        await asyncio.to_thread(self._write_index, list(self._entries.items()))
+        return True
+
+    def _expiry(self, url: str, status: int, headers: Dict[str, str]):
+        """
+        Returns the expiry timestamp, None for assets that never expire, or False if the
+        response must not be cached.
+        """
+        if status != 200:
+            return False
+        headers = {k.lower(): v for k, v in headers.items()}
+        vary = [v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()]
+        if any(v not in ("accept-encoding", "origin") for v in vary):
+            return False
+
+        directives = {}
+        for directive in headers.get("cache-control", "").lower().split(","):
+            name, _, value = directive.strip().partition("=")
+            if name:
+                directives[name] = value.strip('"')
+
+        if "no-store" in directives or "private" in directives or "no-cache" in directives:
+            return False
+        if "immutable" in directives:
+            return None
+        if "max-age" in directives:
+            try:
+                max_age = int(directives["max-age"])
+            except ValueError:
+                return False
+            return time.time() + max_age if max_age > 0 else False
+        # No explicit freshness: only content-hashed URLs are safe to keep
+        return None if any(pattern.search(url) for pattern in self.immutable_patterns) else False
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            url = next(iter(self._entries))
+            self._remove(url)
+            self.evictions += 1
+
+    def _remove(self, url: str):
+        entry = self._entries.pop(url)
+        digest = entry["digest"]
+        self._blob_refs[digest] -= 1
+        if self._blob_refs[digest] <= 0:
+            del self._blob_refs[digest]
+            self._size -= entry["size"]
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+        self._dirty = True
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, BLOBS_DIR, digest)
+
+    def _read_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as file:
+            return file.read()
+
+    def _write_blob(self, digest: str, body: bytes):
+        tmp_path = f"{self._blob_path(digest)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(body)
+        os.replace(tmp_path, self._blob_path(digest))
+
+    def _load_index(self):
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(index_path, "r") as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        for url, entry in entries:
+            if not os.path.exists(self._blob_path(entry["digest"])):
+                continue
+            self._entries[url] = entry
+            self._blob_refs[entry["digest"]] = self._blob_refs.get(entry["digest"], 0) + 1
+            if self._blob_refs[entry["digest"]] == 1:
+                self._size += entry["size"]
+        self._evict()
+
+    def flush(self):
+        """
+        Writes the index (in LRU order) so another process or a later start can reuse the cache.
+        """
+        if self._dirty:
+            self._dirty = False
+            self._write_index(list(self._entries.items()))
+
+    def _write_index(self, entries):
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with self._index_lock:
+            with open(tmp_path, "w") as file:
+                json.dump(entries, file)
+            os.replace(tmp_path, index_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+        }
@@ -0,0 +1,282 @@
+import asyncio
+import os
+import time
+import psutil
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from playwright.async_api import Browser
+
+BROWSER_SLOT_MARKER = "--uni-browser-slot"
+
+
+class BrowserSlot:
+    """
+    One supervised browser instance and its bookkeeping.
+    """
+
+    def __init__(self, slot_id: str):
+        self.slot_id = slot_id
+        self.browser: Optional[Browser] = None
+        self.pid: Optional[int] = None
+        # The marker lookup found no local process, the slot's RSS is not measured
+        self.pid_unknown = False
+        self.started_at = time.monotonic()
+        self.contexts_served = 0
+        self.active_contexts = 0
+        self.retiring = False
+        self.closing = False
+        self.rss_bytes = 0
+
+    @property
+    def marker(self) -> str:
+        return f"{BROWSER_SLOT_MARKER}={os.getpid()}-{self.slot_id}"
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected() and not self.retiring
+
+
+class BrowserSupervisor:
+    """
+    Runs several browser instances and spreads new contexts across them.
+    A browser is retired after serving a number of contexts or when its process tree RSS
+    passes a threshold: it stops receiving contexts, a replacement is launched right away
+    and it is closed once its last context is gone. Crashed browsers are replaced transparently.
+    The RSS of remote browsers (measure_rss off) is not known here, only the context count
+    retires them.
+    """
+
+    def __init__(
+        self,
+        launcher: Callable[[List[str]], Awaitable[Browser]],
+        instances: int = 1,
+        max_contexts_per_browser: int = 200,
+        rss_limit_mb: int = 600,
+        health_interval: float = 10.0,
+        on_retire: Optional[Callable[[], Awaitable[None]]] = None,
+        measure_rss: bool = True,
+    ):
+        self.launcher = launcher
+        self.instances = max(1, instances)
+        self.max_contexts_per_browser = max_contexts_per_browser
+        self.rss_limit_bytes = rss_limit_mb * 1024 * 1024
+        self.health_interval = health_interval
+        self.on_retire = on_retire
+        self.measure_rss = measure_rss
+
+        self.slots: List[BrowserSlot] = []
+        self._next_slot_id = 0
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._background = set()
+        self._launch_lock = asyncio.Lock()
+        self._stopped = False
+
+        self._launches = 0
+        self._restarts = 0
+        self._retired_by_contexts = 0
+        self._retired_by_rss = 0
+
+    async def start(self):
+        self._stopped = False
+        await asyncio.gather(*[self._launch_slot() for _ in range(self.instances)])
+        if self.health_interval > 0:
+            self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        self._stopped = True
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        for task in list(self._background):
+            task.cancel()
+        for slot in list(self.slots):
+            await self._close_slot(slot)
+
+    def primary_browser(self) -> Optional[Browser]:
+        for slot in self.slots:
+            if slot.healthy:
+                return slot.browser
+        return None
+
+    async def new_context(self, **kwargs):
+        slot = await self._pick_slot()
+        context = await slot.browser.new_context(**kwargs)
+        slot.active_contexts += 1
+        slot.contexts_served += 1
+        context.on("close", lambda _: self._context_closed(slot))
+
+        if slot.contexts_served >= self.max_contexts_per_browser and not slot.retiring:
+            self._retired_by_contexts += 1
+            self._retire(slot)
+        return context
+
+    def is_stale(self, context) -> bool:
+        """
+        Tells whether a context belongs to a browser that is retiring, closed or gone.
+        """
+        browser = context.browser
+        for slot in self.slots:
+            if slot.browser is browser:
+                return not slot.healthy
+        return True
+
+    async def _pick_slot(self) -> BrowserSlot:
+        healthy = [slot for slot in self.slots if slot.healthy]
+        if not healthy:
+            await self._ensure_capacity()
+            healthy = [slot for slot in self.slots if slot.healthy]
+        if not healthy:
+            raise RuntimeError("No browser instance available")
+        return min(healthy, key=lambda slot: slot.active_contexts)
+
+    async def _launch_slot(self) -> BrowserSlot:
+        slot = BrowserSlot(str(self._next_slot_id))
+        self._next_slot_id += 1
+        slot.browser = await self.launcher([slot.marker])
+        slot.browser.on("disconnected", lambda _: self._browser_disconnected(slot))
+        self.slots.append(slot)
+        self._launches += 1
+        return slot
+
+    async def _ensure_capacity(self):
+        """
+        Launches browsers until the configured number of healthy instances is running.
+        """
+        async with self._launch_lock:
+            while not self._stopped and sum(1 for slot in self.slots if slot.healthy) < self.instances:
+                try:
+                    await self._launch_slot()
+                except Exception as e:
+                    print(f"Failed to launch browser instance: {e}")
+                    await asyncio.sleep(1)
+                    return
+
+    def _retire(self, slot: BrowserSlot):
+        slot.retiring = True
+        print(f"Retiring browser {slot.slot_id} after {slot.contexts_served} contexts, rss={slot.rss_bytes}")
+        self._spawn(self._ensure_capacity())
+        if self.on_retire:
+            self._spawn(self.on_retire())
+        if slot.active_contexts == 0:
+            self._spawn(self._close_slot(slot))
+
+    def _context_closed(self, slot: BrowserSlot):
+        slot.active_contexts -= 1
+        if slot.retiring and slot.active_contexts <= 0 and not slot.closing:
+            self._spawn(self._close_slot(slot))
+
+    def _browser_disconnected(self, slot: BrowserSlot):
+        if slot.closing or self._stopped:
+            return
+        print(f"Browser {slot.slot_id} disconnected unexpectedly, restarting it")
+        self._restarts += 1
+        slot.retiring = True
+        if slot in self.slots:
+            self.slots.remove(slot)
+        self._spawn(self._ensure_capacity())
+        if self.on_retire:
+            self._spawn(self.on_retire())
+
+    async def _close_slot(self, slot: BrowserSlot):
+        slot.closing = True
+        if slot in self.slots:
+            self.slots.remove(slot)
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            print(f"Failed to close browser {slot.slot_id}: {e}")
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"Browser health check failed: {e}")
+
+    async def check_health(self):
+        for slot in list(self.slots):
+            if slot.browser is not None and not slot.browser.is_connected():
+                self._browser_disconnected(slot)
+                continue
+            if not self.measure_rss or slot.pid_unknown:
+                continue
+            # Walking the process table is blocking, keep it off the event loop
+            slot.rss_bytes = await asyncio.to_thread(self._measure_rss, slot)
+            if self.rss_limit_bytes and slot.rss_bytes > self.rss_limit_bytes and not slot.retiring:
+                self._retired_by_rss += 1
+                self._retire(slot)
+        await self._ensure_capacity()
+
+    def _measure_rss(self, slot: BrowserSlot) -> int:
+        """
+        Sums the RSS of the browser root process and all its children (renderers, GPU, etc).
+        The root process is found once through the marker switch passed at launch, a slot
+        whose marker matches no process is not looked up again.
+        """
+        try:
+            if slot.pid is None:
+                slot.pid = self._find_browser_pid(slot.marker)
+            if slot.pid is None:
+                slot.pid_unknown = True
+                print(f"No local process found for browser {slot.slot_id}, its RSS is not measured")
+                return 0
+            root = psutil.Process(slot.pid)
+            processes = [root] + root.children(recursive=True)
+            rss = 0
+            for process in processes:
+                try:
+                    rss += process.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            return rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            slot.pid = None
+            return 0
+
+    @staticmethod
+    def _find_browser_pid(marker: str) -> Optional[int]:
+        candidates = {}
+        for process in psutil.process_iter(["pid", "ppid", "cmdline"]):
+            cmdline = process.info.get("cmdline") or []
+            if marker in cmdline:
+                candidates[process.info["pid"]] = process.info["ppid"]
+        for pid, ppid in candidates.items():
+            if ppid not in candidates:
+                return pid
+        return None
+
+    def open_pages(self) -> int:
+        """
+        Pages open in the supervised browsers, counted from Playwright's local bookkeeping.
+        """
+        return sum(
+            len(context.pages)
+            for slot in self.slots if slot.browser is not None
+            for context in slot.browser.contexts
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "instances": self.instances,
+            "launches": self._launches,
+            "restarts": self._restarts,
+            "retired_by_contexts": self._retired_by_contexts,
+            "retired_by_rss": self._retired_by_rss,
+            "rss_measured": self.measure_rss,
+            "browsers": [
+                {
+                    "slot": slot.slot_id,
+                    "connected": slot.browser.is_connected() if slot.browser else False,
+                    "retiring": slot.retiring,
+                    "active_contexts": slot.active_contexts,
+                    "contexts_served": slot.contexts_served,
+                    "rss_mb": round(slot.rss_bytes / 1024 / 1024, 1) if self.measure_rss and not slot.pid_unknown else None,
+                }
+                for slot in self.slots
+            ],
+        }
@@ -0,0 +1,157 @@
+import bisect
+import hashlib
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+import httpx
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from app.repositories.node_registry import NodeRegistry
+
+# Requests working on a cart, the cart id is the routing key
+CART_PATH = re.compile(r"^/carts/([0-9a-fA-F-]{36})/")
+
+# Set on forwarded requests so the owner serves them whatever its own view of the ring
+FORWARDED_HEADER = "x-cart-affinity-forwarded"
+OWNER_HEADER = "X-Cart-Owner"
+
+AFFINITY_MODES = ("forward", "redirect")
+
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers",
+    "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes: removing a node only moves the keys it owned.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class CartAffinity:
+    """
+    Sends every request on a cart to the node owning it on the ring of live nodes, so warm
+    per-cart state (browser sessions, cached details) stays on one node. Requests landing on
+    another node are forwarded to the owner, or answered with a 307 redirect hint carrying
+    the owner in X-Cart-Owner. The ring is rebuilt on every membership change; when the owner
+    cannot be reached the request is served locally, the cart lock keeps that safe.
+    """
+
+    def __init__(self, registry: NodeRegistry, mode: str = "forward", vnodes: int = 64, forward_timeout: float = 60.0):
+        if mode not in AFFINITY_MODES:
+            raise ValueError(f"Unknown cart affinity mode {mode}, expected one of {AFFINITY_MODES}")
+        self.registry = registry
+        self.mode = mode
+        self.vnodes = vnodes
+        self.forward_timeout = forward_timeout
+        self.ring = HashRing(vnodes=vnodes)
+        self._addresses: Dict[str, str] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        registry.on_change = self._rebuild
+
+        self.local = 0
+        self.forwarded = 0
+        self.redirected = 0
+        self.forward_failures = 0
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=self.forward_timeout)
+        await self.registry.start()
+
+    async def stop(self):
+        await self.registry.stop()
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def _rebuild(self, nodes: Dict[str, str]):
+        self._addresses = nodes
+        self.ring = HashRing(nodes, vnodes=self.vnodes)
+        print(f"Cart affinity ring rebuilt with nodes {sorted(nodes)}")
+
+    def owner(self, cart_id: str) -> Optional[Tuple[str, str]]:
+        node_id = self.ring.owner(str(cart_id).lower())
+        if node_id is None:
+            return None
+        return node_id, self._addresses[node_id]
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        """
+        HTTP middleware entry point.
+        """
+        match = CART_PATH.match(request.url.path)
+        # OPTIONS (CORS preflights) touch no cart, any node answers them
+        if not match or request.method == "OPTIONS" or request.headers.get(FORWARDED_HEADER):
+            return await call_next(request)
+
+        owner = self.owner(match.group(1))
+        if owner is None or owner[0] == self.registry.node_id:
+            self.local += 1
+            return await call_next(request)
+
+        node_id, address = owner
+        target = address.rstrip("/") + request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        if self.mode == "redirect":
+            self.redirected += 1
+            return Response(
+                status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+                headers={"Location": target, OWNER_HEADER: node_id},
+            )
+
+        try:
+            response = await self._forward(request, target)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            self.forward_failures += 1
+            print(f"Failed to reach node {node_id} for {request.url.path}, serving it locally: {e}")
+            return await call_next(request)
+        except httpx.HTTPError as e:
+            # The owner may have run the request already, replaying it here could repeat a cart change
+            self.forward_failures += 1
+            print(f"Forwarding {request.url.path} to node {node_id} failed: {e}")
+            return JSONResponse(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                content={"detail": {"status": "error", "message": "Owner node of the cart did not answer, try again"}},
+                headers={OWNER_HEADER: node_id, "Retry-After": "1"},
+            )
+        self.forwarded += 1
+        response.headers[OWNER_HEADER] = node_id
+        return response
+
+    async def _forward(self, request: Request, target: str) -> Response:
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in _HOP_BY_HOP}
+        headers[FORWARDED_HEADER] = self.registry.node_id
+        upstream = await self._client.request(request.method, target, headers=headers, content=await request.body())
+        # httpx already decoded the body
+        response_headers = {
+            name: value for name, value in upstream.headers.items()
+            if name.lower() not in _HOP_BY_HOP and name.lower() != "content-encoding"
+        }
+        return Response(content=upstream.content, status_code=upstream.status_code, headers=response_headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "ring_nodes": self.ring.nodes,
+            "local": self.local,
+            "forwarded": self.forwarded,
+            "redirected": self.redirected,
+            "forward_failures": self.forward_failures,
+            "registry": self.registry.stats(),
+        }
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def storage_digest(stored_state: Optional[Dict[str, Any]]) -> str:
+    """
+    Fingerprint of a storage state as persisted with the cart.
+    """
+    return hashlib.sha256(json.dumps(stored_state, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class CartSession:
+    """
+    A cart's browser context and the page its last operation left open.
+    """
+
+    def __init__(self, cart_id: str, context, page, digest: str):
+        self.cart_id = cart_id
+        self.context = context
+        self.page = page
+        self.digest = digest
+        self.tracked = False
+        self.in_use = True
+        self.retired = False
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+
+class CartSessionCache:
+    """
+    Keeps the context of recently used carts alive between API calls so the next operation on
+    a cart skips rebuilding it from the stored storage state. A session is only reused while
+    its storage digest matches the one persisted with the cart, otherwise another process or
+    node changed the cart in between. Idle sessions expire after idle_ttl and the least
+    recently used ones are closed when max_sessions is exceeded; sessions in use are never evicted.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        idle_ttl: float = 120.0,
+        sweep_interval: Optional[float] = None,
+        is_stale: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval or max(1.0, idle_ttl / 4)
+        self.is_stale = is_stale
+
+        self._sessions: "OrderedDict[str, CartSession]" = OrderedDict()
+        self._sweep_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.busy = 0
+        self.invalidated = 0
+        self.evicted = 0
+        self.expired = 0
+
+    async def start(self):
+        self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await self._close(session)
+
+    async def acquire(self, cart_id, stored_state: Optional[Dict[str, Any]]) -> Optional[CartSession]:
+        """
+        Returns the idle session of a cart when it still matches the persisted storage state.
+        """
+        key = str(cart_id)
+        session = self._sessions.get(key)
+        if session is None:
+            self.misses += 1
+            return None
+        if session.in_use:
+            # A concurrent read on the same cart, it gets a context of its own
+            self.busy += 1
+            return None
+        if session.digest != storage_digest(stored_state) or not self._usable(session):
+            self.invalidated += 1
+            del self._sessions[key]
+            await self._close(session)
+            return None
+
+        self.hits += 1
+        session.in_use = True
+        session.uses += 1
+        self._sessions.move_to_end(key)
+        return session
+
+    async def register(self, cart_id, context, page, stored_state: Optional[Dict[str, Any]]) -> CartSession:
+        """
+        Wraps a freshly built context in a session, tracked unless the cart already has one in use.
+        """
+        key = str(cart_id)
+        session = CartSession(key, context, page, storage_digest(stored_state))
+        if key not in self._sessions:
+            session.tracked = True
+            self._sessions[key] = session
+            await self._evict()
+        return session
+
+    async def release(self, session: CartSession, failed: bool = False):
+        """
+        Gives a session back after an operation. Failed operations leave the page in an
+        unknown state, their session is closed.
+        """
+        session.in_use = False
+        session.last_used = time.monotonic()
+        if session.tracked and not failed and not session.retired and self._usable(session):
+            self._sessions.move_to_end(session.cart_id)
+            await self._evict()
+            return
+        if session.tracked and self._sessions.get(session.cart_id) is session:
+            del self._sessions[session.cart_id]
+        await self._close(session)
+
+    def persisted(self, cart_id, context, stored_state: Optional[Dict[str, Any]]):
+        """
+        Records the storage state a cart was saved with. If another context saved it,
+        the cart's cached session is out of date.
+        """
+        session = self._sessions.get(str(cart_id))
+        if session is None:
+            return
+        if session.context is context:
+            session.digest = storage_digest(stored_state)
+        else:
+            session.retired = True
+            session.digest = None
+
+    def retire(self, cart_id):
+        """
+        Closes a cart's session once its current operation is done (e.g. after the order).
+        """
+        session = self._sessions.get(str(cart_id))
+        if session is not None:
+            session.retired = True
+            session.digest = None
+
+    async def sweep(self):
+        now = time.monotonic()
+        expired = [
+            session for session in self._sessions.values()
+            if not session.in_use and (now - session.last_used >= self.idle_ttl or not self._usable(session))
+        ]
+        for session in expired:
+            del self._sessions[session.cart_id]
+            self.expired += 1
+            await self._close(session)
+
+    async def purge_stale(self):
+        await self.sweep()
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Cart session sweep failed: {e}")
+
+    async def _evict(self):
+        idle: List[CartSession] = [session for session in self._sessions.values() if not session.in_use]
+        overflow = len(self._sessions) - self.max_sessions
+        # The dict is kept in least recently used order
+        for session in idle[:max(0, overflow)]:
+            del self._sessions[session.cart_id]
+            self.evicted += 1
+            await self._close(session)
+
+    def _usable(self, session: CartSession) -> bool:
+        if session.page.is_closed():
+            return False
+        return not (self.is_stale and self.is_stale(session.context))
+
+    @staticmethod
+    async def _close(session: CartSession):
+        try:
+            await session.context.close()
+        except Exception as e:
+            print(f"Failed to close cart session context: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "in_use": sum(1 for session in self._sessions.values() if session.in_use),
+            "max_sessions": self.max_sessions,
+            "idle_ttl": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "busy": self.busy,
+            "invalidated": self.invalidated,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from fastapi import HTTPException, status
+
+# Seeds localStorage once per tab for the origins found in a storage state.
+# sessionStorage is tab-scoped, so the marker disappears with the pooled page on reset
+# and later navigations of the same lease keep whatever the site wrote meanwhile.
+LOCAL_STORAGE_SEED_SCRIPT = """
+(seed => {
+    const entries = seed[window.location.origin];
+    if (!entries) return;
+    try {
+        if (window.sessionStorage.getItem('__pool_seeded')) return;
+        for (const entry of entries) window.localStorage.setItem(entry.name, entry.value);
+        window.sessionStorage.setItem('__pool_seeded', '1');
+    } catch (e) {}
+})(%s);
+"""
+
+STORAGE_TYPES_TO_CLEAR = "local_storage,session_storage,indexeddb,cache_storage,service_workers"
+
+
+class PooledContext:
+    """
+    A warm browser context together with the page handed out with it.
+    """
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.origins: Set[str] = set()
+
+
+class ContextPool:
+    """
+    Bounded pool of pre-created browser contexts and pages with lease/return semantics.
+    Contexts are created through the provided factory, storage state is injected on lease
+    and everything a lease wrote (cookies, storage, extra pages) is wiped on return.
+    """
+
+    def __init__(
+        self,
+        context_factory: Callable[[], Awaitable[Any]],
+        size: int,
+        max_uses: int = 50,
+        lease_timeout: float = 30.0,
+        is_stale: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.context_factory = context_factory
+        self.size = size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self.is_stale = is_stale
+
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._alive = 0
+        self._leased = 0
+        self._waiting = 0
+        self._background = set()
+        self._closed = False
+
+        self._created = 0
+        self._recycled = 0
+        self._leases = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def start(self):
+        """
+        Pre-creates every context of the pool so the first requests do not pay for it.
+        """
+        self._closed = False
+        pooled_contexts = await asyncio.gather(
+            *[self._create() for _ in range(self.size - self._alive)], return_exceptions=True
+        )
+        for pooled in pooled_contexts:
+            if isinstance(pooled, PooledContext):
+                self._idle.put_nowait(pooled)
+            else:
+                print(f"Failed to pre-create pooled context: {pooled}")
+
+    async def stop(self):
+        self._closed = True
+        for task in list(self._background):
+            task.cancel()
+        while not self._idle.empty():
+            await self._close(self._idle.get_nowait())
+
+    @asynccontextmanager
+    async def lease(self, storage_state: Optional[Dict[str, Any]] = None):
+        """
+        Leases a context and page with the given storage state applied.
+        The context goes back to the pool, reset, once the block exits.
+        """
+        pooled = await self._acquire()
+        try:
+            await self._apply_storage_state(pooled, storage_state)
+        except Exception:
+            self._release(pooled, discard=True)
+            raise
+
+        discard = False
+        try:
+            yield pooled
+        except BaseException:
+            # Pages left mid-navigation or crashed are not worth resetting
+            discard = pooled.page.is_closed() if pooled.page else True
+            raise
+        finally:
+            self._release(pooled, discard=discard)
+
+    async def purge_stale(self):
+        """
+        Replaces idle contexts whose browser is being retired or went away.
+        """
+        idle = []
+        while not self._idle.empty():
+            idle.append(self._idle.get_nowait())
+        for pooled in idle:
+            if self._stale(pooled):
+                self._recycled += 1
+                await self._close(pooled)
+                try:
+                    pooled = await self._create()
+                except Exception as e:
+                    print(f"Failed to replace stale pooled context: {e}")
+                    continue
+            self._idle.put_nowait(pooled)
+
+    def _stale(self, pooled: PooledContext) -> bool:
+        return self.is_stale is not None and self.is_stale(pooled.context)
+
+    async def _acquire(self) -> PooledContext:
+        started = time.monotonic()
+        pooled = None
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            if not self._stale(pooled):
+                break
+            self._recycled += 1
+            await self._close(pooled)
+            pooled = None
+
+        if pooled is None and self._alive < self.size:
+            pooled = await self._create()
+        elif pooled is None:
+            self._waiting += 1
+            try:
+                pooled = await asyncio.wait_for(self._idle.get(), timeout=self.lease_timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="No browser context available, try again later",
+                )
+            finally:
+                self._waiting -= 1
+
+        waited = time.monotonic() - started
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._leases += 1
+        self._leased += 1
+        pooled.uses += 1
+        return pooled
+
+    def _release(self, pooled: PooledContext, discard: bool = False):
+        self._leased -= 1
+        task = asyncio.create_task(self._reset_and_return(pooled, discard))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _reset_and_return(self, pooled: PooledContext, discard: bool):
+        if self._closed:
+            await self._close(pooled)
+            return
+        if not discard and pooled.uses < self.max_uses and not self._stale(pooled):
+            try:
+                await self._reset(pooled)
+                self._idle.put_nowait(pooled)
+                return
+            except Exception as e:
+                print(f"Failed to reset pooled context, recycling it: {e}")
+
+        self._recycled += 1
+        await self._close(pooled)
+        try:
+            self._idle.put_nowait(await self._create())
+        except Exception as e:
+            print(f"Failed to replace pooled context: {e}")
+
+    async def _create(self) -> PooledContext:
+        self._alive += 1
+        try:
+            context = await self.context_factory()
+            page = await context.new_page()
+        except Exception:
+            self._alive -= 1
+            raise
+        self._created += 1
+        return PooledContext(context, page)
+
+    async def _close(self, pooled: PooledContext):
+        self._alive -= 1
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            print(f"Failed to close pooled context: {e}")
+
+    async def _apply_storage_state(self, pooled: PooledContext, storage_state: Optional[Dict[str, Any]]):
+        if not storage_state:
+            return
+
+        cookies = storage_state.get("cookies") or []
+        if cookies:
+            await pooled.context.add_cookies(cookies)
+
+        seed = {
+            origin["origin"]: origin["localStorage"]
+            for origin in storage_state.get("origins") or []
+            if origin.get("localStorage")
+        }
+        if seed:
+            await pooled.page.add_init_script(script=LOCAL_STORAGE_SEED_SCRIPT % json.dumps(seed))
+            pooled.origins.update(seed.keys())
+
+    async def _reset(self, pooled: PooledContext):
+        context = pooled.context
+        storage_state = await context.storage_state()
+        origins = pooled.origins | {origin["origin"] for origin in storage_state.get("origins") or []}
+
+        for page in list(context.pages):
+            await page.close()
+        await context.clear_cookies()
+        await context.clear_permissions()
+
+        # Init scripts are page-scoped, a fresh page drops the previous lease's seed
+        pooled.page = await context.new_page()
+        if origins:
+            cdp_session = await context.new_cdp_session(pooled.page)
+            try:
+                for origin in origins:
+                    await cdp_session.send(
+                        "Storage.clearDataForOrigin",
+                        {"origin": origin, "storageTypes": STORAGE_TYPES_TO_CLEAR},
+                    )
+            finally:
+                await cdp_session.detach()
+        pooled.origins = set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "alive": self._alive,
+            "idle": self._idle.qsize(),
+            "leased": self._leased,
+            "waiting": self._waiting,
+            "created": self._created,
+            "recycled": self._recycled,
+            "leases": self._leases,
+            "lease_timeouts": self._timeouts,
+            "wait_avg_ms": round(self._wait_total / self._leases * 1000, 2) if self._leases else 0.0,
+            "wait_max_ms": round(self._wait_max * 1000, 2),
+        }
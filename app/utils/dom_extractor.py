@@ -0,0 +1,185 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from playwright.async_api import ElementHandle, Error, Page
+
+# Builds one record per element from a field map, the whole extraction is a single protocol round trip
+EXTRACT_SCRIPT = """
+([elements, fields]) => {
+    const query = (scope, spec, all) => {
+        const selectors = [].concat(spec.selector ?? [null]);
+        for (const selector of selectors) {
+            let found;
+            if (!selector) found = [scope];
+            else if (spec.scope === "siblings") {
+                found = [];
+                for (let sibling = scope.nextElementSibling; sibling; sibling = sibling.nextElementSibling) {
+                    if (sibling.matches(selector)) found.push(sibling);
+                }
+            }
+            else found = Array.from((spec.scope === "page" ? document : scope).querySelectorAll(selector));
+            if (spec.contains) found = found.filter(element => (element.innerText || "").includes(spec.contains));
+            if (spec.visible) found = found.filter(element => element.getClientRects().length > 0);
+            if (found.length) return all ? found : found.slice(0, 1);
+        }
+        return [];
+    };
+    const read = (element, spec) => {
+        if (spec.property) return element[spec.property] ?? null;
+        if (!spec.attribute) return element.innerText;
+        for (const attribute of [].concat(spec.attribute)) {
+            const value = element.getAttribute(attribute);
+            if (value) return value;
+        }
+        return null;
+    };
+    const field = (element, spec) => {
+        if (typeof spec === "string") spec = {selector: spec};
+        const found = query(element, spec, spec.all || spec.fields);
+        let value;
+        if (spec.exists) return found.length > 0;
+        if (spec.fields) value = found.map(child => record(child, spec.fields));
+        else if (spec.all) value = found.map(child => read(child, spec));
+        else value = found.length ? read(found[0], spec) : null;
+        if ((value === null || (Array.isArray(value) && !value.length)) && spec.fallback) return field(element, spec.fallback);
+        return value;
+    };
+    const record = (element, fields) => {
+        const result = {};
+        for (const [name, spec] of Object.entries(fields)) result[name] = field(element, spec);
+        return result;
+    };
+    return (elements || [document.documentElement]).map(element => record(element, fields));
+}
+"""
+
+SELECTOR_REFERENCE = re.compile(r"^\$(\w+(?:\.\w+)+)$")
+SELECTOR_INTERPOLATION = re.compile(r"\$\{(\w+(?:\.\w+)+)\}")
+
+
+def resolve_field_map(fields: Dict[str, Any], selectors: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replaces the '$section.key' (or '$section.key.subkey') references of a field map by the
+    bot's selectors, so the maps do not repeat them. '${section.key}' is substituted inside
+    a longer selector (e.g. "${checkout_fetch.section_selector} input").
+    """
+    def lookup(path: str):
+        resolved = selectors
+        for key in path.split("."):
+            resolved = resolved[key]
+        return resolved
+
+    def resolve(value):
+        if isinstance(value, str):
+            reference = SELECTOR_REFERENCE.match(value)
+            if reference:
+                return lookup(reference.group(1))
+            return SELECTOR_INTERPOLATION.sub(lambda match: lookup(match.group(1)), value)
+        if isinstance(value, list):
+            return [resolve(item) for item in value]
+        if isinstance(value, dict):
+            return {name: resolve(item) for name, item in value.items()}
+        return value
+
+    return resolve(fields)
+
+
+class DomExtractor:
+    """
+    Scrapes structured records (variants, cart items) in one page.evaluate instead of a
+    query_selector and inner_text round trip per field per element. Field maps are declared
+    per extraction in the 'extraction' section of a bot's selectors JSON:
+
+        "cart_items": {
+            "item_name": "$cart_verification.item_name",
+            "item_price": {"selector": "p", "contains": "$"},
+            "image": {"selector": "img", "attribute": ["data-src", "src"]},
+            "variants": {"selector": ["<list>", "<alternative list>"], "fields": {...}},
+            "price": {"selector": "<in element>", "fallback": {"selector": "<anywhere>", "scope": "page"}}
+        }
+
+    A field reads the innerText (the first non empty of 'attribute', or a DOM 'property' such
+    as 'disabled') of the first match, 'all' reads every match, 'fields' nests records and
+    'exists' only tells if there is a match. "scope": "siblings" looks among the following
+    siblings instead of the descendants. Field selectors are plain CSS: maps
+    needing Playwright-only selectors (:has-text, xpath) fail and, like a missing map, leave
+    callers on their element-by-element path.
+    """
+
+    _extractors: Dict[str, "DomExtractor"] = {}
+
+    def __init__(self, name: str, field_maps: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.name = name
+        self.field_maps = field_maps or {}
+        self.counters = {extraction: {"extracted": 0, "failed": 0} for extraction in self.field_maps}
+        self.sections: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    @classmethod
+    def for_bot(cls, bot_name: str, bot_selectors: Dict[str, Any], enabled: bool = True) -> "DomExtractor":
+        """
+        Returns the extractor of a bot, built once from its selectors.
+        """
+        if bot_name not in cls._extractors:
+            field_maps = {}
+            if enabled:
+                field_maps = {
+                    extraction: resolve_field_map(fields, bot_selectors.get("selectors", {}))
+                    for extraction, fields in (bot_selectors.get("extraction") or {}).items()
+                }
+            cls._extractors[bot_name] = cls(bot_name, field_maps)
+        return cls._extractors[bot_name]
+
+    def supports(self, extraction: str) -> bool:
+        return extraction in self.field_maps
+
+    async def extract(self, page: Page, extraction: str, elements: Optional[Sequence[ElementHandle]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns one record per element (a single one for the whole document without elements),
+        or None when the extraction is not declared or failed so the caller falls back.
+        """
+        if extraction not in self.field_maps:
+            return None
+        try:
+            records = await page.evaluate(EXTRACT_SCRIPT, [list(elements) if elements is not None else None, self.field_maps[extraction]])
+        except Error as e:
+            self.counters[extraction]["failed"] += 1
+            print(f"DOM extraction {self.name}.{extraction} failed, falling back: {e}")
+            return None
+        self.counters[extraction]["extracted"] += 1
+        return records
+
+    async def extract_one(self, page: Page, extraction: str) -> Optional[Dict[str, Any]]:
+        records = await self.extract(page, extraction)
+        return records[0] if records else None
+
+    async def timed(self, timings: Dict[str, float], section: str, awaitable):
+        """
+        Awaits a scraping section, adding its duration in ms to timings.
+        """
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[section] = round(timings.get(section, 0) + (time.perf_counter() - started) * 1000, 1)
+
+    def record_sections(self, operation: str, timings: Dict[str, float]):
+        """
+        Logs the section timings of an operation and keeps their running count, mean and max.
+        """
+        print(f"{self.name} {operation} section timings (ms): {timings}")
+        sections = self.sections.setdefault(operation, {})
+        for section, elapsed_ms in timings.items():
+            section_stats = sections.setdefault(section, {"count": 0, "mean_ms": 0.0, "max_ms": 0.0})
+            section_stats["count"] += 1
+            section_stats["mean_ms"] = round(section_stats["mean_ms"] + (elapsed_ms - section_stats["mean_ms"]) / section_stats["count"], 1)
+            section_stats["max_ms"] = max(section_stats["max_ms"], elapsed_ms)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            name: {
+                "extractions": {extraction: dict(counts) for extraction, counts in extractor.counters.items()},
+                "sections": {operation: {section: dict(values) for section, values in sections.items()} for operation, sections in extractor.sections.items()},
+            }
+            for name, extractor in cls._extractors.items()
+        }
@@ -0,0 +1,165 @@
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from fastapi import Request
+from sqlalchemy.pool import QueuePool
+from app.utils.step_timing import Histogram, StepTimer
+
+# Bucket bounds of the latency histograms, in milliseconds (exposed in seconds)
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 60000]
+POOL_WAIT_BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, 30000]
+
+# HTTPExceptions raised by the handlers, by bot and status code (see BaseHandlerRefactor.raise_http_exception)
+http_exceptions: Counter = Counter()
+
+
+def count_http_exception(bot_name: str, status_code: int):
+    http_exceptions[(bot_name, status_code)] += 1
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool recording how long each checkout waited for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_wait.record((time.perf_counter() - started) * 1000)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_wait = self.checkout_wait
+        return pool
+
+
+class RequestMetrics:
+    """
+    Latency of the API requests per route template, method and status, and the requests in flight.
+    """
+
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str, int], Histogram] = {}
+        self.in_flight = 0
+
+    async def dispatch(self, request: Request, call_next):
+        started = time.perf_counter()
+        status_code = 500
+        self.in_flight += 1
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            self.in_flight -= 1
+            # The route template, not the path, keeps cart ids out of the labels
+            route = request.scope.get("route")
+            key = (request.method, route.path if route else "unmatched", status_code)
+            if key not in self.latency:
+                self.latency[key] = Histogram()
+            self.latency[key].record((time.perf_counter() - started) * 1000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Exposition:
+    """
+    Writes metric families in the Prometheus text exposition format (version 0.0.4).
+    """
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> str:
+        if not labels:
+            return ""
+        escaped = (f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+        return "{" + ",".join(escaped) + "}"
+
+    def family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        self.lines.append(f"{name}{self._labels(labels or {})} {value if isinstance(value, int) else repr(float(value))}")
+
+    def histogram(self, name: str, histogram: Histogram, bounds_ms: List[float], labels: Optional[Dict[str, Any]] = None):
+        labels = labels or {}
+        for bound, count in zip(bounds_ms, histogram.cumulative(bounds_ms)):
+            self.sample(f"{name}_bucket", count, {**labels, "le": f"{bound / 1000:g}"})
+        self.sample(f"{name}_bucket", histogram.count, {**labels, "le": "+Inf"})
+        self.sample(f"{name}_sum", histogram.total_ms / 1000, labels)
+        self.sample(f"{name}_count", histogram.count, labels)
+
+    def metric(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, Any], float]], kind: str = "gauge"):
+        self.family(name, kind, help_text)
+        for labels, value in samples:
+            self.sample(name, value, labels)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(request_metrics: RequestMetrics, playwright_utils=None, engine=None, fetchers: Optional[Dict[str, Any]] = None) -> str:
+    """
+    All the service metrics, read from the in-memory state of each block: a scrape makes no
+    browser or database round trip.
+    """
+    out = Exposition()
+
+    out.metric("http_requests_in_flight", "API requests being handled.", [({}, request_metrics.in_flight)])
+    out.family("http_request_duration_seconds", "histogram", "API request latency by route template, method and status.")
+    for (method, route, status_code), histogram in sorted(request_metrics.latency.items()):
+        out.histogram("http_request_duration_seconds", histogram, LATENCY_BUCKETS_MS, {"method": method, "route": route, "status": status_code})
+
+    out.metric(
+        "handler_http_exceptions_total", "HTTPExceptions raised by the bot handlers, by bot and status.",
+        [({"bot": bot, "status": status_code}, count) for (bot, status_code), count in sorted(http_exceptions.items())],
+        kind="counter",
+    )
+
+    out.family("handler_step_duration_seconds", "histogram", "Handler step durations by bot, dispensary domain, step and outcome.")
+    for bot, timer in sorted(StepTimer.timers().items()):
+        for (domain, step, outcome), histogram in sorted(timer.histograms.items()):
+            out.histogram("handler_step_duration_seconds", histogram, LATENCY_BUCKETS_MS, {"bot": bot, "domain": domain, "step": step, "outcome": outcome})
+
+    supervisor = playwright_utils.supervisor if playwright_utils else None
+    if supervisor is not None:
+        out.metric("playwright_browsers", "Connected browsers.", [({}, sum(1 for slot in supervisor.slots if slot.healthy))])
+        out.metric("playwright_contexts_open", "Open browser contexts.", [({}, sum(slot.active_contexts for slot in supervisor.slots))])
+        out.metric("playwright_pages_open", "Open pages across the browser contexts.", [({}, supervisor.open_pages())])
+        supervisor_stats = supervisor.stats()
+        out.metric("playwright_browser_launches_total", "Browsers launched.", [({}, supervisor_stats["launches"])], kind="counter")
+        out.metric("playwright_browser_restarts_total", "Browsers restarted after a crash or disconnect.", [({}, supervisor_stats["restarts"])], kind="counter")
+    context_pool = playwright_utils.context_pool if playwright_utils else None
+    if context_pool is not None:
+        pool_stats = context_pool.stats()
+        out.metric("playwright_contexts_leased", "Pooled contexts leased to requests.", [({}, pool_stats["leased"])])
+        out.metric("playwright_context_lease_waiting", "Requests waiting for a pooled context.", [({}, pool_stats["waiting"])])
+
+    if fetchers:
+        out.metric(
+            "variation_fetches_total", "/variations lookups per tier and result (served, missed, failed upstream).",
+            [({"tier": tier, "result": result}, stats[result]) for tier, stats in sorted(fetchers.items()) for result in ("served", "missed", "failed")],
+            kind="counter",
+        )
+
+    pool = engine.pool if engine is not None else None
+    if isinstance(pool, QueuePool):
+        out.metric("db_pool_size", "Connections kept by the SQLAlchemy pool.", [({}, pool.size())])
+        out.metric("db_pool_checked_out", "Connections checked out of the SQLAlchemy pool.", [({}, pool.checkedout())])
+        out.metric("db_pool_overflow", "Connections opened beyond the pool size.", [({}, max(pool.overflow(), 0))])
+    if isinstance(pool, TimedQueuePool):
+        out.family("db_pool_checkout_wait_seconds", "histogram", "Time waited for a connection from the SQLAlchemy pool.")
+        out.histogram("db_pool_checkout_wait_seconds", pool.checkout_wait, POOL_WAIT_BUCKETS_MS)
+
+    return out.text()
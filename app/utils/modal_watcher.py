@@ -0,0 +1,74 @@
+import weakref
+from typing import Any, Dict, Iterable, List
+from playwright.async_api import Error, Locator, Page
+
+
+class ModalWatcher:
+    """
+    Dismisses benign overlays (age gate, preference prompts, promotional popups) whenever they
+    show up, instead of every navigation waiting a fixed time for them. Watchers are declared
+    in the 'modal_watchers' section of a bot's selectors JSON:
+
+        {"name": "age_gate", "modal": "<overlay selector>", "dismiss": "<button inside it>"}
+
+    'press' (e.g. "Escape") can replace 'dismiss', the key going to the overlay rather than to
+    whatever has the focus, 'no_wait_after' skips waiting for the overlay to go away and 'times'
+    limits how often it fires. They are installed as Playwright locator handlers, which run
+    before any action the overlay would block.
+    """
+
+    _watchers: Dict[str, "ModalWatcher"] = {}
+
+    def __init__(self, name: str, watchers: Iterable[Dict[str, Any]] = (), click_timeout: int = 2000):
+        self.name = name
+        self.watchers: List[Dict[str, Any]] = [watcher for watcher in watchers if watcher.get("modal")]
+        self.click_timeout = click_timeout
+        self.counters = {watcher["name"]: {"dismissed": 0, "failed": 0} for watcher in self.watchers}
+        self._installed = weakref.WeakSet()
+
+    @classmethod
+    def for_bot(cls, bot_name: str, bot_selectors: Dict[str, Any], enabled: bool = True) -> "ModalWatcher":
+        """
+        Returns the modal watcher of a bot, built once from its selectors.
+        """
+        if bot_name not in cls._watchers:
+            cls._watchers[bot_name] = cls(bot_name, (bot_selectors.get("modal_watchers") or []) if enabled else [])
+        return cls._watchers[bot_name]
+
+    def covers(self, name: str) -> bool:
+        """
+        Tells if the overlay of a watcher name is taken care of, so callers need not wait for it.
+        """
+        return any(watcher["name"] == name for watcher in self.watchers)
+
+    async def install(self, page: Page):
+        if not self.watchers or page in self._installed:
+            return
+        self._installed.add(page)
+        for watcher in self.watchers:
+            await page.add_locator_handler(
+                page.locator(watcher["modal"]).first,
+                self._dismisser(watcher),
+                no_wait_after=watcher.get("no_wait_after", False),
+                times=watcher.get("times"),
+            )
+
+    def _dismisser(self, watcher: Dict[str, Any]):
+        counters = self.counters[watcher["name"]]
+
+        async def dismiss(overlay: Locator):
+            try:
+                if watcher.get("dismiss"):
+                    await overlay.locator(watcher["dismiss"]).first.click(timeout=self.click_timeout)
+                elif watcher.get("press"):
+                    await overlay.press(watcher["press"], timeout=self.click_timeout)
+                counters["dismissed"] += 1
+            except Error as e:
+                counters["failed"] += 1
+                print(f"Failed to dismiss {watcher['name']} modal: {e}")
+
+        return dismiss
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {name: {modal: dict(counts) for modal, counts in watcher.counters.items()} for name, watcher in cls._watchers.items()}
@@ -0,0 +1,107 @@
+import time
+from typing import Any, Dict, Optional
+from playwright.async_api import Page, TimeoutError
+from app.utils.dom_extractor import resolve_field_map
+from app.utils.response_capture import PayloadCapture
+from app.utils.tracing import tracer
+
+# Readiness of the operations a bot does not configure. The handlers wait for the elements they
+# need once on the page, so a parsed document is enough for the product and cart pages. The
+# checkout pages keep the load event, their payment widgets initialize on it.
+DEFAULT_READINESS = {
+    "default": {"wait_until": "load"},
+    "variations": {"wait_until": "domcontentloaded"},
+    "add_to_cart": {"wait_until": "domcontentloaded"},
+    "cart_verification": {"wait_until": "domcontentloaded"},
+    "cart_deletion": {"wait_until": "domcontentloaded"},
+}
+
+DEFAULT_READY_TIMEOUT = 10000
+
+
+class NavigationReadiness:
+    """
+    Decides when a navigation is done, per operation (named like the network policy
+    operations: variations, add_to_cart, checkout_fetch...), instead of always waiting for
+    the load event and with it every tracker and image. Declared in the 'navigation' section
+    of a bot's selectors JSON:
+
+        "navigation": {
+            "variations": {"wait_until": "commit", "ready": {"response": "product"}},
+            "add_to_cart": {"wait_until": "domcontentloaded", "ready": {"selector": "$add_to_cart.prod_name"}}
+        }
+
+    'wait_until' is the goto wait (commit, domcontentloaded or load), then the optional 'ready'
+    condition waits for a selector or for the first captured API response of a kind (see
+    ResponseCapture). A ready condition not met within its 'timeout' (ms) falls back to the
+    load event. Operations not declared use DEFAULT_READINESS.
+    """
+
+    _readiness: Dict[str, "NavigationReadiness"] = {}
+
+    def __init__(self, name: str, strategies: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.name = name
+        self.strategies = {**DEFAULT_READINESS, **(strategies or {})}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def for_bot(cls, bot_name: str, bot_selectors: Dict[str, Any]) -> "NavigationReadiness":
+        """
+        Returns the navigation readiness of a bot, built once from its selectors.
+        """
+        if bot_name not in cls._readiness:
+            strategies = resolve_field_map(bot_selectors.get("navigation") or {}, bot_selectors.get("selectors", {}))
+            cls._readiness[bot_name] = cls(bot_name, strategies)
+        return cls._readiness[bot_name]
+
+    def strategy(self, operation: str) -> Dict[str, Any]:
+        return self.strategies.get(operation) or self.strategies["default"]
+
+    async def goto(self, page: Page, url: str, operation: str = "default", capture: Optional[PayloadCapture] = None) -> bool:
+        """
+        Navigates to url and waits for it to be ready for the operation. Returns False if
+        the ready condition was not met and the load event was waited for instead.
+        """
+        strategy = self.strategy(operation)
+        attributes = {"url": url, "operation": operation, "wait_until": strategy.get("wait_until", "load")}
+        with tracer.span("playwright.goto", attributes) as span:
+            started = time.perf_counter()
+            await page.goto(url, wait_until=strategy.get("wait_until", "load"))
+
+            ready = await self._wait_ready(page, strategy.get("ready"), strategy.get("timeout", DEFAULT_READY_TIMEOUT), capture)
+            if not ready:
+                print(f"{self.name} {operation} navigation not ready by its condition, waiting for the load event")
+                await page.wait_for_load_state("load")
+            span.set_attribute("ready", ready)
+
+        self._record(operation, (time.perf_counter() - started) * 1000, ready)
+        return ready
+
+    @staticmethod
+    async def _wait_ready(page: Page, ready: Optional[Dict[str, str]], timeout: int, capture: Optional[PayloadCapture]) -> bool:
+        if not ready:
+            return True
+        if "selector" in ready:
+            try:
+                await page.wait_for_selector(ready["selector"], timeout=timeout)
+                return True
+            except TimeoutError:
+                return False
+        if "response" in ready:
+            return capture is not None and await capture.arrival(ready["response"], timeout)
+        return True
+
+    def _record(self, operation: str, elapsed_ms: float, ready: bool):
+        timing = self.timings.setdefault(operation, {"count": 0, "mean_ms": 0.0, "max_ms": 0.0, "fallbacks": 0})
+        timing["count"] += 1
+        timing["mean_ms"] = round(timing["mean_ms"] + (elapsed_ms - timing["mean_ms"]) / timing["count"], 1)
+        timing["max_ms"] = max(timing["max_ms"], round(elapsed_ms, 1))
+        if not ready:
+            timing["fallbacks"] += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            name: {operation: dict(timing) for operation, timing in readiness.timings.items()}
+            for name, readiness in cls._readiness.items()
+        }
@@ -0,0 +1,168 @@
+import re
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+POLICY_KEYS = (
+    "blocked_resource_types",
+    "blocked_domains",
+    "allowed_domains",
+    "blocked_url_patterns",
+    "estimated_bytes",
+)
+
+DEFAULT_ESTIMATED_BYTES = 5000
+
+
+def _domain_matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class NetworkPolicy:
+    """
+    Declarative request blocking rules for one bot operation, built from the
+    'network_policy' section of the selectors JSON.
+    """
+
+    _compiled: Dict[tuple, Optional["NetworkPolicy"]] = {}
+
+    def __init__(
+        self,
+        name: str,
+        blocked_resource_types: Iterable[str] = (),
+        blocked_domains: Iterable[str] = (),
+        allowed_domains: Iterable[str] = (),
+        blocked_url_patterns: Iterable[str] = (),
+        estimated_bytes: Optional[Dict[str, int]] = None,
+    ):
+        self.name = name
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+        self.blocked_domains = tuple(domain.lower() for domain in blocked_domains)
+        self.allowed_domains = tuple(domain.lower() for domain in allowed_domains)
+        self.blocked_url_patterns = tuple(re.compile(pattern) for pattern in blocked_url_patterns)
+        self.estimated_bytes = estimated_bytes or {}
+
+    @classmethod
+    def from_config(cls, bot_name: str, config: Optional[Dict[str, Any]], operation: str) -> Optional["NetworkPolicy"]:
+        """
+        Builds the policy of an operation: the operation's entries under 'operations'
+        replace the bot-wide ones. Policies are compiled once per bot and operation.
+        :param bot_name: The name of the bot (e.g., 'dutchie').
+        :param config: The 'network_policy' section of the bot selectors, if any.
+        :param operation: The operation name (e.g., 'variations', 'add_to_cart').
+        :return: The policy, or None when the bot has no network policy or it is disabled.
+        """
+        key = (bot_name, operation)
+        if key in cls._compiled:
+            return cls._compiled[key]
+
+        policy = None
+        if config:
+            rules = {k: v for k, v in config.items() if k in POLICY_KEYS}
+            rules.update(config.get("operations", {}).get(operation, {}))
+            if rules.pop("enabled", config.get("enabled", True)):
+                policy = cls(f"{bot_name}:{operation}", **{k: v for k, v in rules.items() if k in POLICY_KEYS})
+        cls._compiled[key] = policy
+        return policy
+
+    def block_reason(self, url: str, resource_type: str) -> Optional[str]:
+        """
+        Returns why a request must be blocked, or None when it may go through.
+        """
+        if resource_type in self.blocked_resource_types:
+            return f"resource_type:{resource_type}"
+
+        host = (urlparse(url).hostname or "").lower()
+        if self.allowed_domains and host and not _domain_matches(host, self.allowed_domains):
+            return "domain_not_allowed"
+        if _domain_matches(host, self.blocked_domains):
+            return "domain_blocked"
+
+        for pattern in self.blocked_url_patterns:
+            if pattern.search(url):
+                return "url_pattern"
+        return None
+
+    def estimate_bytes(self, resource_type: str) -> int:
+        return self.estimated_bytes.get(resource_type, self.estimated_bytes.get("default", DEFAULT_ESTIMATED_BYTES))
+
+
+class NetworkPolicyStats:
+    """
+    Counts, per policy, the requests seen and the requests and (estimated) bytes skipped.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, policy: NetworkPolicy, resource_type: str, reason: Optional[str]):
+        stats = self._stats.get(policy.name)
+        if stats is None:
+            stats = self._stats[policy.name] = {
+                "requests": 0,
+                "blocked": 0,
+                "bytes_skipped_estimate": 0,
+                "by_reason": {},
+            }
+        stats["requests"] += 1
+        if reason:
+            stats["blocked"] += 1
+            stats["bytes_skipped_estimate"] += policy.estimate_bytes(resource_type)
+            stats["by_reason"][reason] = stats["by_reason"].get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {**stats, "by_reason": dict(stats["by_reason"])} for name, stats in self._stats.items()}
+
+
+class RequestRouter:
+    """
+    Context-level request routing. One router is installed per browser context and the
+    policy of the operation currently holding the context is swapped in on each lease.
+    Requests that get through the policy are served from the shared asset cache when possible.
+    """
+
+    def __init__(self, stats: NetworkPolicyStats, asset_cache=None):
+        self.stats = stats
+        self.asset_cache = asset_cache
+        self.policy: Optional[NetworkPolicy] = None
+
+    async def install(self, context):
+        await context.route("**/*", self.handle)
+
+    async def handle(self, route, request):
+        policy = self.policy
+        if policy is not None and not self._is_main_document(request):
+            reason = policy.block_reason(request.url, request.resource_type)
+            self.stats.record(policy, request.resource_type, reason)
+            if reason:
+                await route.abort("blockedbyclient")
+                return
+
+        if self.asset_cache is not None and self.asset_cache.is_cacheable(request):
+            await self._serve_cached(route, request)
+            return
+        await route.fallback()
+
+    async def _serve_cached(self, route, request):
+        cached = await self.asset_cache.get(request.url)
+        if cached:
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            print(f"Asset fetch failed for {request.url}: {e}")
+            await route.fallback()
+            return
+        await route.fulfill(response=response)
+        await self.asset_cache.put(request.url, response.status, response.headers, body)
+
+    @staticmethod
+    def _is_main_document(request) -> bool:
+        try:
+            return request.is_navigation_request() and request.frame.parent_frame is None
+        except Exception:
+            # Service worker requests have no frame
+            return False
@@ -1,20 +1,99 @@
+import asyncio
+import json
 import os
-from playwright.async_api import async_playwright, Browser
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, Error
 from app.config import Config
+from app.utils.asset_cache import AssetCache
+from app.utils.browser_supervisor import BrowserSupervisor
+from app.utils.cart_sessions import CartSessionCache
+from app.utils.context_pool import ContextPool
+from app.utils.dom_extractor import DomExtractor
+from app.utils.modal_watcher import ModalWatcher
+from app.utils.navigation import NavigationReadiness
+from app.utils.network_policy import NetworkPolicy, NetworkPolicyStats, RequestRouter
+from app.utils.response_capture import ResponseCapture
+from app.utils.settle import Settler
+from app.utils.storage_state_codec import StorageStateCodec
+from app.utils.warm_pages import WarmPagePool
 
 
 class PlaywrightUtils:
-    def __init__(self):
+    def __init__(self, handler_factory=None):
+        self.handler_factory = handler_factory
         self.playwright_instance = None
-        self.browser: Browser = None
+        self.supervisor: BrowserSupervisor = None
+        self.context_pool: ContextPool = None
+        self.network_stats = NetworkPolicyStats()
+        self.asset_cache: AssetCache = None
+        self.warm_pages: WarmPagePool = None
+        self.cart_sessions: CartSessionCache = None
+        self._routers = {}
+        self._connections = 0
+
+    @property
+    def browser(self) -> Browser:
+        return self.supervisor.primary_browser() if self.supervisor else None
 
     async def start(self):
+        if Config.ASSET_CACHE_MAX_MB > 0:
+            self.asset_cache = AssetCache(Config.ASSET_CACHE_DIR, max_bytes=Config.ASSET_CACHE_MAX_MB * 1024 * 1024)
+
         self.playwright_instance = await async_playwright().start()
+        self.supervisor = BrowserSupervisor(
+            self._launch_browser,
+            instances=Config.BROWSER_INSTANCES,
+            max_contexts_per_browser=Config.MAX_CONTEXTS_PER_BROWSER,
+            rss_limit_mb=Config.BROWSER_RSS_LIMIT_MB,
+            health_interval=Config.BROWSER_HEALTH_INTERVAL,
+            on_retire=self._purge_stale_contexts,
+            # A browser server's processes are not on this host
+            measure_rss=not Config.BROWSER_WS_ENDPOINTS,
+        )
+        await self.supervisor.start()
+
+        if Config.CONTEXT_POOL_SIZE > 0:
+            self.context_pool = ContextPool(
+                self._create_routed_context,
+                size=Config.CONTEXT_POOL_SIZE,
+                max_uses=Config.CONTEXT_POOL_MAX_USES,
+                lease_timeout=Config.CONTEXT_POOL_LEASE_TIMEOUT,
+                is_stale=self.supervisor.is_stale,
+            )
+            await self.context_pool.start()
+
+        if Config.WARM_PAGES_MAX > 0 and self.handler_factory is not None:
+            self.warm_pages = WarmPagePool(
+                self._create_policy_context,
+                self.handler_factory,
+                hot_dispensaries=Config.HOT_DISPENSARIES,
+                max_pages=Config.WARM_PAGES_MAX,
+                max_age=Config.WARM_PAGES_MAX_AGE,
+                refresh_interval=Config.WARM_PAGES_REFRESH_INTERVAL,
+                is_stale=self.supervisor.is_stale,
+            )
+            await self.warm_pages.start()
+
+        if Config.CART_SESSION_MAX > 0:
+            self.cart_sessions = CartSessionCache(
+                max_sessions=Config.CART_SESSION_MAX,
+                idle_ttl=Config.CART_SESSION_TTL,
+                is_stale=self.supervisor.is_stale,
+            )
+            await self.cart_sessions.start()
+
+    async def _launch_browser(self, extra_args):
+        """
+        Launches one browser instance for the supervisor, extra_args carries its slot marker.
+        """
+        if Config.BROWSER_WS_ENDPOINTS:
+            return await self._connect_browser(extra_args)
+
         if os.getenv("AWS_LAMBDA_FUNCTION_NAME") is not None:
-            # self.browser = await self.playwright_instance.chromium.launch(headless=Config.HEADLESS, args=["--single-process"])
-            self.browser = await self.playwright_instance.chromium.launch(
+            # return await self.playwright_instance.chromium.launch(headless=Config.HEADLESS, args=["--single-process"])
+            return await self.playwright_instance.chromium.launch(
                 headless=True, downloads_path="/tmp",
-                args=[
+                args=extra_args + [
                     '--autoplay-policy=user-gesture-required',
                     '--disable-background-networking',
                     '--disable-background-timer-throttling',
@@ -52,25 +131,218 @@ class PlaywrightUtils:
                     '--use-gl=swiftshader',
                     '--use-mock-keychain',
                     '--single-process'])
-        else:
-            self.browser = await self.playwright_instance.chromium.launch(headless=Config.HEADLESS)
+        return await self.playwright_instance.chromium.launch(headless=Config.HEADLESS, args=extra_args)
+
+    async def _connect_browser(self, extra_args):
+        """
+        Connects to a browser server instead of launching Chromium in this process.
+        The supervisor calls it again when the connection drops, so retrying with a
+        backoff here also covers a server restart.
+        """
+        endpoint = Config.BROWSER_WS_ENDPOINTS[self._connections % len(Config.BROWSER_WS_ENDPOINTS)]
+        self._connections += 1
+        delay = 0.5
+        for attempt in range(Config.BROWSER_CONNECT_RETRIES + 1):
+            try:
+                if Config.BROWSER_CONNECT_MODE == "cdp":
+                    return await self.playwright_instance.chromium.connect_over_cdp(
+                        endpoint, timeout=Config.BROWSER_CONNECT_TIMEOUT * 1000
+                    )
+                # run-server launches one browser per connection with these options
+                launch_options = {"headless": Config.HEADLESS, "args": extra_args}
+                return await self.playwright_instance.chromium.connect(
+                    endpoint,
+                    timeout=Config.BROWSER_CONNECT_TIMEOUT * 1000,
+                    headers={"x-playwright-launch-options": json.dumps(launch_options)},
+                )
+            except Error as e:
+                if attempt == Config.BROWSER_CONNECT_RETRIES:
+                    raise
+                print(f"Failed to connect to browser server {endpoint} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5)
+
+    async def _purge_stale_contexts(self):
+        if self.context_pool:
+            await self.context_pool.purge_stale()
+        if self.cart_sessions:
+            await self.cart_sessions.purge_stale()
 
     async def stop(self):
-        if self.browser:
-            await self.browser.close()
+        if self.cart_sessions:
+            await self.cart_sessions.stop()
+            self.cart_sessions = None
+        if self.warm_pages:
+            await self.warm_pages.stop()
+            self.warm_pages = None
+        if self.context_pool:
+            await self.context_pool.stop()
+            self.context_pool = None
+        if self.supervisor:
+            await self.supervisor.stop()
+            self.supervisor = None
         if self.playwright_instance:
             await self.playwright_instance.stop()
-        self.browser = None
         self.playwright_instance = None
+        if self.asset_cache:
+            self.asset_cache.flush()
 
     async def new_context(self, storage_state=None):
-        return await self.browser.new_context(storage_state=storage_state)
+        return await self.supervisor.new_context(storage_state=storage_state)
 
     async def new_page(self, context):
         return await context.new_page()
 
+    async def _create_routed_context(self, storage_state=None):
+        context = await self.supervisor.new_context(storage_state=storage_state)
+        router = RequestRouter(self.network_stats, asset_cache=self.asset_cache)
+        await router.install(context)
+        self._routers[context] = router
+        context.on("close", lambda _: self._routers.pop(context, None))
+        return context
+
+    async def _create_policy_context(self, network_policy: NetworkPolicy = None):
+        context = await self._create_routed_context()
+        self._routers[context].policy = network_policy
+        return context
+
+    @asynccontextmanager
+    async def lease_page(self, storage_state=None, network_policy: NetworkPolicy = None):
+        """
+        Yields a (context, page) pair with the given storage state applied and the
+        network policy of the calling operation routing its requests.
+        Leases it from the warm context pool when enabled, otherwise creates a throwaway context.
+        Storage states stored encoded by StorageStateCodec are decoded here.
+        """
+        storage_state = StorageStateCodec.decode(storage_state)
+        if self.context_pool is None:
+            async with await self._create_routed_context(storage_state=storage_state) as context:
+                self._routers[context].policy = network_policy
+                async with await self.new_page(context) as page:
+                    yield context, page
+            return
+
+        async with self.context_pool.lease(storage_state=storage_state) as pooled:
+            router = self._routers.get(pooled.context)
+            if router:
+                router.policy = network_policy
+            try:
+                yield pooled.context, pooled.page
+            finally:
+                if router:
+                    router.policy = None
+
+    @asynccontextmanager
+    async def lease_warm_page(self, product_url: str, storage_state=None, network_policy: NetworkPolicy = None):
+        """
+        Yields a (context, page, prewarmed) triple. Requests without a session of their own get
+        the pre-warmed menu page of the product's dispensary when one is ready, every request
+        counts towards learning the hot dispensaries.
+        """
+        warm_page = None
+        if self.warm_pages:
+            self.warm_pages.record(product_url)
+            if not storage_state:
+                warm_page = await self.warm_pages.take(product_url)
+
+        if warm_page is None:
+            async with self.lease_page(storage_state=storage_state, network_policy=network_policy) as (context, page):
+                yield context, page, False
+            return
+
+        router = self._routers.get(warm_page.context)
+        if router:
+            router.policy = network_policy
+        try:
+            yield warm_page.context, warm_page.page, True
+        finally:
+            try:
+                await warm_page.context.close()
+            except Exception as e:
+                print(f"Failed to close warm page context: {e}")
+
+    @asynccontextmanager
+    async def lease_cart_page(self, cart_id, storage_state=None, network_policy: NetworkPolicy = None, product_url: str = None):
+        """
+        Yields a (context, page, prewarmed, resumed) tuple for an operation on a cart.
+        With cart sessions enabled the cart's context and last page stay open between operations:
+        resumed tells the page already went through the initial checks in a previous operation.
+        A cart without a session yet can start from a pre-warmed menu page of product_url.
+        Callers report the storage state they persist with cart_state_persisted.
+        """
+        if self.cart_sessions is None:
+            if product_url:
+                async with self.lease_warm_page(product_url, storage_state=storage_state, network_policy=network_policy) as (context, page, prewarmed):
+                    yield context, page, prewarmed, False
+            else:
+                async with self.lease_page(storage_state=storage_state, network_policy=network_policy) as (context, page):
+                    yield context, page, False, False
+            return
+
+        prewarmed = False
+        session = await self.cart_sessions.acquire(cart_id, storage_state)
+        if session is None:
+            context, page, prewarmed = await self._open_cart_context(storage_state, product_url)
+            session = await self.cart_sessions.register(cart_id, context, page, storage_state)
+
+        router = self._routers.get(session.context)
+        if router:
+            router.policy = network_policy
+        failed = True
+        try:
+            yield session.context, session.page, prewarmed, session.uses > 0
+            failed = False
+        finally:
+            if router:
+                router.policy = None
+            await self.cart_sessions.release(session, failed=failed)
+
+    async def _open_cart_context(self, storage_state, product_url: str = None):
+        if self.warm_pages and product_url:
+            self.warm_pages.record(product_url)
+            if not storage_state:
+                warm_page = await self.warm_pages.take(product_url)
+                if warm_page is not None:
+                    return warm_page.context, warm_page.page, True
+
+        context = await self._create_routed_context(storage_state=StorageStateCodec.decode(storage_state))
+        try:
+            page = await self.new_page(context)
+        except BaseException:
+            await context.close()
+            raise
+        return context, page, False
+
+    def cart_state_persisted(self, cart_id, context, storage_state):
+        """
+        Tells the cart session cache which storage state was saved for a cart, and from which context.
+        """
+        if self.cart_sessions:
+            self.cart_sessions.persisted(cart_id, context, storage_state)
+
+    def end_cart_session(self, cart_id):
+        if self.cart_sessions:
+            self.cart_sessions.retire(cart_id)
+
     async def get_storage_state(self, context):
         return await context.storage_state()
 
     async def load_storage_state(self, storage_state):
-        return await self.browser.new_context(storage_state=storage_state)
+        return await self.supervisor.new_context(storage_state=StorageStateCodec.decode(storage_state))
+
+    def stats(self):
+        return {
+            "browser_mode": "remote" if Config.BROWSER_WS_ENDPOINTS else "embedded",
+            "browsers": self.supervisor.stats() if self.supervisor else None,
+            "context_pool": self.context_pool.stats() if self.context_pool else None,
+            "network_policy": self.network_stats.snapshot(),
+            "asset_cache": self.asset_cache.stats() if self.asset_cache else None,
+            "warm_pages": self.warm_pages.stats() if self.warm_pages else None,
+            "cart_sessions": self.cart_sessions.stats() if self.cart_sessions else None,
+            "storage_state": StorageStateCodec.stats(),
+            "modal_watchers": ModalWatcher.stats(),
+            "dom_extraction": DomExtractor.stats(),
+            "response_capture": ResponseCapture.stats(),
+            "navigation": NavigationReadiness.stats(),
+            "settle": Settler.all_stats(),
+        }
@@ -0,0 +1,267 @@
+import asyncio
+import re
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from playwright.async_api import Error, Page, Response
+
+
+class PayloadCapture:
+    """
+    JSON payloads of a storefront's own API grouped by kind (e.g. 'product', 'cart'), read
+    by the handlers' response parsers. Filled by a PageCapture as a page receives them, or
+    all at once by a fetcher requesting them without a browser.
+    """
+
+    def __init__(self, capture: Optional["ResponseCapture"] = None, payloads: Optional[Dict[str, List[Any]]] = None):
+        self.capture = capture
+        self.payloads: Dict[str, List[Any]] = payloads or {}
+        # Order in which each payload's response was received, reads completing out of order
+        self._positions: Dict[str, List[int]] = {kind: list(range(len(kind_payloads))) for kind, kind_payloads in self.payloads.items()}
+        self._received: Dict[str, int] = {kind: len(kind_payloads) for kind, kind_payloads in self.payloads.items()}
+        self._arrived: Dict[str, asyncio.Event] = {}
+        self._abandoned = set()
+
+    @property
+    def name(self) -> str:
+        return self.capture.name if self.capture else "static"
+
+    def _event(self, kind: str) -> asyncio.Event:
+        return self._arrived.setdefault(kind, asyncio.Event())
+
+    def _count(self, kind: str, counter: str):
+        if self.capture is not None and kind in self.capture.counters:
+            self.capture.counters[kind][counter] += 1
+
+    def _receive(self, kind: str) -> int:
+        position = self._received.get(kind, 0)
+        self._received[kind] = position + 1
+        return position
+
+    def mark(self, kind: str) -> int:
+        """
+        Number of payloads of kind received so far, read or not yet, for wait_for to only
+        look at the ones received after (e.g. the cart as updated by an add to cart).
+        """
+        return self._received.get(kind, 0)
+
+    def add(self, kind: str, payload: Any, position: Optional[int] = None):
+        self.payloads.setdefault(kind, []).append(payload)
+        self._positions.setdefault(kind, []).append(self._receive(kind) if position is None else position)
+        self._count(kind, "captured")
+        self._event(kind).set()
+
+    async def wait_for(self, kind: str, parse: Callable[[Any], Any], timeout: Optional[int] = None, after: int = 0) -> Any:
+        """
+        Returns the first non None result of parse over the payloads of kind, waiting up to
+        timeout ms for more to arrive (0 only looks at what already arrived), None if none did.
+        after skips the payloads received before that mark (see mark).
+        Without a ResponseCapture nothing else is coming, only the payloads at hand are looked at.
+        """
+        if timeout is None:
+            abandoned = kind in self._abandoned or self.capture is None
+            timeout = 0 if abandoned else self.capture.timeouts.get(kind, self.capture.timeout)
+        deadline = time.monotonic() + timeout / 1000
+        seen = 0
+        while True:
+            arrived = self._event(kind)
+            arrived.clear()
+            payloads = self.payloads.get(kind, [])
+            positions = self._positions.get(kind, [])
+            if len(positions) != len(payloads):
+                # Payloads set directly rather than added are in the order received
+                positions = range(len(payloads))
+            for payload, position in zip(payloads[seen:], positions[seen:]):
+                if position < after:
+                    continue
+                result = self._parse(kind, parse, payload)
+                if result is not None:
+                    self._count(kind, "used")
+                    return result
+            seen = len(payloads)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count(kind, "missed")
+                return None
+            try:
+                await asyncio.wait_for(arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def arrival(self, kind: str, timeout: int) -> bool:
+        """
+        Waits up to timeout ms for a payload of kind, without reading it. False if none came,
+        later waits for that kind then only look at what arrived.
+        """
+        if self.payloads.get(kind):
+            return True
+        try:
+            await asyncio.wait_for(self._event(kind).wait(), timeout / 1000)
+            return True
+        except asyncio.TimeoutError:
+            self._abandoned.add(kind)
+            return False
+
+    def latest(self, kind: str, parse: Callable[[Any], Any]) -> Any:
+        """
+        Returns the first non None result of parse over the payloads of kind already
+        captured, newest first (e.g. the cart as of the last mutation), without waiting.
+        """
+        for payload in reversed(self.payloads.get(kind, [])):
+            result = self._parse(kind, parse, payload)
+            if result is not None:
+                self._count(kind, "used")
+                return result
+        self._count(kind, "missed")
+        return None
+
+    def _parse(self, kind: str, parse: Callable[[Any], Any], payload: Any) -> Any:
+        try:
+            return parse(payload)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            print(f"Unexpected {self.name} {kind} payload: {e!r}")
+            return None
+
+
+class PageCapture(PayloadCapture):
+    """
+    Payloads captured on one page as its responses arrive.
+    """
+
+    def __init__(self, capture: "ResponseCapture", page: Page):
+        super().__init__(capture)
+        self._reads = set()
+        page.on("response", self._on_response)
+
+    def reset(self, route_change: bool = False):
+        """
+        Forgets what was captured so far, called when the page navigates. An in-app route
+        change keeps the 'persistent' kinds (e.g. the dispensary) its document already fetched.
+        """
+        self._abandoned.clear()
+        for kind in list(self.payloads):
+            if not (route_change and kind in self.capture.persistent):
+                del self.payloads[kind]
+                self._positions.pop(kind, None)
+                self._event(kind).clear()
+
+    def _on_response(self, response: Response):
+        kind = self.capture.match(response)
+        if kind is None:
+            return
+        read = asyncio.ensure_future(self._read(kind, response, self._receive(kind)))
+        self._reads.add(read)
+        read.add_done_callback(self._reads.discard)
+
+    async def _read(self, kind: str, response: Response, position: int):
+        try:
+            payload = await response.json()
+        except (Error, ValueError) as e:
+            print(f"Failed to read captured {kind} response {response.url}: {e}")
+            return
+        self.add(kind, payload, position)
+
+
+class ResponseCapture:
+    """
+    Listens to the JSON/GraphQL responses a storefront renders its pages from, so product,
+    price and cart data is read from them as soon as they arrive instead of scraping the
+    rendered DOM. Declared in the 'response_capture' section of a bot's selectors JSON:
+
+        "response_capture": {
+            "timeout": 5000,
+            "captures": {
+                "product": {"url": "<url regex>", "operation": "<GraphQL operationName regex>"}
+            }
+        }
+
+    'operation' is matched against the operationName of the query string or the JSON body,
+    "persistent": true keeps a kind's payloads across in-app route changes and "timeout"
+    overrides the section's for one kind. Other keys of the section are bot specific settings
+    the handler reads from config.
+    Interpreting the payloads is up to the handler, which falls back to the DOM when they
+    do not arrive in time or have an unexpected shape.
+    """
+
+    _captures: Dict[str, "ResponseCapture"] = {}
+
+    def __init__(self, name: str, captures: Optional[Dict[str, Dict[str, str]]] = None, timeout: int = 5000, config: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.timeout = timeout
+        self.config = config or {}
+        self.matchers = {
+            kind: (re.compile(spec["url"]), re.compile(spec["operation"]) if spec.get("operation") else None)
+            for kind, spec in (captures or {}).items()
+        }
+        self.timeouts = {kind: spec["timeout"] for kind, spec in (captures or {}).items() if "timeout" in spec}
+        self.persistent = {kind for kind, spec in (captures or {}).items() if spec.get("persistent")}
+        self.counters = {kind: {"captured": 0, "used": 0, "missed": 0} for kind in self.matchers}
+        self.served: Dict[str, Dict[str, int]] = {}
+        self._pages = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def for_bot(cls, bot_name: str, bot_selectors: Dict[str, Any], enabled: bool = True) -> "ResponseCapture":
+        """
+        Returns the response capture of a bot, built once from its selectors.
+        """
+        if bot_name not in cls._captures:
+            config = (bot_selectors.get("response_capture") or {}) if enabled else {}
+            cls._captures[bot_name] = cls(bot_name, config.get("captures"), timeout=config.get("timeout", 5000), config=config)
+        return cls._captures[bot_name]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.matchers)
+
+    def attach(self, page: Page) -> Optional[PageCapture]:
+        """
+        Starts capturing on a page (once per page), None when the bot declares no capture.
+        """
+        if not self.enabled:
+            return None
+        if page not in self._pages:
+            self._pages[page] = PageCapture(self, page)
+        return self._pages[page]
+
+    def record_served(self, operation: str, from_responses: bool):
+        """
+        Counts which path, captured responses or DOM scraping, served an operation.
+        """
+        served = self.served.setdefault(operation, {"responses": 0, "dom": 0})
+        served["responses" if from_responses else "dom"] += 1
+
+    def match(self, response: Response) -> Optional[str]:
+        for kind, (url_pattern, operation_pattern) in self.matchers.items():
+            if not url_pattern.search(response.url):
+                continue
+            if operation_pattern is None:
+                return kind
+            operation = self._operation_name(response)
+            if operation and operation_pattern.search(operation):
+                return kind
+        return None
+
+    @staticmethod
+    def _operation_name(response: Response) -> Optional[str]:
+        operation = parse_qs(urlparse(response.url).query).get("operationName")
+        if operation:
+            return operation[0]
+        try:
+            body = response.request.post_data_json
+        except (Error, ValueError):
+            return None
+        if isinstance(body, dict):
+            return body.get("operationName")
+        return None
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            name: {
+                "captures": {kind: dict(counts) for kind, counts in capture.counters.items()},
+                "served": {operation: dict(counts) for operation, counts in capture.served.items()},
+            }
+            for name, capture in cls._captures.items()
+        }
@@ -0,0 +1,188 @@
+import asyncio
+import time
+import weakref
+from typing import Any, Dict, Optional
+from playwright.async_api import Error, Page
+
+# Resolves once the DOM saw no mutation for `quiet` ms and the optional predicate holds, or after `timeout` ms
+SETTLE_SCRIPT = """
+async ({quiet, timeout, predicate}) => {
+    const holds = () => {
+        if (!predicate) return true;
+        const element = document.querySelectorAll(predicate.selector)[predicate.index || 0];
+        if (!predicate.attribute) return Boolean(element) === (predicate.present !== false);
+        if (!element) return false;
+        const value = element.getAttribute(predicate.attribute);
+        if (predicate.value !== undefined && predicate.value !== null) return value === predicate.value;
+        return (value !== null) === (predicate.present !== false);
+    };
+    const started = performance.now();
+    let lastMutation = started;
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    return await new Promise(resolve => {
+        const tick = () => {
+            const now = performance.now();
+            const settled = holds() && now - lastMutation >= quiet;
+            if (settled || now - started >= timeout) {
+                observer.disconnect();
+                resolve({settled, elapsed: now - started});
+                return;
+            }
+            setTimeout(tick, Math.min(50, quiet));
+        };
+        tick();
+    });
+}
+"""
+
+TRACKED_RESOURCE_TYPES = ("xhr", "fetch")
+
+
+def element_present(selector: str, present: bool = True) -> Dict[str, Any]:
+    """
+    Settle predicate: an element matching selector is (or is no longer) in the DOM.
+    """
+    return {"selector": selector, "present": present}
+
+
+def attribute_state(selector: str, attribute: str, value: Optional[str] = None, present: bool = True, index: int = 0) -> Dict[str, Any]:
+    """
+    Settle predicate on an attribute of the index-th element matching selector: equal to
+    value when given, else present or absent (e.g. a button losing 'disabled').
+    """
+    return {"selector": selector, "index": index, "attribute": attribute, "value": value, "present": present}
+
+
+class RequestTracker:
+    """
+    Counts the XHR/fetch requests of a page still in flight.
+    """
+
+    def __init__(self, page: Page, resource_types=TRACKED_RESOURCE_TYPES):
+        self.resource_types = resource_types
+        self.pending = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        page.on("request", self._started)
+        page.on("requestfinished", self._done)
+        page.on("requestfailed", self._done)
+
+    def _started(self, request):
+        if request.resource_type in self.resource_types:
+            self.pending.add(request)
+            self._idle.clear()
+
+    def _done(self, request):
+        self.pending.discard(request)
+        if not self.pending:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class Settler:
+    """
+    Waits for a page to settle after an action instead of sleeping a fixed time: no DOM
+    mutation for quiet_ms, no XHR/fetch in flight and, optionally, a predicate on an element
+    (see element_present and attribute_state) holding, all at once. Every wait is bounded by a
+    maximum, after which callers carry on as they did after the fixed sleep.
+    The quiet window can be tuned per bot in the 'settle' section of its selectors JSON.
+    """
+
+    _settlers: Dict[str, "Settler"] = {}
+
+    def __init__(self, name: str, quiet_ms: int = 250, track_requests: bool = True):
+        self.name = name
+        self.quiet_ms = quiet_ms
+        self.track_requests = track_requests
+        self._trackers = weakref.WeakKeyDictionary()
+
+        self.waits = 0
+        self.settled = 0
+        self.timed_out = 0
+        self.waited_ms = 0.0
+        self.saved_ms = 0.0
+
+    @classmethod
+    def for_bot(cls, bot_name: str, bot_selectors: Dict[str, Any], quiet_ms: int = 250) -> "Settler":
+        """
+        Returns the settler of a bot, built once from its selectors.
+        """
+        if bot_name not in cls._settlers:
+            config = bot_selectors.get("settle") or {}
+            cls._settlers[bot_name] = cls(
+                bot_name,
+                quiet_ms=config.get("quiet_ms", quiet_ms),
+                track_requests=config.get("track_requests", True),
+            )
+        return cls._settlers[bot_name]
+
+    def track(self, page: Page) -> Optional[RequestTracker]:
+        """
+        Starts counting the requests of a page, best done before the actions to settle after.
+        """
+        if not self.track_requests:
+            return None
+        if page not in self._trackers:
+            self._trackers[page] = RequestTracker(page)
+        return self._trackers[page]
+
+    async def wait(self, page: Page, max_wait: int, until: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Waits for the page to settle, at most max_wait ms. Returns False if it did not.
+        """
+        tracker = self.track(page)
+        started = time.monotonic()
+        deadline = started + max_wait / 1000
+        settled = False
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if tracker and tracker.pending:
+                await tracker.wait_idle(remaining)
+                continue
+            try:
+                result = await page.evaluate(SETTLE_SCRIPT, {"quiet": self.quiet_ms, "timeout": remaining * 1000, "predicate": until})
+            except Error as e:
+                # The document was replaced (navigation) while waiting, start over on the new one
+                print(f"Settle wait interrupted: {e}")
+                await asyncio.sleep(min(self.quiet_ms / 1000, max(remaining, 0)))
+                continue
+            if not result["settled"]:
+                break
+            if tracker and tracker.pending:
+                # A request went out during the quiet window, its response will change the DOM
+                continue
+            settled = True
+            break
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.waits += 1
+        self.waited_ms += elapsed_ms
+        if settled:
+            self.settled += 1
+            self.saved_ms += max(max_wait - elapsed_ms, 0)
+        else:
+            self.timed_out += 1
+        return settled
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "quiet_ms": self.quiet_ms,
+            "waits": self.waits,
+            "settled": self.settled,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.waited_ms / self.waits, 1) if self.waits else 0,
+            "saved_ms": round(self.saved_ms),
+        }
+
+    @classmethod
+    def all_stats(cls) -> Dict[str, Any]:
+        return {name: settler.stats() for name, settler in cls._settlers.items()}
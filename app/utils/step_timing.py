@@ -0,0 +1,215 @@
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from playwright.async_api import TimeoutError
+from app.utils.tracing import tracer
+
+# Steps of the current API request, collected by the request middleware (see collect_steps)
+_request_steps: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("request_steps", default=None)
+
+# Dispensary domain the current request's handler navigated to, handlers being shared between requests
+_step_domain: ContextVar[str] = ContextVar("step_domain", default="unknown")
+
+
+def set_step_domain(domain: str):
+    _step_domain.set(domain)
+
+
+class Histogram:
+    """
+    Log-linear (HDR style) histogram of durations: values are kept in microseconds, in buckets
+    2^-precision wide relative to their magnitude (about 3% with the default precision of 5),
+    so a fixed, small number of buckets covers microseconds to hours.
+    """
+
+    def __init__(self, precision: int = 5):
+        self.precision = precision
+        self.sub_buckets = 1 << precision
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _index(self, value_us: int) -> int:
+        if value_us < self.sub_buckets:
+            return value_us
+        magnitude = value_us.bit_length() - self.precision - 1
+        return (magnitude + 1) * self.sub_buckets + (value_us >> magnitude) - self.sub_buckets
+
+    def _upper_us(self, index: int) -> int:
+        """
+        Highest value of a bucket, in microseconds.
+        """
+        if index < self.sub_buckets:
+            return index
+        magnitude = index // self.sub_buckets - 1
+        return ((self.sub_buckets + index % self.sub_buckets + 1) << magnitude) - 1
+
+    def record(self, value_ms: float):
+        index = self._index(max(int(value_ms * 1000), 0))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(percent / 100 * self.count, 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._upper_us(index) / 1000, self.max_ms)
+        return self.max_ms
+
+    def cumulative(self, bounds_ms: List[float]) -> List[int]:
+        """
+        Number of values at or below each of the ascending bounds (bucket precision), for metrics
+        exposition.
+        """
+        counts, seen = [], 0
+        buckets = sorted(self.buckets.items())
+        position = 0
+        for bound in bounds_ms:
+            while position < len(buckets) and self._upper_us(buckets[position][0]) <= bound * 1000:
+                seen += buckets[position][1]
+                position += 1
+            counts.append(seen)
+        return counts
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else 0,
+            "p50_ms": round(self.percentile(50), 1),
+            "p90_ms": round(self.percentile(90), 1),
+            "p99_ms": round(self.percentile(99), 1),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+def outcome_of(error: Optional[BaseException]) -> str:
+    if error is None:
+        return "ok"
+    if isinstance(error, HTTPException):
+        return f"http_{error.status_code}"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return "error"
+
+
+class StepTimer:
+    """
+    Duration and outcome (ok, http_<status>, timeout, error) of the named steps of a bot's
+    handlers, per dispensary domain, in Histograms. Each step also lands in the summary of
+    the API request it runs for (see collect_steps). The steps of a disabled timer run as
+    they are, untimed (see timed_method).
+    """
+
+    _timers: Dict[str, "StepTimer"] = {}
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.histograms: Dict[Tuple[str, str, str], Histogram] = {}
+
+    @classmethod
+    def for_bot(cls, bot_name: str, enabled: bool = True) -> "StepTimer":
+        """
+        Returns the step timer of a bot, created once.
+        """
+        if bot_name not in cls._timers:
+            cls._timers[bot_name] = cls(bot_name, enabled=enabled)
+        return cls._timers[bot_name]
+
+    def record(self, domain: str, step: str, outcome: str, elapsed_ms: float):
+        key = (domain, step, outcome)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].record(elapsed_ms)
+        steps = _request_steps.get()
+        if steps is not None:
+            steps.append({"bot": self.name, "step": step, "outcome": outcome, "ms": round(elapsed_ms, 1)})
+
+    @classmethod
+    def timers(cls) -> Dict[str, "StepTimer"]:
+        return dict(cls._timers)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        stats = {}
+        for name, timer in cls._timers.items():
+            for (domain, step, outcome), histogram in sorted(timer.histograms.items()):
+                stats.setdefault(name, {}).setdefault(domain, {}).setdefault(step, {})[outcome] = histogram.summary()
+        return stats
+
+
+def timed_method(method, step: str):
+    """
+    Wraps a handler method to time it as a step of the handler's StepTimer, for the dispensary
+    domain the request is on once the method returns (navigating sets it, see set_step_domain),
+    and to trace it as a span of the request.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        timer = self.step_timer
+        if not timer.enabled and not tracer.enabled:
+            return await method(self, *args, **kwargs)
+        with tracer.span(f"{self.bot_name}.{step}", {"bot": self.bot_name, "step": step}) as span:
+            started = time.perf_counter()
+            error = None
+            try:
+                return await method(self, *args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                domain = _step_domain.get()
+                span.set_attribute("dispensary", domain)
+                if timer.enabled:
+                    timer.record(domain, step, outcome_of(error), (time.perf_counter() - started) * 1000)
+    wrapper.step = step
+    return wrapper
+
+
+def instrument_steps(cls):
+    """
+    Times the methods a handler class defines among its STEPS (method name: step name).
+    Abstract methods are left alone, their implementations get timed in the subclasses.
+    """
+    for method_name, step in cls.STEPS.items():
+        method = cls.__dict__.get(method_name)
+        if method is None or getattr(method, "__isabstractmethod__", False) or hasattr(method, "step"):
+            continue
+        setattr(cls, method_name, timed_method(method, step))
+    return cls
+
+
+@contextmanager
+def collect_steps():
+    """
+    Collects the steps timed while handling a request, yielding their list.
+    """
+    steps: List[Dict[str, Any]] = []
+    token = _request_steps.set(steps)
+    try:
+        yield steps
+    finally:
+        _request_steps.reset(token)
+
+
+def server_timing(steps: List[Dict[str, Any]]) -> str:
+    """
+    Server-Timing header value of a request's steps, repeated steps summed.
+    """
+    totals: Dict[str, float] = {}
+    for step in steps:
+        totals[step["step"]] = totals.get(step["step"], 0) + step["ms"]
+    return ", ".join(f"{step};dur={elapsed_ms:.1f}" for step, elapsed_ms in totals.items())
@@ -0,0 +1,125 @@
+import base64
+import fnmatch
+import json
+import zlib
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+CODEC_NAME = "zlib+base64/v1"
+
+
+def _domain_matches(host: str, domains: Iterable[str]) -> bool:
+    host = host.lstrip(".").lower()
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":")).encode()) if value is not None else 0
+
+
+class StorageStateCodec:
+    """
+    Shrinks Playwright storage states before they are stored with the cart: only the cookies
+    and localStorage of the origins a bot needs are kept (the 'storage_state' section of the
+    selectors JSON, defaulting to the bot's domains), then the result is compressed.
+    Decoding accepts both encoded and plain storage states, so existing carts keep working.
+    """
+
+    _codecs: Dict[str, "StorageStateCodec"] = {}
+
+    def __init__(
+        self,
+        name: str,
+        domains: Iterable[str] = (),
+        local_storage_keys: Iterable[str] = ("*",),
+        compress: bool = True,
+    ):
+        self.name = name
+        self.domains = tuple(domain.lower() for domain in domains)
+        self.local_storage_keys = tuple(local_storage_keys)
+        self.compress = compress
+
+        self.encoded = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    @classmethod
+    def for_bot(cls, bot_name: str, bot_selectors: Dict[str, Any]) -> "StorageStateCodec":
+        """
+        Returns the codec of a bot, built once from its selectors.
+        """
+        if bot_name not in cls._codecs:
+            config = bot_selectors.get("storage_state") or {}
+            cls._codecs[bot_name] = cls(
+                bot_name,
+                domains=config.get("domains", bot_selectors.get("domains", [])),
+                local_storage_keys=config.get("local_storage_keys", ["*"]),
+                compress=config.get("compress", True),
+            )
+        return cls._codecs[bot_name]
+
+    def filter(self, storage_state: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.domains:
+            return storage_state
+        cookies = [cookie for cookie in storage_state.get("cookies") or [] if _domain_matches(cookie.get("domain", ""), self.domains)]
+        origins = []
+        for origin in storage_state.get("origins") or []:
+            if not _domain_matches(urlparse(origin.get("origin", "")).hostname or "", self.domains):
+                continue
+            local_storage = [
+                entry for entry in origin.get("localStorage") or []
+                if any(fnmatch.fnmatchcase(entry.get("name", ""), pattern) for pattern in self.local_storage_keys)
+            ]
+            if local_storage:
+                origins.append({"origin": origin["origin"], "localStorage": local_storage})
+        return {"cookies": cookies, "origins": origins}
+
+    def encode(self, storage_state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if storage_state is None:
+            return None
+        encoded = self._pack(self.filter(self.decode(storage_state)))
+        self.encoded += 1
+        self.raw_bytes += _json_size(storage_state)
+        self.stored_bytes += _json_size(encoded)
+        return encoded
+
+    def _pack(self, filtered: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.compress:
+            return filtered
+        payload = zlib.compress(json.dumps(filtered, separators=(",", ":")).encode(), 9)
+        return {"codec": CODEC_NAME, "data": base64.b64encode(payload).decode("ascii")}
+
+    @staticmethod
+    def decode(stored: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not stored or stored.get("codec") is None:
+            return stored
+        if stored["codec"] != CODEC_NAME:
+            raise ValueError(f"Unknown storage state codec {stored['codec']}")
+        return json.loads(zlib.decompress(base64.b64decode(stored["data"])))
+
+    @staticmethod
+    def size_report(stored: Optional[Dict[str, Any]], codec: Optional["StorageStateCodec"] = None) -> Dict[str, Any]:
+        """
+        Sizes of a stored storage state: as stored, decoded, and once (re-)encoded with the codec.
+        """
+        decoded = StorageStateCodec.decode(stored)
+        report = {
+            "codec": stored.get("codec") if stored else None,
+            "stored_bytes": _json_size(stored),
+            "decoded_bytes": _json_size(decoded),
+        }
+        if codec is not None and decoded is not None:
+            report["encoded_bytes"] = _json_size(codec._pack(codec.filter(decoded)))
+        return report
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            name: {
+                "encoded": codec.encoded,
+                "raw_bytes": codec.raw_bytes,
+                "stored_bytes": codec.stored_bytes,
+                "ratio": round(codec.stored_bytes / codec.raw_bytes, 3) if codec.raw_bytes else None,
+            }
+            for name, codec in cls._codecs.items()
+        }
@@ -0,0 +1,361 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from fastapi import HTTPException
+
+# Attributes a span hands down to its children, so every span of a trace can be filtered by them
+INHERITED_ATTRIBUTES = ("cart_id", "bot", "dispensary")
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed operation of a trace. Spans of unsampled traces are not recording: they only
+    carry the trace id and the sampling decision down to their children.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, recording: bool = True, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.recording = recording
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.start_ns = time.time_ns() if recording else 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        if not self.recording:
+            return
+        if isinstance(error, HTTPException):
+            self.attributes["http.status_code"] = error.status_code
+            if error.status_code < 500:
+                return
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.recording else '00'}"
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# Yielded by the tracer while tracing is off
+NOOP_SPAN = Span("noop", "0" * 32, recording=False)
+
+
+class RatioSampler:
+    """
+    Samples a share of the new traces, from their trace id. Traces continued from a caller
+    (traceparent header) or a parent span keep the parent's decision.
+    """
+
+    def __init__(self, ratio: float = 1.0):
+        self.ratio = min(max(ratio, 0.0), 1.0)
+        self._bound = int(self.ratio * (1 << 64))
+
+    def should_sample(self, trace_id: str, parent_sampled: Optional[bool] = None) -> bool:
+        if parent_sampled is not None:
+            return parent_sampled
+        return int(trace_id[16:], 16) < self._bound
+
+
+class FileExporter:
+    """
+    Appends the finished spans to a file, one JSON object per line.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write(lines)
+
+    async def close(self):
+        pass
+
+
+class OtlpExporter:
+    """
+    Sends the finished spans to an OpenTelemetry collector, OTLP over HTTP with the JSON encoding.
+    """
+
+    name = "otlp"
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.client = httpx.AsyncClient(timeout=timeout, transport=transport)
+
+    @staticmethod
+    def _value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # Server for the routes, client for the SQL queries, internal otherwise
+            "kind": 2 if "http.method" in span.attributes else 3 if "db.system" in span.attributes else 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": self._value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+    async def export(self, spans: List[Span]):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.utils.tracing"}, "spans": [self._span(span) for span in spans]}],
+        }]}
+        response = await self.client.post(self.endpoint, json=body)
+        response.raise_for_status()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class Tracer:
+    """
+    Records the spans of the API requests, from the route down to the handler steps, the
+    Playwright navigations and the SQL queries, and exports them in batches. The current span
+    follows the request through its context (ContextVar), so nested spans find their parent on
+    their own. Without an exporter tracing is off and spans are no-ops.
+    """
+
+    def __init__(self, exporter=None, sampler: Optional[RatioSampler] = None, flush_interval: float = 5, max_queue: int = 10000):
+        self.exporter = exporter
+        self.sampler = sampler or RatioSampler()
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._pending: List[Span] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.started = 0
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def configure(self, exporter=None, sampler: Optional[RatioSampler] = None, flush_interval: Optional[float] = None):
+        self.exporter = exporter
+        self.sampler = sampler or self.sampler
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+
+    @staticmethod
+    def extract(traceparent: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+        """
+        (trace id, parent span id, sampled) of a W3C traceparent header, None if invalid.
+        """
+        match = TRACEPARENT.match((traceparent or "").strip().lower())
+        if not match:
+            return None
+        return match.group(1), match.group(2), match.group(3) == "01"
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, remote_parent: Optional[Tuple[str, str, bool]] = None) -> Span:
+        """
+        A new span, child of the current one (or of a remote parent). It is not made current.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id, parent_id, parent_sampled = parent.trace_id, parent.span_id, parent.recording
+        elif remote_parent is not None:
+            trace_id, parent_id, parent_sampled = remote_parent
+        else:
+            trace_id, parent_id, parent_sampled = f"{random.getrandbits(128):032x}", None, None
+
+        recording = self.sampler.should_sample(trace_id, parent_sampled)
+        if not recording:
+            return Span(name, trace_id, parent_id, recording=False)
+        inherited = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES if parent is not None and key in parent.attributes}
+        self.started += 1
+        return Span(name, trace_id, parent_id, attributes={**inherited, **{k: v for k, v in (attributes or {}).items() if v is not None}})
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        if not span.recording:
+            return
+        if error is not None:
+            span.record_error(error)
+        span.end_ns = time.time_ns()
+        if len(self._pending) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._pending.append(span)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, remote_parent: Optional[Tuple[str, str, bool]] = None):
+        """
+        Runs the block in a new current span, ended (with the error, if any) when the block exits.
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = self.start_span(name, attributes, remote_parent)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span, error)
+
+    @staticmethod
+    def current_span() -> Span:
+        return _current_span.get() or NOOP_SPAN
+
+    async def flush(self):
+        spans, self._pending = self._pending, []
+        if not spans or not self.enabled:
+            return
+        try:
+            await self.exporter.export(spans)
+            self.exported += len(spans)
+        except Exception as e:
+            self.export_errors += 1
+            self.dropped += len(spans)
+            print(f"Exporting {len(spans)} spans to {self.exporter.name} failed: {e!r}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self.enabled and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self.exporter is not None:
+            await self.exporter.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": self.exporter.name if self.exporter else None,
+            "sample_ratio": self.sampler.ratio,
+            "spans": self.started,
+            "exported": self.exported,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "export_errors": self.export_errors,
+        }
+
+
+tracer = Tracer()
+
+
+def traced(name: str, arguments: Tuple[str, ...] = ()):
+    """
+    Runs an async function in a span, with the given arguments as attributes (a product_url
+    argument is recorded as its dispensary domain).
+    """
+    def decorate(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await function(*args, **kwargs)
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            attributes = {}
+            for argument in arguments:
+                value = bound.get(argument)
+                if argument == "product_url" and value:
+                    attributes["dispensary"] = urlsplit(value).netloc
+                elif value is not None:
+                    attributes[argument] = str(value)
+            with tracer.span(name, attributes):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_engine(engine, max_statement: int = 500):
+    """
+    Records a span per SQL statement executed by a SQLAlchemy engine.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if tracer.enabled:
+            conn.info.setdefault("trace_spans", []).append(tracer.start_span(
+                "db.query",
+                {"db.system": engine.dialect.name, "db.statement": statement[:max_statement], "db.operation": statement.split(None, 1)[0].upper()},
+            ))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            tracer.end_span(spans.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            tracer.end_span(spans.pop(), exception_context.original_exception)
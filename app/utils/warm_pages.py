@@ -0,0 +1,200 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+class WarmPage:
+    """
+    A page sitting on a dispensary menu with the age gate already passed.
+    """
+
+    def __init__(self, menu_url: str, context, page):
+        self.menu_url = menu_url
+        self.context = context
+        self.page = page
+        self.warmed_at = time.monotonic()
+
+
+class WarmPagePool:
+    """
+    Keeps one page open on the menu of each hot dispensary so product requests only need an
+    in-app route change. Hot dispensaries are the configured ones plus the most requested
+    ones, learned from a decaying request counter. Pages are single use and refreshed on a timer.
+    """
+
+    def __init__(
+        self,
+        context_factory: Callable[[Any], Awaitable[Any]],
+        handler_factory,
+        hot_dispensaries: Iterable[str] = (),
+        max_pages: int = 4,
+        max_age: float = 300.0,
+        refresh_interval: float = 60.0,
+        half_life: float = 600.0,
+        min_requests: float = 2.0,
+        is_stale: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.context_factory = context_factory
+        self.handler_factory = handler_factory
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.half_life = half_life
+        self.min_requests = min_requests
+        self.is_stale = is_stale
+        self.configured = [menu for menu in (self.menu_url(url) for url in hot_dispensaries) if menu]
+
+        self._pages: Dict[str, WarmPage] = {}
+        self._warming: Dict[str, asyncio.Task] = {}
+        self._scores: Dict[str, List[float]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.warmed = 0
+        self.failures = 0
+
+    async def start(self):
+        # Warming runs in the background so startup does not wait for the dispensary sites
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        for task in list(self._warming.values()):
+            task.cancel()
+        self._warming.clear()
+        for menu in list(self._pages):
+            await self._close(self._pages.pop(menu).context)
+
+    def menu_url(self, url: str) -> Optional[str]:
+        try:
+            return self.handler_factory.get_bot_handler(website_url=url).get_menu_url(url)
+        except ValueError:
+            return None
+
+    def record(self, product_url: str):
+        """
+        Counts a request for the dispensary of a product URL, older requests weigh less.
+        """
+        menu = self.menu_url(product_url)
+        if not menu:
+            return
+        now = time.monotonic()
+        score, updated_at = self._scores.get(menu, (0.0, now))
+        self._scores[menu] = [self._decay(score, now - updated_at) + 1.0, now]
+
+    def hot_menus(self) -> List[str]:
+        now = time.monotonic()
+        learned = sorted(
+            (
+                (self._decay(score, now - updated_at), menu)
+                for menu, (score, updated_at) in self._scores.items()
+                if menu not in self.configured
+            ),
+            reverse=True,
+        )
+        menus = self.configured + [menu for score, menu in learned if score >= self.min_requests]
+        return menus[:self.max_pages]
+
+    async def take(self, product_url: str) -> Optional[WarmPage]:
+        """
+        Hands out the warm page of a product's dispensary, if one is ready, and warms a replacement.
+        """
+        menu = self.menu_url(product_url)
+        warm_page = self._pages.pop(menu, None) if menu else None
+        if warm_page is None or not self._usable(warm_page):
+            if warm_page is not None:
+                await self._close(warm_page.context)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if menu in self.hot_menus():
+            self._schedule_warm(menu)
+        return warm_page
+
+    async def refresh(self):
+        """
+        Warms missing pages of hot dispensaries, replaces expired ones and drops the ones no longer hot.
+        """
+        now = time.monotonic()
+        for menu, (score, updated_at) in list(self._scores.items()):
+            if self._decay(score, now - updated_at) < 0.01:
+                del self._scores[menu]
+
+        hot = self.hot_menus()
+        for menu in list(self._pages):
+            warm_page = self._pages[menu]
+            if menu not in hot or not self._usable(warm_page):
+                del self._pages[menu]
+                await self._close(warm_page.context)
+
+        for menu in hot:
+            if menu not in self._pages:
+                self._schedule_warm(menu)
+        if self._warming:
+            await asyncio.gather(*self._warming.values(), return_exceptions=True)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Failed to refresh warm pages: {e}")
+            if self.refresh_interval <= 0:
+                return
+            await asyncio.sleep(self.refresh_interval)
+
+    def _schedule_warm(self, menu: str):
+        if menu in self._warming:
+            return
+        task = asyncio.create_task(self._warm(menu))
+        self._warming[menu] = task
+        task.add_done_callback(lambda _: self._warming.pop(menu, None))
+
+    async def _warm(self, menu: str):
+        handler = self.handler_factory.get_bot_handler(website_url=menu)
+        context = None
+        try:
+            context = await self.context_factory(handler.get_network_policy("warm_up"))
+            page = await context.new_page()
+            await handler.warm_up(page, menu)
+        except Exception as e:
+            self.failures += 1
+            print(f"Failed to warm {menu}: {e}")
+            if context is not None:
+                await self._close(context)
+            return
+
+        self.warmed += 1
+        previous = self._pages.get(menu)
+        self._pages[menu] = WarmPage(menu, context, page)
+        if previous is not None:
+            await self._close(previous.context)
+
+    def _usable(self, warm_page: WarmPage) -> bool:
+        if warm_page.page.is_closed() or time.monotonic() - warm_page.warmed_at > self.max_age:
+            return False
+        return not (self.is_stale and self.is_stale(warm_page.context))
+
+    def _decay(self, score: float, elapsed: float) -> float:
+        return score * 0.5 ** (elapsed / self.half_life) if self.half_life > 0 else score
+
+    async def _close(self, context):
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"Failed to close warm page context: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hot": self.hot_menus(),
+            "ready": len(self._pages),
+            "warming": len(self._warming),
+            "hits": self.hits,
+            "misses": self.misses,
+            "warmed": self.warmed,
+            "failures": self.failures,
+        }
@@ -0,0 +1,11 @@
+\c uni;
+
+-- Membership of the API nodes, used to route a cart's requests to the node owning it
+CREATE TABLE api_nodes(
+    node_id TEXT PRIMARY KEY,
+    address TEXT NOT NULL,        -- Internal base URL, e.g. http://10.0.1.12:8000
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX api_nodes_heartbeat_at ON api_nodes (heartbeat_at);
@@ -0,0 +1,84 @@
+"""
+Compares the embedded and remote browser modes of PlaywrightUtils: startup time,
+context + page creation latency under concurrency and the memory of the API process.
+
+    python -m tests.benchmarks.bench_browser_modes --contexts 200 --concurrency 8
+    python -m tests.benchmarks.bench_browser_modes --endpoint ws://localhost:3000/
+
+Without --endpoint a local browser server is started for the remote run.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import psutil
+from app.config import Config
+from app.utils.playwright_utils import PlaywrightUtils
+
+PAGE = "data:text/html,<html><body><h1 data-testid='product-name'>Benchmark</h1></body></html>"
+
+
+async def run_mode(name: str, endpoints, contexts: int, concurrency: int):
+    Config.BROWSER_WS_ENDPOINTS = endpoints
+    Config.CONTEXT_POOL_SIZE = 0
+    Config.WARM_PAGES_MAX = 0
+    Config.ASSET_CACHE_MAX_MB = 0
+
+    utils = PlaywrightUtils()
+    started = time.perf_counter()
+    await utils.start()
+    startup = time.perf_counter() - started
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            begin = time.perf_counter()
+            async with utils.lease_page() as (context, page):
+                await page.goto(PAGE)
+            latencies.append(time.perf_counter() - begin)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(contexts)])
+    elapsed = time.perf_counter() - started
+    rss = psutil.Process().memory_info().rss
+    children_rss = sum(child.memory_info().rss for child in psutil.Process().children(recursive=True))
+    await utils.stop()
+
+    latencies.sort()
+    print(
+        f"{name:>8}: startup={startup * 1000:.0f}ms throughput={contexts / elapsed:.1f}/s "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms "
+        f"api_rss={rss / 1024 / 1024:.0f}MB api_children_rss={children_rss / 1024 / 1024:.0f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contexts", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", help="Browser server to use for the remote run")
+    parser.add_argument("--port", type=int, default=3999)
+    args = parser.parse_args()
+
+    asyncio.run(run_mode("embedded", [], args.contexts, args.concurrency))
+
+    server = None
+    endpoint = args.endpoint
+    if not endpoint:
+        server = subprocess.Popen([sys.executable, "-m", "app.browser_server", "--port", str(args.port)], env=os.environ.copy())
+        endpoint = f"ws://127.0.0.1:{args.port}/"
+    try:
+        asyncio.run(run_mode("remote", [endpoint], args.contexts, args.concurrency))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
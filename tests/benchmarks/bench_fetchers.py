@@ -0,0 +1,144 @@
+"""
+Latency and memory of the two /variations tiers against a local stub of a Dutchie product
+page: the HTTP fetcher reading the page's embedded JSON, and the browser rendering the page
+and reading the product API responses it makes.
+
+    python -m tests.benchmarks.bench_fetchers --lookups 50 --concurrency 4 --latency 80
+
+--latency delays every stub response, like a remote storefront would.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import psutil
+from playwright.async_api import async_playwright
+from app.fetchers.browser_fetcher import BrowserFetcher
+from app.fetchers.http_fetcher import HttpFetcher
+from app.handlers.dutchie_handler import DutchieHandler
+from app.services.selectors_service import SelectorsService
+
+PRODUCT_PATH = "/dispensary/green-leaf/product/blue-dream"
+DISPENSARIES = {"data": {"filteredDispensaries": [{"name": "Green Leaf", "logoImage": "https://images.dutchie.com/logo.png"}]}}
+PRODUCTS = {"data": {"filteredProducts": {"products": [
+    {"cName": "blue-dream", "Name": "Blue Dream", "Image": "https://images.dutchie.com/blue-dream.jpg", "Status": "Active",
+     "Options": ["1/8oz", "1/4oz", "1/2oz"], "recPrices": [35, 65, 120]},
+]}}}
+PAGE = f"""
+<html><body><div id="__next"></div>
+<script id="__NEXT_DATA__" type="application/json">{json.dumps({"props": {"apolloState": {**DISPENSARIES["data"], **PRODUCTS["data"]}}})}</script>
+<script>
+for (const operation of ["ConsumerDispensaries", "FilteredProducts"]) fetch(`/graphql?operationName=${{operation}}`);
+</script>
+</body></html>
+"""
+
+
+class StubStorefront(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0
+
+    def do_GET(self):
+        time.sleep(self.latency / 1000)
+        if self.path.startswith("/graphql"):
+            body, content_type = json.dumps(PRODUCTS if "FilteredProducts" in self.path else DISPENSARIES), "application/json"
+        else:
+            body, content_type = PAGE, "text/html"
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubBrowserFetcher(BrowserFetcher):
+    """
+    The browser tier, on a throwaway context whose dutchie.com requests go to the stub.
+    """
+
+    def __init__(self, browser, stub_url: str):
+        super().__init__(playwright_utils=None)
+        self.browser = browser
+        self.stub_url = stub_url
+
+    async def _render(self, handler, product_url):
+        async with await self.browser.new_context() as context:
+            async def to_stub(route):
+                await route.fulfill(response=await route.fetch(url=route.request.url.replace("https://dutchie.com", self.stub_url)))
+
+            await context.route("https://dutchie.com/**", to_stub)
+            page = await context.new_page()
+            return await handler.get_variations(page=page, product_url=product_url)
+
+
+def rss_mb(include_children: bool) -> float:
+    process = psutil.Process(os.getpid())
+    processes = [process] + (process.children(recursive=True) if include_children else [])
+    total = 0
+    for member in processes:
+        try:
+            total += member.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total / 1024 / 1024
+
+
+async def run_tier(name: str, fetcher, handler, product_url: str, lookups: int, concurrency: int, include_children: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    peak = rss_mb(include_children)
+
+    async def one():
+        nonlocal peak
+        async with semaphore:
+            started = time.perf_counter()
+            variations = await fetcher.fetch(handler, product_url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert variations and len(variations["variations"]["variants"]) == 3, variations
+            peak = max(peak, rss_mb(include_children))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(lookups)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{name:>7}: p50={statistics.median(latencies):.0f}ms p95={latencies[int(len(latencies) * 0.95) - 1]:.0f}ms "
+        f"throughput={lookups / elapsed:.1f}/s peak_rss={peak:.0f}MB stats={fetcher.stats()}"
+    )
+
+
+async def main(lookups: int, concurrency: int, latency: int):
+    SelectorsService.load_all_selectors("app/selectors")
+    handler = DutchieHandler()
+    StubStorefront.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubStorefront)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_port}"
+
+    http_fetcher = HttpFetcher(max_connections=concurrency)
+    await run_tier("http", http_fetcher, handler, stub_url + PRODUCT_PATH, lookups, concurrency, include_children=False)
+    await http_fetcher.close()
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch()
+        browser_fetcher = StubBrowserFetcher(browser, stub_url)
+        await run_tier("browser", browser_fetcher, handler, "https://dutchie.com" + PRODUCT_PATH, lookups, concurrency, include_children=True)
+        await browser.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=int, default=80)
+    args = parser.parse_args()
+    asyncio.run(main(args.lookups, args.concurrency, args.latency))
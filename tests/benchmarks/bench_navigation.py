@@ -0,0 +1,87 @@
+"""
+Time to ready of the navigation readiness strategies on a page emulating a storefront: the
+app renders the product once its API response arrives, while trackers and images hold the
+load event back.
+
+    python -m tests.benchmarks.bench_navigation --runs 20 --api-latency 150 --asset-latency 1500
+
+Each run reports how long navigation took and whether the product data was available when
+it returned (rendered for the selector strategies, captured for the response one).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from playwright.async_api import async_playwright
+from app.utils.navigation import NavigationReadiness
+from app.utils.response_capture import ResponseCapture
+
+PAGE = """
+<html><head>
+<script async src="https://bench.local/tracker.js"></script>
+</head><body>
+<div id="root"></div>
+<img src="https://bench.local/hero.jpg"><img src="https://bench.local/logo.png">
+<script>
+fetch("/graphql?operationName=FilteredProducts").then(response => response.json()).then(data => {
+    const product = data.data.filteredProducts.products[0];
+    document.getElementById("root").innerHTML = `<h1 data-testid="product-name">${product.Name}</h1>`;
+});
+</script>
+</body></html>
+"""
+PRODUCTS = {"data": {"filteredProducts": {"products": [{"cName": "blue-dream", "Name": "Blue Dream"}]}}}
+
+STRATEGIES = {
+    "load": {"wait_until": "load"},
+    "domcontentloaded": {"wait_until": "domcontentloaded"},
+    "selector": {"wait_until": "domcontentloaded", "ready": {"selector": "h1[data-testid='product-name']"}},
+    "response": {"wait_until": "commit", "ready": {"response": "product"}},
+}
+
+
+async def main(runs: int, api_latency: int, asset_latency: int):
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch()
+        context = await browser.new_context()
+
+        async def serve(route):
+            url = route.request.url
+            if "/graphql" in url:
+                await asyncio.sleep(api_latency / 1000)
+                await route.fulfill(json=PRODUCTS)
+            elif url.endswith((".js", ".jpg", ".png")):
+                await asyncio.sleep(asset_latency / 1000)
+                await route.fulfill(body=b"", content_type="application/octet-stream")
+            else:
+                await route.fulfill(body=PAGE, content_type="text/html")
+
+        await context.route("https://bench.local/**", serve)
+        navigation = NavigationReadiness("bench", STRATEGIES)
+        response_capture = ResponseCapture("bench", {"product": {"url": "bench\\.local/graphql", "operation": "^FilteredProducts$"}})
+
+        for name in STRATEGIES:
+            durations, available = [], 0
+            for _ in range(runs):
+                page = await context.new_page()
+                capture = response_capture.attach(page)
+                started = time.perf_counter()
+                await navigation.goto(page, "https://bench.local/product/blue-dream", name, capture)
+                durations.append((time.perf_counter() - started) * 1000)
+                rendered = await page.locator("h1[data-testid='product-name']").count() > 0
+                available += rendered or bool(capture.payloads.get("product"))
+                await page.close()
+            print(f"{name:>16}: p50={statistics.median(durations):.0f}ms max={max(durations):.0f}ms product available={available}/{runs}")
+
+        print(f"navigation: {json.dumps(navigation.timings)}")
+        await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--api-latency", type=int, default=150)
+    parser.add_argument("--asset-latency", type=int, default=1500)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.api_latency, args.asset_latency))
@@ -0,0 +1,101 @@
+"""
+Latency of the fixed sleeps the handlers used to have against settle detection, on a page
+emulating each operation: an action sends an XHR whose response re-renders part of the page.
+
+    python -m tests.benchmarks.bench_settle --runs 20 --min-latency 50 --max-latency 600
+
+Each run reports how long the operation waited and whether the page was in its final
+state once the wait ended (a sleep too short for a slow backend reads stale content).
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from playwright.async_api import async_playwright
+from app.utils.settle import Settler, attribute_state, element_present
+
+PAGE = """
+<html><body>
+<button id="action">Action</button>
+<button id="continue" disabled>Continue</button>
+<ul id="result"></ul>
+<script>
+document.getElementById("action").addEventListener("click", async () => {
+    const response = await fetch("/api/action");
+    const items = await response.json();
+    const list = document.getElementById("result");
+    list.innerHTML = items.map(item => `<li class="option">${item}</li>`).join("");
+    document.getElementById("continue").disabled = false;
+});
+</script>
+</body></html>
+"""
+
+# Operation -> (fixed sleep it replaces in ms, settle predicate)
+OPERATIONS = {
+    "delete_item": (2000, None),
+    "click_continue": (3000, attribute_state("#continue", "disabled", present=False)),
+    "time_options": (1000, element_present("li.option")),
+}
+
+
+async def run_operation(page, settler: Settler, fixed_ms: int, until, use_settle: bool):
+    await page.goto("https://bench.local/")
+    settler.track(page)
+    started = time.perf_counter()
+    await page.click("#action")
+    if use_settle:
+        await settler.wait(page, max_wait=fixed_ms, until=until)
+    else:
+        await page.wait_for_timeout(fixed_ms)
+    waited = (time.perf_counter() - started) * 1000
+    complete = await page.locator("li.option").count() == 3
+    return waited, complete
+
+
+async def main(runs: int, min_latency: int, max_latency: int, quiet_ms: int):
+    rng = random.Random(7)
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch()
+        context = await browser.new_context()
+
+        async def serve(route):
+            if route.request.url.endswith("/api/action"):
+                await asyncio.sleep(route.request.frame.page.latency / 1000)
+                await route.fulfill(json=["10:00", "10:30", "11:00"])
+            else:
+                await route.fulfill(body=PAGE, content_type="text/html")
+
+        await context.route("https://bench.local/**", serve)
+        page = await context.new_page()
+        settler = Settler("bench", quiet_ms=quiet_ms)
+
+        for name, (fixed_ms, until) in OPERATIONS.items():
+            results = {False: [], True: []}
+            for _ in range(runs):
+                page.latency = rng.randint(min_latency, max_latency)
+                for use_settle in (False, True):
+                    results[use_settle].append(await run_operation(page, settler, fixed_ms, until, use_settle))
+
+            fixed = [waited for waited, _ in results[False]]
+            settled = [waited for waited, _ in results[True]]
+            print(
+                f"{name:>14}: sleep p50={statistics.median(fixed):.0f}ms "
+                f"settle p50={statistics.median(settled):.0f}ms max={max(settled):.0f}ms "
+                f"saved={statistics.mean(fixed) - statistics.mean(settled):.0f}ms/op "
+                f"complete sleep={sum(done for _, done in results[False])}/{runs} "
+                f"settle={sum(done for _, done in results[True])}/{runs}"
+            )
+        print(f"settler: {settler.stats()}")
+        await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--min-latency", type=int, default=50)
+    parser.add_argument("--max-latency", type=int, default=600)
+    parser.add_argument("--quiet-ms", type=int, default=250)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.min_latency, args.max_latency, args.quiet_ms))
@@ -0,0 +1,96 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, Mock
+from app.fetchers.base import VariationFetcher
+from app.fetchers.http_fetcher import HttpFetcher
+from app.handlers.dutchie_handler import DutchieHandler
+from app.services.selectors_service import SelectorsService
+from app.services.varaint_service import VariantService
+
+NEXT_DATA = {"props": {"pageProps": {"apolloState": {
+    "dispensary": {"filteredDispensaries": [{"name": "Green Leaf", "logoImage": "https://images.dutchie.com/logo.png"}]},
+    "product": {"filteredProducts": {"products": [
+        {"cName": "blue-dream", "Name": "Blue Dream", "Image": "https://images.dutchie.com/blue-dream.jpg", "Status": "Active",
+         "Options": ["1/8oz"], "recPrices": [35]},
+    ]}},
+}}}}
+PAGE = f'<html><body><div id="__next"></div><script id="__NEXT_DATA__" type="application/json">{json.dumps(NEXT_DATA)}</script></body></html>'
+
+
+class StubStorefront(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_GET(self):
+        self.connections.add(self.client_address)
+        status, body = (200, PAGE) if "/product/blue-dream" in self.path else (500, "upstream error")
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def storefront():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubStorefront)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def handler():
+    SelectorsService.load_all_selectors("app/selectors")
+    return DutchieHandler()
+
+
+def browser_tier(variations=None):
+    fetcher = Mock(spec=VariationFetcher)
+    fetcher.name = "browser"
+    fetcher.fetch = AsyncMock(return_value=variations or {"variations": {"rendered": True}})
+    return fetcher
+
+
+@pytest.mark.asyncio
+async def test_variations_from_embedded_page_json_over_one_connection(storefront, handler):
+    fetcher = HttpFetcher(timeout=2)
+    product_url = f"{storefront}/dispensary/green-leaf/product/blue-dream"
+    StubStorefront.connections.clear()
+    try:
+        first = await fetcher.fetch(handler, product_url)
+        second = await fetcher.fetch(handler, product_url)
+    finally:
+        await fetcher.close()
+
+    assert first == second == {"variations": {
+        "dispensary_name": "Green Leaf",
+        "dispensary_image_url": "https://images.dutchie.com/logo.png",
+        "product_name": "Blue Dream",
+        "product_image_url": "https://images.dutchie.com/blue-dream.jpg",
+        "variants": [{"variant_name": "1/8oz", "price": "$35.00"}],
+    }}
+    # The product and dispensary payloads come from one request, reusing the pooled connection
+    assert fetcher.requests == 2
+    assert len(StubStorefront.connections) == 1
+    assert fetcher.stats()["served"] == 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_falls_back_to_the_browser(storefront, handler):
+    fetcher = HttpFetcher(timeout=2)
+    browser = browser_tier()
+    service = VariantService(Mock(), Mock(get_bot_handler=Mock(return_value=handler)), [fetcher, browser])
+    try:
+        assert await service.product_variations(f"{storefront}/dispensary/green-leaf/product/gelato") == {"variations": {"rendered": True}}
+    finally:
+        await service.close()
+
+    browser.fetch.assert_awaited_once()
+    assert service.stats()["http"]["failed"] == 1
@@ -0,0 +1,135 @@
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from playwright.async_api import Error
+from app.handlers.dutchie_handler import DutchieHandler
+from app.services.selectors_service import SelectorsService
+from app.utils.response_capture import PayloadCapture
+
+ITEMS = [
+    {"item_name": "Blue Dream", "item_price": "$35.00", "item_quantity": "1"},
+    {"item_name": "Gelato", "item_price": "$20.00", "item_quantity": "2"},
+]
+
+
+@pytest.fixture(scope="module")
+def handler():
+    SelectorsService.load_all_selectors("app/selectors")
+    return DutchieHandler()
+
+
+def make_container(handler, item):
+    """
+    Cart item element answering the per-field queries of the fallback path.
+    """
+    fields = {handler.selectors["cart_verification"][field]: text for field, text in item.items()}
+
+    async def query_selector(selector):
+        return Mock(inner_text=AsyncMock(return_value=fields[selector]))
+
+    return Mock(query_selector=AsyncMock(side_effect=query_selector))
+
+
+async def fetch_cart(handler, page, containers):
+    with patch.object(handler, "navigate_to_url", AsyncMock(return_value=True)), \
+            patch.object(handler, "_cart_from_responses", AsyncMock(return_value=None)), \
+            patch.object(handler, "_click_on_cart", AsyncMock()), \
+            patch.object(handler, "_check_cart_empty", AsyncMock()), \
+            patch.object(handler, "_get_cart_item_containers", AsyncMock(return_value=containers)):
+        return await handler.fetch_cart_details(page, "https://dutchie.com/product/x")
+
+
+def make_page(evaluate):
+    page = Mock()
+    page.wait_for_selector = AsyncMock()
+    page.wait_for_load_state = AsyncMock()
+    page.evaluate = evaluate
+    page.query_selector = AsyncMock(return_value=Mock(inner_text=AsyncMock(return_value="$75.00")))
+    return page
+
+
+@pytest.mark.asyncio
+async def test_cart_scraped_in_one_evaluate(handler):
+    containers = [make_container(handler, item) for item in ITEMS]
+    page = make_page(AsyncMock(return_value=[dict(item) for item in ITEMS]))
+
+    assert await fetch_cart(handler, page, containers) == {"cart_items": ITEMS, "subtotal": "75.00"}
+    page.evaluate.assert_awaited_once()
+    assert all(container.query_selector.await_count == 0 for container in containers)
+
+
+@pytest.mark.asyncio
+async def test_cart_scraped_element_by_element_on_failure(handler):
+    containers = [make_container(handler, item) for item in ITEMS]
+    page = make_page(AsyncMock(side_effect=Error("Execution context was destroyed")))
+
+    assert await fetch_cart(handler, page, containers) == {"cart_items": ITEMS, "subtotal": "75.00"}
+    assert [container.query_selector.await_count for container in containers] == [3, 3]
+
+
+@pytest.mark.asyncio
+async def test_order_type_sections_scraped_and_timed(handler):
+    page = make_page(AsyncMock(side_effect=[
+        [{"section": [{"types": [{"label": "Cash", "type": "radio", "disabled": False}, {"label": "Debit", "type": None, "disabled": True}], "options": []}]}],
+        [{"address": None, "apartment": "Apt"}],
+    ]))
+    timings = {}
+    with patch.object(handler, "_fetch_schedules", AsyncMock(return_value={})), \
+            patch.object(handler, "fetch_medical_section_details", AsyncMock(return_value=[])):
+        data, medical = await handler._fetch_order_type_data(page, "pickup", timings)
+
+    assert data == {
+        "Payment_details": [{"label": "Cash", "type": "radio"}, {"label": "Debit (disabled)", "type": "text"}],
+        "Address_Details": [{"label": "Apt", "type": "input"}],
+    }
+    assert set(timings) == {"pickup.payment_details", "pickup.address_details", "pickup.scheduled_orders", "pickup.medical_details"}
+
+
+@pytest.mark.asyncio
+async def test_variations_read_from_captured_responses(handler):
+    page = make_page(AsyncMock())
+    page.goto = AsyncMock()
+    capture = handler.response_capture.attach(page)
+    capture.payloads = {
+        "product": [{"data": {"filteredProducts": {"products": [{
+            "cName": "blue-dream", "Name": "Blue Dream", "Image": "https://images.dutchie.com/blue-dream.jpg", "Status": "Active",
+            "Options": ["1/8oz", "1/4oz"], "recPrices": [35, 65], "recSpecialPrices": [30, None], "special": True,
+        }]}}}],
+        "dispensary": [{"data": {"filteredDispensaries": [{"name": "Green Leaf", "logoImage": "https://images.dutchie.com/logo.png"}]}}],
+    }
+    with patch.object(handler.modal_watcher, "install", AsyncMock()), patch.object(capture, "reset"):
+        variations = await handler.get_variations(page, "https://dutchie.com/dispensary/green-leaf/product/blue-dream")
+
+    assert variations == {"variations": {
+        "dispensary_name": "Green Leaf",
+        "dispensary_image_url": "https://images.dutchie.com/logo.png",
+        "product_name": "Blue Dream",
+        "product_image_url": "https://images.dutchie.com/blue-dream.jpg",
+        "variants": [
+            {"variant_name": "1/8oz", "price": "$30.00", "msrp": "$35.00"},
+            {"variant_name": "1/4oz", "price": "$65.00"},
+        ],
+    }}
+    page.goto.assert_awaited_once_with("https://dutchie.com/dispensary/green-leaf/product/blue-dream", wait_until="commit")
+    page.wait_for_load_state.assert_not_awaited()
+    page.evaluate.assert_not_awaited()
+
+
+def dutchie_cart(*names):
+    return {"data": {"checkout": {"items": [{"product": {"Name": name}, "option": "1/8oz", "price": 35, "quantity": 1} for name in names]}}}
+
+
+@pytest.mark.asyncio
+async def test_added_item_scraped_when_captured_cart_misses_it(handler):
+    page = make_page(AsyncMock(return_value=[{"item_name": "Blue Dream", "product_variant": "1/8oz", "item_price": "$35.00", "item_quantity": "1"}]))
+    page.wait_for_selector = AsyncMock(return_value=Mock(query_selector=AsyncMock(return_value=Mock(inner_text=AsyncMock(return_value="Green Leaf")))))
+    # The page-load cart, then a cart response of the add to cart not (yet) holding the product
+    capture = PayloadCapture(payloads={"cart": [dutchie_cart("Blue Dream")]})
+    cart_mark = capture.mark("cart")
+    capture.add("cart", dutchie_cart("Gelato"))
+
+    with patch.object(handler, "_check_cart_empty", AsyncMock()), \
+            patch.object(handler, "_get_cart_item_containers", AsyncMock(return_value=[Mock()])):
+        cart_details = await handler._match_cart_item(page, capture, "Blue Dream", None, cart_mark)
+
+    assert cart_details == {"dispensary_name": "Green Leaf", "item_name": "Blue Dream", "item_price": "$35.00", "item_quantity": "1"}
+    page.evaluate.assert_awaited_once()
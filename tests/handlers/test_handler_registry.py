@@ -0,0 +1,51 @@
+import copy
+import pytest
+from app.handlers.dutchie_handler import DutchieHandler
+from app.handlers.handler_registry import HandlerRegistry
+from app.services.selectors_service import SelectorsService
+
+
+class BrokenHandler(DutchieHandler):
+    bot_name = "broken"
+
+
+@pytest.fixture(scope="module")
+def registry():
+    SelectorsService.load_all_selectors("app/selectors")
+    return HandlerRegistry()
+
+
+def test_handlers_shared_and_indexed_by_domain(registry):
+    handler = registry.get_bot_handler("https://dutchie.com/dispensary/green-leaf/product/blue-dream")
+    assert handler is registry.get_bot_handler("https://www.dutchie.com/dispensary/other/product/og-kush")
+    assert handler is registry.get_bot_handler("dutchie.com/dispensary/green-leaf")
+    assert registry.get_bot_handler("https://www.iheartjane.com/stores/42/green-leaf/products/1337/blue-dream").bot_name == "iheartjane"
+
+    for url in ("https://notdutchie.com/product/x", "https://dutchie.com.evil.io/product/x", "not a url"):
+        with pytest.raises(ValueError):
+            registry.get_bot_handler(url)
+
+    with pytest.raises(AttributeError):
+        handler.selectors = {}
+
+
+def test_selectors_validated_and_resolved(registry):
+    assert registry.handlers["dutchie"].navigation.strategy("add_to_cart")["ready"]["selector"] == \
+        SelectorsService.get_selectors("dutchie", "add_to_cart")["prod_name"]
+    assert SelectorsService.get_selectors("dutchie")["navigation"]["add_to_cart"]["ready"]["selector"][0] != "$"
+
+    broken = copy.deepcopy(SelectorsService.get_selectors("dutchie"))
+    broken["bot_name"], broken["domains"] = "broken", []
+    del broken["selectors"]["add_to_cart"]["prod_name"]
+    SelectorsService._selectors["broken"] = broken
+    try:
+        with pytest.raises(ValueError, match="'domains' must be.*section 'add_to_cart' misses prod_name"):
+            registry.register(BrokenHandler)
+
+        broken["domains"] = ["broken.example"]
+        broken["selectors"]["add_to_cart"]["prod_name"] = "h1"
+        broken["navigation"] = {"variations": {"ready": {"selector": "$variant.missing"}}}
+        with pytest.raises(ValueError, match="navigation references a missing selector"):
+            registry.register(BrokenHandler)
+    finally:
+        del SelectorsService._selectors["broken"]
@@ -0,0 +1,119 @@
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from playwright.async_api import TimeoutError
+from app.handlers.iheartjane_handler import IHeartJaneHandler
+from app.services.selectors_service import SelectorsService
+
+PRODUCT_URL = "https://www.iheartjane.com/stores/42/green-leaf/products/1337/blue-dream"
+PRODUCT = {
+    "product_id": 1337, "name": "Blue Dream", "image_urls": ["https://images.iheartjane.com/blue-dream.png"],
+    "available_weights": ["eighth ounce", "quarter ounce"],
+    "price_eighth_ounce": 40, "discounted_price_eighth_ounce": 32, "price_quarter_ounce": 75,
+}
+STORE = {"store": {"name": "Green Leaf", "photo": "https://images.iheartjane.com/green-leaf.png", "medical": False,
+                   "store_payment_options": ["cash", "debit_card"]}}
+
+
+class Handler(IHeartJaneHandler):
+    # The v2 checkout is not implemented for iHeartJane yet
+    async def _place_order_details_v2(self, page, checkout_options):
+        pass
+
+
+@pytest.fixture(scope="module")
+def handler():
+    SelectorsService.load_all_selectors("app/selectors")
+    return Handler()
+
+
+def make_page():
+    page = Mock()
+    page.goto = AsyncMock()
+    page.wait_for_load_state = AsyncMock()
+    page.wait_for_selector = AsyncMock()
+    return page
+
+
+@pytest.mark.asyncio
+async def test_variations_read_from_algolia_hits(handler):
+    page = make_page()
+    capture = handler.response_capture.attach(page)
+    capture.payloads = {
+        "product": [{"results": [{"hits": [{"product_id": 7, "name": "Gelato"}, PRODUCT]}]}],
+        "store": [STORE],
+    }
+    served = dict(handler.response_capture.served.get("variations", {"responses": 0, "dom": 0}))
+    with patch.object(handler.modal_watcher, "install", AsyncMock()), patch.object(capture, "reset"):
+        variations = await handler.get_variations(page, PRODUCT_URL)
+
+    assert variations["variations"]["dispensary_name"] == "Green Leaf"
+    assert variations["variations"]["product_image_url"] == "https://images.iheartjane.com/blue-dream.png"
+    assert variations["variations"]["variants"] == [
+        {"variant_name": "1/8oz", "price": "$32.00", "msrp": "$40.00"},
+        {"variant_name": "1/4oz", "price": "$75.00"},
+    ]
+    page.wait_for_load_state.assert_not_awaited()
+    assert handler.response_capture.served["variations"]["responses"] == served["responses"] + 1
+
+
+@pytest.mark.asyncio
+async def test_cart_read_without_opening_the_drawer(handler):
+    page = make_page()
+    capture = handler.response_capture.attach(page)
+    capture.payloads = {"cart": [{"cart": {"products": [
+        {"name": "Blue Dream", "price_id": "eighth ounce", "count": 2, "price_eighth_ounce": 40, "discounted_price_eighth_ounce": 32},
+        {"name": "Pre-roll", "price_id": "each", "count": 1, "price_each": 12.5},
+    ]}}]}
+    with patch.object(handler, "navigate_to_url", AsyncMock(return_value=True)), \
+            patch.object(handler, "_click_on_cart", AsyncMock()) as click_on_cart:
+        cart = await handler.fetch_cart_details(page, PRODUCT_URL)
+
+    assert cart == {
+        "cart_items": [
+            {"item_name": "Blue Dream", "item_price": "$64.00", "item_quantity": "2"},
+            {"item_name": "Pre-roll", "item_price": "$12.50", "item_quantity": "1"},
+        ],
+        "subtotal": "76.50",
+    }
+    click_on_cart.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_empty_captured_cart_confirmed_in_the_drawer(handler):
+    page = make_page()
+    capture = handler.response_capture.attach(page)
+    # Fetched before the session was restored, the drawer still shows the item
+    capture.payloads = {"cart": [{"cart": {"products": []}}]}
+    page.evaluate = AsyncMock(return_value=[{"item_name": "Blue Dream", "item_price": "$64.00", "item_quantity": "2"}])
+    page.query_selector = AsyncMock(return_value=None)
+    with patch.object(handler, "navigate_to_url", AsyncMock(return_value=True)), \
+            patch.object(handler, "_click_on_cart", AsyncMock()) as click_on_cart, \
+            patch.object(handler, "_check_cart_empty", AsyncMock()) as check_cart_empty, \
+            patch.object(handler, "_get_cart_item_containers", AsyncMock(return_value=[Mock()])):
+        cart = await handler.fetch_cart_details(page, PRODUCT_URL)
+
+    assert cart == {"cart_items": [{"item_name": "Blue Dream", "item_price": "$64.00", "item_quantity": "2"}], "subtotal": "N/A"}
+    click_on_cart.assert_awaited_once()
+    check_cart_empty.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_checkout_options_from_responses_or_dom(handler):
+    page = make_page()
+    capture = handler.response_capture.attach(page)
+    capture.payloads = {
+        "store": [STORE],
+        "checkout": [{"reservation": {"pickup_slots": [{"label": "Today 10:00am - 10:30am"}], "consent_items": ["I will bring my ID"]}}],
+    }
+    options = await handler._fetch_checkout_options(page)
+    assert options["pickup_slots"] == [{"label": "Today 10:00am - 10:30am", "type": "select"}]
+    assert options["pickup_instructions"] == [{"label": "I will bring my ID", "type": "checkbox"}]
+    assert options["payment_details"] == [{"label": "Cash", "type": "radio"}, {"label": "Debit Card", "type": "radio"}]
+    page.wait_for_selector.assert_not_awaited()
+
+    # Without the reservation response the checkout steps are scraped
+    capture.payloads = {"store": [STORE]}
+    page.wait_for_selector = AsyncMock(side_effect=[TimeoutError("no pickup toggle"), None])
+    with patch.object(capture, "wait_for", AsyncMock(side_effect=[STORE["store"], None])):
+        assert await handler._fetch_checkout_options(page) == {"error": "Accordion content not found"}
+    assert handler.response_capture.served["checkout_options"]["dom"] >= 1
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from playwright.async_api import TimeoutError
+from app.handlers.base_handler import Outcome
+from app.handlers.dutchie_handler import DutchieHandler
+from app.services.selectors_service import SelectorsService
+
+
+class FakeLocator:
+    """
+    Element showing up `delay` seconds after the wait started, never if None.
+    """
+
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+        self.first = self
+
+    def filter(self, has_text=None):
+        return self
+
+    def locator(self, selector):
+        return FakeLocator(self.page, f"{self.selector} >> {selector}")
+
+    async def wait_for(self, state="visible", timeout=None):
+        delay = self.page.delays.get(self.selector)
+        if delay is None or delay * 1000 > timeout:
+            await asyncio.sleep(timeout / 1000)
+            raise TimeoutError(f"Timeout {timeout}ms exceeded waiting for {self.selector}")
+        await asyncio.sleep(delay)
+        self.page.visible.add(self.selector)
+
+    async def is_visible(self):
+        return self.selector in self.page.visible
+
+    async def inner_text(self):
+        return f"text of {self.selector}"
+
+    async def dispatch_event(self, event, timeout=None):
+        self.page.clicked.append(self.selector)
+        self.page.delays.update(self.page.after_click)
+
+
+class FakePage:
+    def __init__(self, delays, visible=(), after_click=None):
+        self.delays = delays
+        self.visible = set(visible)
+        self.after_click = after_click or {}
+        self.clicked = []
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+
+@pytest.fixture(scope="module")
+def handler():
+    SelectorsService.load_all_selectors("app/selectors")
+    return DutchieHandler()
+
+
+@pytest.fixture(scope="module")
+def add_to_cart(handler):
+    return handler.selectors["add_to_cart"]
+
+
+@pytest.mark.asyncio
+async def test_first_outcome_wins_without_waiting_for_the_others(handler):
+    page = FakePage({"#drawer": 0.01, "#error": 0.5})
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    outcome = await handler._race_outcomes(page, [Outcome("added", "#drawer"), Outcome("error", "#error", "Failed")], timeout=2000)
+    assert outcome == "added"
+    assert loop.time() - started < 0.2
+
+
+@pytest.mark.asyncio
+async def test_error_outcome_raises(handler):
+    page = FakePage({"#drawer": 0.3, "#limit": 0.01})
+    with pytest.raises(HTTPException) as exc:
+        await handler._race_outcomes(page, [Outcome("added", "#drawer"), Outcome("limit", "#limit", "Limit reached: {}")])
+    assert exc.value.status_code == 400
+    assert exc.value.detail["message"] == "Limit reached: text of #limit"
+
+
+@pytest.mark.asyncio
+async def test_nothing_showing_up_times_out(handler):
+    page = FakePage({})
+    assert await handler._race_outcomes(page, [Outcome("added", "#drawer"), Outcome("error", "#error", "Failed")], timeout=50) is None
+
+
+@pytest.mark.asyncio
+async def test_error_visible_with_success_wins(handler):
+    # The drawer opened but the error toast is already on screen too
+    page = FakePage({"#drawer": 0.01}, visible={"#error"})
+    with pytest.raises(HTTPException):
+        await handler._race_outcomes(page, [Outcome("added", "#drawer"), Outcome("error", "#error", "Failed")], timeout=500)
+
+
+@pytest.mark.asyncio
+async def test_bag_check_continues_through_closed_but_open_modal(handler, add_to_cart):
+    page = FakePage(
+        {add_to_cart["closed_but_modal_selector"]: 0.01},
+        after_click={add_to_cart["bag_check_selector"]: 0.01},
+    )
+    await handler._bag_check(page)
+    assert page.clicked == [f"{add_to_cart['closed_but_modal_selector']} >> {add_to_cart['closed_but_modal_selector_continue']}"]
+    assert add_to_cart["bag_check_selector"] in page.visible
+
+
+@pytest.mark.asyncio
+async def test_out_of_stock_product_page(handler, add_to_cart):
+    page = FakePage({add_to_cart["out_of_stock_selector"]: 0.01, add_to_cart["click_add_to_cart"]: 0.2})
+    with pytest.raises(HTTPException) as exc:
+        await handler._check_product_page(page, "add_to_cart", check_not_found=True)
+    assert exc.value.status_code == 422
@@ -1,6 +1,11 @@
+import asyncio
+import uuid
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, Mock
+from app.repositories.cart_lock import CartLockManager, advisory_key
 from app.services.add_cart_service import AddCartService
+from app.utils.admission import AdmissionController
+from tests.repositories.test_cart_lock import make_engine
 
 
 @pytest.fixture
@@ -68,3 +73,35 @@ async def test_add_to_cart_failure(cart_service):
 
     assert result["status"] == "error"
     assert result["message"] == "max quantity 10"
+
+
+@pytest.mark.asyncio
+async def test_admission_slot_taken_once_holding_the_cart():
+    held = {}
+    psql_repo = Mock(cart_locks=CartLockManager(make_engine(held), wait_timeout=5, poll_interval=0.01))
+    controller = AdmissionController(limit=2, queue_size=4, queue_timeout=5)
+    cart_service = AddCartService(psql_repo, AsyncMock(), AsyncMock(), controller)
+    release = asyncio.Event()
+
+    async def add_to_cart(psql_session, cart_id, product_url, product_variant, quantity):
+        assert advisory_key(cart_id) in held
+        await release.wait()
+        return {"product_id": product_url}
+
+    cart_service._add_to_cart = add_to_cart
+    cart_id = uuid.uuid4()
+    adds = [
+        asyncio.create_task(cart_service.add_to_cart(None, cart_id, url, None, 1))
+        for url in ("http://example.com/a", "http://example.com/b", "http://example.com/a")
+    ]
+    await asyncio.sleep(0.01)
+
+    # The second add waits on the cart and the third shares the first's outcome, neither holds a slot
+    assert controller.stats()["active"] == 1
+    assert controller.stats()["queue_depth"] == 0
+
+    release.set()
+    assert await asyncio.gather(*adds) == [{"product_id": "http://example.com/a"}, {"product_id": "http://example.com/b"}, {"product_id": "http://example.com/a"}]
+    assert controller.stats()["admitted"] == 2
+    assert held == {}
+    assert psql_repo.cart_locks.stats()["coalesced"] == 1
@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.utils.admission import AdmissionController
+
+
+async def hold(controller, release: asyncio.Event, operation="variations"):
+    async with controller.admit(operation):
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_requests_over_limit_wait_in_order():
+    controller = AdmissionController(limit=1, queue_size=4, queue_timeout=5)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    order = []
+
+    async def queued(name):
+        async with controller.admit():
+            order.append(name)
+
+    waiters = [asyncio.create_task(queued(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    assert controller.stats()["queue_depth"] == 2
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["first", "second"]
+    stats = controller.stats()
+    assert stats["active"] == 0
+    assert stats["admitted"] == 3
+    assert stats["classes"]["read"]["admitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rejected_when_queue_is_full():
+    controller = AdmissionController(limit=1, queue_size=1, queue_timeout=5, classes={"catalog": {"weight": 1}})
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(hold(controller, release)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as error:
+        async with controller.admit("variations"):
+            pass
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) >= 1
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert controller.stats()["operations"]["variations"] == {"admitted": 2, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_rejected_when_wait_budget_exceeded():
+    controller = AdmissionController(limit=1, queue_size=4, queue_timeout=0.05)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as error:
+        async with controller.admit():
+            pass
+    assert error.value.status_code == 503
+    assert "Retry-After" in error.value.headers
+    assert controller.stats()["queue_depth"] == 0
+
+    release.set()
+    await holder
+    # The abandoned wait does not leak a slot
+    async with controller.admit():
+        assert controller.stats()["active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_freed_slots_shared_by_weight():
+    controller = AdmissionController(limit=1, queue_size=16, queue_timeout=5, starvation_after=60)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    order = []
+
+    async def queued(operation):
+        async with controller.admit(operation):
+            order.append(operation)
+
+    tasks = [asyncio.create_task(queued("variations")) for _ in range(4)]
+    tasks += [asyncio.create_task(queued("submit_order")) for _ in range(4)]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *tasks)
+
+    # Checkout gets most slots but catalog lookups are not shut out
+    assert order[:5].count("submit_order") == 4
+    assert order.index("variations") < 5
+
+
+@pytest.mark.asyncio
+async def test_class_concurrency_cap():
+    controller = AdmissionController(limit=4, queue_size=16, queue_timeout=5)
+    assert controller.classes["catalog"].max_concurrency == 2
+    release = asyncio.Event()
+    lookups = [asyncio.create_task(hold(controller, release, "variations")) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert controller.stats()["classes"]["catalog"]["active"] == 2
+    assert controller.stats()["classes"]["catalog"]["queue_depth"] == 1
+
+    # Checkout still gets in right away
+    async with controller.admit("submit_order") as waited:
+        assert waited == 0.0
+    release.set()
+    await asyncio.gather(*lookups)
+
+
+@pytest.mark.asyncio
+async def test_starving_request_promoted():
+    controller = AdmissionController(limit=1, queue_size=16, queue_timeout=5, starvation_after=0)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    order = []
+
+    async def queued(operation):
+        async with controller.admit(operation):
+            order.append(operation)
+
+    tasks = [asyncio.create_task(queued("variations"))]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(queued("submit_order")) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *tasks)
+
+    assert order[0] == "variations"
+    assert controller.stats()["classes"]["catalog"]["starvation_promotions"] == 1
@@ -0,0 +1,82 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.utils.asset_cache import AssetCache
+from app.utils.network_policy import NetworkPolicyStats, RequestRouter
+
+CHUNK_URL = "https://dutchie.com/_next/static/chunks/main-1a2b3c4d5e6f.js"
+IMMUTABLE_HEADERS = {"content-type": "application/javascript", "cache-control": "public, max-age=31536000, immutable"}
+
+
+def make_request(url, resource_type="script"):
+    request = Mock()
+    request.url = url
+    request.method = "GET"
+    request.resource_type = resource_type
+    request.is_navigation_request.return_value = False
+    return request
+
+
+@pytest.mark.asyncio
+async def test_put_then_get(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=1024)
+    assert await cache.get(CHUNK_URL) is None
+    assert await cache.put(CHUNK_URL, 200, {**IMMUTABLE_HEADERS, "content-encoding": "gzip"}, b"console.log(1)")
+
+    status, headers, body = await cache.get(CHUNK_URL)
+    assert status == 200
+    assert body == b"console.log(1)"
+    assert "content-encoding" not in headers
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["bytes_saved"] == len(body)
+
+
+@pytest.mark.asyncio
+async def test_uncacheable_responses_skipped(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=1024)
+    assert not await cache.put(CHUNK_URL, 200, {"cache-control": "no-store"}, b"a")
+    assert not await cache.put(CHUNK_URL, 404, IMMUTABLE_HEADERS, b"a")
+    assert not await cache.put(CHUNK_URL, 200, {**IMMUTABLE_HEADERS, "vary": "Cookie"}, b"a")
+    assert not await cache.put("https://dutchie.com/app.js", 200, {}, b"a")
+    assert not cache.is_cacheable(make_request("https://dutchie.com/app.js"))
+    assert not cache.is_cacheable(make_request(CHUNK_URL, resource_type="fetch"))
+    assert cache.is_cacheable(make_request(CHUNK_URL))
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_persistence(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=10)
+    first = "https://cdn.example.com/a.11111111.css"
+    second = "https://cdn.example.com/b.22222222.css"
+    third = "https://cdn.example.com/c.33333333.css"
+    await cache.put(first, 200, IMMUTABLE_HEADERS, b"aaaa")
+    await cache.put(second, 200, IMMUTABLE_HEADERS, b"bbbb")
+    await cache.get(first)
+    await cache.put(third, 200, IMMUTABLE_HEADERS, b"cccc")
+
+    assert await cache.get(second) is None
+    assert cache.stats()["evictions"] == 1
+    cache.flush()
+
+    reopened = AssetCache(str(tmp_path), max_bytes=10)
+    assert reopened.stats()["entries"] == 2
+    assert (await reopened.get(third))[2] == b"cccc"
+
+
+@pytest.mark.asyncio
+async def test_router_serves_assets_from_cache(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=1024)
+    router = RequestRouter(NetworkPolicyStats(), asset_cache=cache)
+
+    response = AsyncMock()
+    response.status = 200
+    response.headers = IMMUTABLE_HEADERS
+    response.body.return_value = b"chunk"
+    miss_route = AsyncMock()
+    miss_route.fetch.return_value = response
+    await router.handle(miss_route, make_request(CHUNK_URL))
+    miss_route.fulfill.assert_awaited_once_with(response=response)
+
+    hit_route = AsyncMock()
+    await router.handle(hit_route, make_request(CHUNK_URL))
+    hit_route.fetch.assert_not_awaited()
+    assert hit_route.fulfill.await_args.kwargs["body"] == b"chunk"
@@ -0,0 +1,45 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from playwright.async_api import Error
+from app.config import Config
+from app.utils.playwright_utils import PlaywrightUtils
+
+
+@pytest.fixture
+def remote_config():
+    with patch.object(Config, "BROWSER_WS_ENDPOINTS", ["ws://first:3000/", "ws://second:3000/"]), \
+            patch.object(Config, "BROWSER_CONNECT_MODE", "playwright"), \
+            patch.object(Config, "BROWSER_CONNECT_RETRIES", 2):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_connects_to_browser_servers_in_turn(remote_config):
+    utils = PlaywrightUtils()
+    utils.playwright_instance = Mock()
+    utils.playwright_instance.chromium.connect = AsyncMock()
+
+    await utils._launch_browser(["--uni-browser-slot=1-0"])
+    await utils._launch_browser(["--uni-browser-slot=1-1"])
+
+    calls = utils.playwright_instance.chromium.connect.await_args_list
+    assert [call.args[0] for call in calls] == ["ws://first:3000/", "ws://second:3000/"]
+    launch_options = json.loads(calls[0].kwargs["headers"]["x-playwright-launch-options"])
+    assert launch_options["args"] == ["--uni-browser-slot=1-0"]
+
+
+@pytest.mark.asyncio
+async def test_connect_retried_until_server_is_back(remote_config):
+    utils = PlaywrightUtils()
+    utils.playwright_instance = Mock()
+    browser = Mock()
+    utils.playwright_instance.chromium.connect = AsyncMock(side_effect=[Error("refused"), Error("refused"), browser])
+
+    with patch("app.utils.playwright_utils.asyncio.sleep", new=AsyncMock()):
+        assert await utils._launch_browser([]) is browser
+
+    utils.playwright_instance.chromium.connect = AsyncMock(side_effect=Error("refused"))
+    with patch("app.utils.playwright_utils.asyncio.sleep", new=AsyncMock()):
+        with pytest.raises(Error):
+            await utils._launch_browser([])
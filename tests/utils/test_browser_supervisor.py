@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.utils.browser_supervisor import BrowserSupervisor
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def close(self):
+        self.handlers["close"](self)
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.handlers = {}
+
+    def is_connected(self):
+        return self.connected
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def new_context(self, **kwargs):
+        return FakeContext(self)
+
+    async def close(self):
+        self.connected = False
+
+    def crash(self):
+        self.connected = False
+        self.handlers["disconnected"](self)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def launched():
+    return []
+
+
+@pytest.fixture
+def launcher(launched):
+    async def launch(extra_args):
+        browser = FakeBrowser()
+        launched.append(browser)
+        return browser
+    return launch
+
+
+@pytest.mark.asyncio
+async def test_contexts_spread_across_browsers(launcher, launched):
+    supervisor = BrowserSupervisor(launcher, instances=2, health_interval=0)
+    await supervisor.start()
+    first = await supervisor.new_context()
+    second = await supervisor.new_context()
+    assert first.browser is not second.browser
+    assert len(launched) == 2
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_browser_retired_after_max_contexts(launcher, launched):
+    supervisor = BrowserSupervisor(launcher, instances=1, max_contexts_per_browser=2, health_interval=0)
+    await supervisor.start()
+    first = await supervisor.new_context()
+    second = await supervisor.new_context()
+    await settle()
+
+    # A replacement is running while the retired browser drains its contexts
+    assert len(launched) == 2
+    assert supervisor.is_stale(second)
+    third = await supervisor.new_context()
+    assert third.browser is launched[1]
+
+    await first.close()
+    await second.close()
+    await settle()
+    assert not launched[0].is_connected()
+    assert supervisor.stats()["retired_by_contexts"] == 1
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_crashed_browser_restarted(launcher, launched):
+    supervisor = BrowserSupervisor(launcher, instances=1, health_interval=0)
+    await supervisor.start()
+    launched[0].crash()
+    await settle()
+
+    assert len(launched) == 2
+    assert supervisor.primary_browser() is launched[1]
+    assert supervisor.stats()["restarts"] == 1
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_browser_retired_when_rss_exceeds_limit(launcher, launched):
+    supervisor = BrowserSupervisor(launcher, instances=1, rss_limit_mb=100, health_interval=0)
+    await supervisor.start()
+    with patch.object(BrowserSupervisor, "_measure_rss", return_value=200 * 1024 * 1024):
+        await supervisor.check_health()
+    await settle()
+
+    assert supervisor.stats()["retired_by_rss"] == 1
+    assert supervisor.primary_browser() is launched[1]
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_rss_not_measured_for_remote_or_unfound_browsers(launcher, launched):
+    supervisor = BrowserSupervisor(launcher, instances=1, rss_limit_mb=100, health_interval=0, measure_rss=False)
+    await supervisor.start()
+    with patch.object(BrowserSupervisor, "_find_browser_pid") as find_browser_pid:
+        await supervisor.check_health()
+    find_browser_pid.assert_not_called()
+    assert supervisor.stats()["rss_measured"] is False
+    assert supervisor.stats()["browsers"][0]["rss_mb"] is None
+    await supervisor.stop()
+
+    # The marker matches no local process: looked up once, not on every health check
+    supervisor = BrowserSupervisor(launcher, instances=1, rss_limit_mb=100, health_interval=0)
+    await supervisor.start()
+    with patch.object(BrowserSupervisor, "_find_browser_pid", return_value=None) as find_browser_pid:
+        await supervisor.check_health()
+        await supervisor.check_health()
+    assert find_browser_pid.call_count == 1
+    assert supervisor.stats()["browsers"][0]["rss_mb"] is None
+    assert supervisor.stats()["retired_by_rss"] == 0
+    await supervisor.stop()
@@ -0,0 +1,118 @@
+import uuid
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.utils.cart_sessions import CartSessionCache
+
+STORED = {"codec": "zlib+base64/v1", "data": "eJyrVkrOz0nNTVWyUlDKTU0pSUktKlHSUcpMSQUA"}
+UPDATED = {"cookies": [{"name": "cart", "value": "2", "domain": "dutchie.com"}], "origins": []}
+
+
+def make_session_parts():
+    context = AsyncMock()
+    page = Mock()
+    page.is_closed.return_value = False
+    return context, page
+
+
+async def open_session(cache, cart_id, stored=STORED):
+    context, page = make_session_parts()
+    session = await cache.register(cart_id, context, page, stored)
+    await cache.release(session)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_session_reused_while_storage_matches():
+    cache = CartSessionCache(max_sessions=4)
+    cart_id = uuid.uuid4()
+    session = await open_session(cache, cart_id)
+
+    reused = await cache.acquire(cart_id, dict(STORED))
+    assert reused is session and reused.uses == 1
+    # A concurrent operation on the same cart does not share the page
+    assert await cache.acquire(cart_id, STORED) is None
+    cache.persisted(cart_id, reused.context, UPDATED)
+    await cache.release(reused)
+
+    assert await cache.acquire(cart_id, UPDATED) is session
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["busy"] == 1
+    await cache.stop()
+
+
+@pytest.mark.asyncio
+async def test_session_dropped_when_cart_changed_elsewhere():
+    cache = CartSessionCache(max_sessions=4)
+    cart_id = uuid.uuid4()
+    session = await open_session(cache, cart_id)
+
+    assert await cache.acquire(cart_id, UPDATED) is None
+    session.context.close.assert_awaited_once()
+    assert cache.stats()["invalidated"] == 1
+    assert cache.stats()["sessions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_save_from_another_context_retires_session():
+    cache = CartSessionCache(max_sessions=4)
+    cart_id = uuid.uuid4()
+    reader = await cache.register(cart_id, *make_session_parts(), STORED)
+    writer = await cache.register(cart_id, *make_session_parts(), STORED)
+    assert reader.tracked and not writer.tracked
+
+    cache.persisted(cart_id, writer.context, UPDATED)
+    await cache.release(writer)
+    await cache.release(reader)
+    writer.context.close.assert_awaited_once()
+    reader.context.close.assert_awaited_once()
+    assert await cache.acquire(cart_id, UPDATED) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_operation_closes_session():
+    cache = CartSessionCache(max_sessions=4)
+    cart_id = uuid.uuid4()
+    session = await cache.register(cart_id, *make_session_parts(), STORED)
+    await cache.release(session, failed=True)
+    session.context.close.assert_awaited_once()
+    assert cache.stats()["sessions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_idle_session_evicted():
+    cache = CartSessionCache(max_sessions=2)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    oldest = await open_session(cache, first)
+    await open_session(cache, second)
+    # Touching the oldest one makes the second the eviction candidate
+    await cache.release(await cache.acquire(first, STORED))
+
+    busy = await cache.register(third, *make_session_parts(), STORED)
+    assert cache.stats()["evicted"] == 1
+    assert await cache.acquire(second, STORED) is None
+    oldest.context.close.assert_not_awaited()
+
+    # Sessions in use are never evicted, the budget is enforced again once they are released
+    in_use = await cache.acquire(first, STORED)
+    await cache.register(uuid.uuid4(), *make_session_parts(), STORED)
+    assert cache.stats()["sessions"] == 3
+    await cache.release(busy)
+    assert cache.stats()["sessions"] == 2
+    await cache.release(in_use)
+    await cache.stop()
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_expire():
+    cache = CartSessionCache(max_sessions=4, idle_ttl=60)
+    cart_id = uuid.uuid4()
+    session = await open_session(cache, cart_id)
+
+    with patch("app.utils.cart_sessions.time.monotonic", return_value=session.last_used + 30):
+        await cache.sweep()
+    assert cache.stats()["sessions"] == 1
+
+    with patch("app.utils.cart_sessions.time.monotonic", return_value=session.last_used + 61):
+        await cache.sweep()
+    session.context.close.assert_awaited_once()
+    assert cache.stats()["expired"] == 1
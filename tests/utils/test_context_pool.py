@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+from app.utils.context_pool import ContextPool
+
+
+def make_context():
+    context = AsyncMock()
+    page = AsyncMock()
+    page.is_closed = Mock(return_value=False)
+    context.new_page.return_value = page
+    context.pages = [page]
+    context.storage_state.return_value = {"cookies": [], "origins": []}
+    return context
+
+
+@pytest.fixture
+def context_factory():
+    return AsyncMock(side_effect=lambda: make_context())
+
+
+@pytest.mark.asyncio
+async def test_start_pre_creates_contexts(context_factory):
+    pool = ContextPool(context_factory, size=3)
+    await pool.start()
+    assert context_factory.await_count == 3
+    assert pool.stats()["idle"] == 3
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_lease_reuses_and_resets_context(context_factory):
+    pool = ContextPool(context_factory, size=1)
+    await pool.start()
+
+    async with pool.lease() as pooled:
+        first_context = pooled.context
+    await asyncio.sleep(0)
+    await asyncio.gather(*pool._background)
+
+    async with pool.lease() as pooled:
+        assert pooled.context is first_context
+    first_context.clear_cookies.assert_awaited()
+    assert context_factory.await_count == 1
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_lease_applies_storage_state(context_factory):
+    pool = ContextPool(context_factory, size=1)
+    storage_state = {
+        "cookies": [{"name": "session", "value": "abc", "domain": "dutchie.com", "path": "/"}],
+        "origins": [{"origin": "https://dutchie.com", "localStorage": [{"name": "cart", "value": "1"}]}],
+    }
+    async with pool.lease(storage_state=storage_state) as pooled:
+        pooled.context.add_cookies.assert_awaited_once_with(storage_state["cookies"])
+        script = pooled.page.add_init_script.await_args.kwargs["script"]
+        assert "https://dutchie.com" in script
+        assert pooled.origins == {"https://dutchie.com"}
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_lease_times_out_when_pool_is_exhausted(context_factory):
+    pool = ContextPool(context_factory, size=1, lease_timeout=0.05)
+    async with pool.lease():
+        with pytest.raises(HTTPException) as exc_info:
+            async with pool.lease():
+                pass
+    assert exc_info.value.status_code == 503
+    assert pool.stats()["lease_timeouts"] == 1
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_context_recycled_after_max_uses(context_factory):
+    pool = ContextPool(context_factory, size=1, max_uses=1)
+    async with pool.lease() as pooled:
+        first_context = pooled.context
+    await asyncio.sleep(0)
+    await asyncio.gather(*pool._background)
+
+    first_context.close.assert_awaited_once()
+    assert pool.stats()["recycled"] == 1
+    assert pool.stats()["idle"] == 1
+    await pool.stop()
@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from playwright.async_api import Error
+from app.utils.dom_extractor import DomExtractor, resolve_field_map
+
+BOT_SELECTORS = {
+    "extraction": {
+        "cart_items": {
+            "item_name": "$cart_verification.item_name",
+            "item_price": {"selector": "p", "contains": "$"},
+            "price": {"selector": "$variant.price_selectors.variant", "fallback": {"selector": "$variant.price_selectors.non_variant", "scope": "page"}},
+        }
+    },
+    "selectors": {
+        "cart_verification": {"item_name": ".item__Name"},
+        "variant": {"price_selectors": {"variant": "span.bold", "non_variant": "div.price"}},
+    },
+}
+
+
+def test_field_map_references_resolved():
+    fields = resolve_field_map(BOT_SELECTORS["extraction"]["cart_items"], BOT_SELECTORS["selectors"])
+    assert fields == {
+        "item_name": ".item__Name",
+        "item_price": {"selector": "p", "contains": "$"},
+        "price": {"selector": "span.bold", "fallback": {"selector": "div.price", "scope": "page"}},
+    }
+
+
+@pytest.mark.asyncio
+async def test_records_extracted_in_one_round_trip():
+    extractor = DomExtractor("test", {"cart_items": {"item_name": ".item__Name"}})
+    page = Mock()
+    page.evaluate = AsyncMock(return_value=[{"item_name": "A"}, {"item_name": "B"}])
+    items = [Mock(), Mock()]
+
+    assert await extractor.extract(page, "cart_items", items) == [{"item_name": "A"}, {"item_name": "B"}]
+    page.evaluate.assert_awaited_once()
+    assert page.evaluate.await_args.args[1] == [items, {"item_name": ".item__Name"}]
+    assert extractor.counters["cart_items"] == {"extracted": 1, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_missing_or_failing_extraction_falls_back():
+    extractor = DomExtractor.for_bot("test-fallback", BOT_SELECTORS, enabled=True)
+    page = Mock()
+    page.evaluate = AsyncMock(side_effect=Error("SyntaxError: 'p:has-text('$')' is not a valid selector"))
+
+    assert await extractor.extract(page, "cart_items", []) is None
+    assert await extractor.extract(page, "variations") is None
+    assert extractor.counters["cart_items"] == {"extracted": 0, "failed": 1}
+    assert not DomExtractor.for_bot("test-disabled", BOT_SELECTORS, enabled=False).supports("cart_items")
+
+
+@pytest.mark.asyncio
+async def test_section_timings_recorded():
+    extractor = DomExtractor("test-sections")
+    timings = {}
+
+    async def section(value):
+        return value
+
+    assert await extractor.timed(timings, "customer_info", section(1)) == 1
+    await extractor.timed(timings, "pickup.payment_details", section(2))
+    extractor.record_sections("checkout_options", timings)
+    extractor.record_sections("checkout_options", {"customer_info": 10.0})
+
+    customer_info = extractor.sections["checkout_options"]["customer_info"]
+    assert set(timings) == {"customer_info", "pickup.payment_details"}
+    assert customer_info["count"] == 2 and customer_info["max_ms"] == 10.0
@@ -0,0 +1,63 @@
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.utils.metrics import RequestMetrics, TimedQueuePool, count_http_exception, render_metrics
+from app.utils.step_timing import StepTimer
+
+
+def samples(exposition: str):
+    parsed = {}
+    for line in exposition.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            parsed[name] = float(value)
+    return parsed
+
+
+def test_request_latency_per_route_template():
+    request_metrics = RequestMetrics()
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def record(request: Request, call_next):
+        return await request_metrics.dispatch(request, call_next)
+
+    @app.get("/carts/{cart_id}")
+    async def get_cart(cart_id: str):
+        if cart_id == "missing":
+            raise HTTPException(status_code=404)
+        return {"cart_id": cart_id}
+
+    client = TestClient(app)
+    for cart_id in ("a", "b", "missing"):
+        client.get(f"/carts/{cart_id}")
+    client.get("/nowhere")
+
+    parsed = samples(render_metrics(request_metrics))
+    assert parsed['http_request_duration_seconds_count{method="GET",route="/carts/{cart_id}",status="200"}'] == 2
+    assert parsed['http_request_duration_seconds_bucket{method="GET",route="/carts/{cart_id}",status="200",le="+Inf"}'] == 2
+    assert parsed['http_request_duration_seconds_count{method="GET",route="/carts/{cart_id}",status="404"}'] == 1
+    assert parsed['http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}'] == 1
+    assert parsed["http_requests_in_flight"] == 0
+
+
+def test_steps_exceptions_and_pool_exposed(tmp_path):
+    timer = StepTimer.for_bot("test-metrics")
+    timer.record("dutchie.com", "bag_check", "ok", 30)
+    timer.record("dutchie.com", "bag_check", "ok", 700)
+    count_http_exception("test-metrics", 422)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}", poolclass=TimedQueuePool)
+    with engine.connect() as connection:
+        connection.execute(text("select 1"))
+
+    parsed = samples(render_metrics(RequestMetrics(), engine=engine, fetchers={"http": {"served": 3, "missed": 1, "failed": 2}}))
+    labels = 'bot="test-metrics",domain="dutchie.com",step="bag_check",outcome="ok"'
+    assert parsed[f'handler_step_duration_seconds_bucket{{{labels},le="0.05"}}'] == 1
+    assert parsed[f'handler_step_duration_seconds_bucket{{{labels},le="1"}}'] == 2
+    assert parsed[f"handler_step_duration_seconds_sum{{{labels}}}"] == 0.73
+    assert parsed['handler_http_exceptions_total{bot="test-metrics",status="422"}'] == 1
+    assert parsed['variation_fetches_total{tier="http",result="failed"}'] == 2
+    assert parsed["db_pool_size"] == 5
+    assert parsed["db_pool_checked_out"] == 0
+    assert parsed['db_pool_checkout_wait_seconds_bucket{le="+Inf"}'] == 1
@@ -0,0 +1,85 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock
+from playwright.async_api import Error, TimeoutError
+from app.utils.modal_watcher import ModalWatcher
+
+AGE_GATE = "div[data-testid='age-confirmation-modal']"
+# The watchers as shipped for Dutchie, plus one dismissed with a key press
+with open("app/selectors/dutchie.json") as selectors_file:
+    DUTCHIE_WATCHERS = {watcher["name"]: watcher for watcher in json.load(selectors_file)["modal_watchers"]}
+WATCHERS = [
+    DUTCHIE_WATCHERS["age_gate"],
+    DUTCHIE_WATCHERS["rewards_popup"],
+    {"name": "promo_banner", "modal": "div[role='dialog']:has-text('Sale')", "press": "Escape"},
+]
+
+
+def make_page():
+    page = Mock()
+    page.add_locator_handler = AsyncMock()
+    return page
+
+
+def make_overlay(page, click=None):
+    overlay = Mock()
+    overlay.page = page
+    overlay.locator.return_value.first.click = click or AsyncMock()
+    overlay.press = AsyncMock()
+    return overlay
+
+
+@pytest.mark.asyncio
+async def test_handlers_installed_once_per_page():
+    watcher = ModalWatcher("test", WATCHERS)
+    page = make_page()
+    await watcher.install(page)
+    await watcher.install(page)
+
+    assert page.add_locator_handler.await_count == 3
+    page.locator.assert_any_call(AGE_GATE)
+    # A rewards popup whose close button is not found must not hold up the checkout actions
+    rewards = page.add_locator_handler.await_args_list[1]
+    assert rewards.kwargs == {"no_wait_after": True, "times": 1}
+
+    assert watcher.covers("age_gate")
+    assert not watcher.covers("closed_but_open")
+
+
+@pytest.mark.asyncio
+async def test_dismissals_counted():
+    watcher = ModalWatcher("test", WATCHERS)
+    page = make_page()
+    await watcher.install(page)
+    dismiss_age_gate, dismiss_rewards, dismiss_promo = (call.args[1] for call in page.add_locator_handler.await_args_list)
+
+    overlay = make_overlay(page)
+    await dismiss_age_gate(overlay)
+    overlay.locator.assert_called_with("button[data-testid='age-restriction-yes']")
+    await dismiss_age_gate(make_overlay(page, click=AsyncMock(side_effect=Error("detached"))))
+
+    rewards = make_overlay(page)
+    await dismiss_rewards(rewards)
+    rewards.locator.assert_called_with(DUTCHIE_WATCHERS["rewards_popup"]["dismiss"])
+    rewards.press.assert_not_awaited()
+    # No close button in the popup: counted as a failure, the popup is left alone
+    await dismiss_rewards(make_overlay(page, click=AsyncMock(side_effect=TimeoutError("no close button"))))
+
+    promo = make_overlay(page)
+    await dismiss_promo(promo)
+    promo.press.assert_awaited_once_with("Escape", timeout=2000)
+
+    assert watcher.counters == {
+        "age_gate": {"dismissed": 1, "failed": 1},
+        "rewards_popup": {"dismissed": 1, "failed": 1},
+        "promo_banner": {"dismissed": 1, "failed": 0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_disabled_watcher_covers_nothing():
+    watcher = ModalWatcher.for_bot("test-disabled", {"modal_watchers": WATCHERS}, enabled=False)
+    page = make_page()
+    await watcher.install(page)
+    page.add_locator_handler.assert_not_awaited()
+    assert not watcher.covers("age_gate")
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from playwright.async_api import TimeoutError
+from app.utils.navigation import NavigationReadiness
+from app.utils.response_capture import ResponseCapture
+
+SELECTORS = {
+    "navigation": {
+        "variations": {"wait_until": "commit", "ready": {"response": "product"}, "timeout": 500},
+        "add_to_cart": {"wait_until": "domcontentloaded", "ready": {"selector": "$add_to_cart.prod_name"}, "timeout": 500},
+    },
+    "selectors": {"add_to_cart": {"prod_name": "h1[data-testid='product-name']"}},
+}
+
+
+def make_page(wait_for_selector=None):
+    page = Mock()
+    page.goto = AsyncMock()
+    page.wait_for_load_state = AsyncMock()
+    page.wait_for_selector = wait_for_selector or AsyncMock()
+    return page
+
+
+def test_strategies_resolved_with_defaults():
+    navigation = NavigationReadiness.for_bot("test-navigation", SELECTORS)
+    assert navigation.strategy("add_to_cart")["ready"] == {"selector": "h1[data-testid='product-name']"}
+    assert navigation.strategy("cart_deletion") == {"wait_until": "domcontentloaded"}
+    assert navigation.strategy("checkout") == {"wait_until": "load"}
+
+
+@pytest.mark.asyncio
+async def test_ready_selector_or_load_fallback():
+    navigation = NavigationReadiness("test", SELECTORS["navigation"])
+    navigation.strategies["add_to_cart"]["ready"]["selector"] = "h1"
+
+    page = make_page()
+    assert await navigation.goto(page, "https://dutchie.com/product/x", "add_to_cart")
+    page.goto.assert_awaited_once_with("https://dutchie.com/product/x", wait_until="domcontentloaded")
+    page.wait_for_selector.assert_awaited_once_with("h1", timeout=500)
+    page.wait_for_load_state.assert_not_awaited()
+
+    page = make_page(AsyncMock(side_effect=TimeoutError("h1 not found")))
+    assert not await navigation.goto(page, "https://dutchie.com/product/x", "add_to_cart")
+    page.wait_for_load_state.assert_awaited_once_with("load")
+
+    assert navigation.timings["add_to_cart"]["count"] == 2
+    assert navigation.timings["add_to_cart"]["fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ready_on_first_captured_response():
+    navigation = NavigationReadiness("test", SELECTORS["navigation"])
+    capture = ResponseCapture("test", {"product": {"url": "graphql"}}).attach(Mock())
+
+    async def respond():
+        await asyncio.sleep(0.05)
+        capture.add("product", {"products": []})
+
+    page = make_page()
+    responding = asyncio.ensure_future(respond())
+    assert await navigation.goto(page, "https://dutchie.com/product/x", "variations", capture)
+    await responding
+    page.goto.assert_awaited_once_with("https://dutchie.com/product/x", wait_until="commit")
+    page.wait_for_load_state.assert_not_awaited()
+
+    # Without the response the page is waited for, and the handler does not wait for it again
+    capture.reset()
+    assert not await navigation.goto(page, "https://dutchie.com/product/x", "variations", capture)
+    page.wait_for_load_state.assert_awaited_once_with("load")
+    assert await capture.wait_for("product", lambda payload: payload) is None
@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.utils.network_policy import NetworkPolicy, NetworkPolicyStats, RequestRouter
+
+POLICY_CONFIG = {
+    "blocked_resource_types": ["image", "media", "font"],
+    "blocked_domains": ["google-analytics.com"],
+    "blocked_url_patterns": [r"/collect\?"],
+    "estimated_bytes": {"image": 1000, "default": 10},
+    "operations": {
+        "checkout": {"blocked_resource_types": ["media"]},
+        "cart_verification": {"allowed_domains": ["dutchie.com"]},
+        "cart_deletion": {"enabled": False},
+    },
+}
+
+
+def make_request(url, resource_type, navigation=False):
+    request = Mock()
+    request.url = url
+    request.resource_type = resource_type
+    request.is_navigation_request.return_value = navigation
+    request.frame.parent_frame = None
+    return request
+
+
+def test_block_by_resource_type_domain_and_pattern():
+    policy = NetworkPolicy.from_config("test-bot", POLICY_CONFIG, "variations")
+    assert policy.block_reason("https://images.dutchie.com/a.png", "image") == "resource_type:image"
+    assert policy.block_reason("https://www.google-analytics.com/g/x.js", "script") == "domain_blocked"
+    assert policy.block_reason("https://dutchie.com/collect?v=1", "xhr") == "url_pattern"
+    assert policy.block_reason("https://dutchie.com/graphql", "fetch") is None
+
+
+def test_operation_overrides():
+    checkout = NetworkPolicy.from_config("test-bot", POLICY_CONFIG, "checkout")
+    assert checkout.block_reason("https://images.dutchie.com/a.png", "image") is None
+    assert checkout.block_reason("https://cdn.example.com/a.mp4", "media") == "resource_type:media"
+
+    cart = NetworkPolicy.from_config("test-bot", POLICY_CONFIG, "cart_verification")
+    assert cart.block_reason("https://api.dutchie.com/cart", "fetch") is None
+    assert cart.block_reason("https://cdn.other.com/lib.js", "script") == "domain_not_allowed"
+
+    assert NetworkPolicy.from_config("test-bot", POLICY_CONFIG, "cart_deletion") is None
+    assert NetworkPolicy.from_config("no-policy-bot", None, "variations") is None
+
+
+@pytest.mark.asyncio
+async def test_router_aborts_blocked_requests_and_records_stats():
+    stats = NetworkPolicyStats()
+    router = RequestRouter(stats)
+    router.policy = NetworkPolicy.from_config("test-bot", POLICY_CONFIG, "add_to_cart")
+
+    blocked_route = AsyncMock()
+    await router.handle(blocked_route, make_request("https://dutchie.com/a.png", "image"))
+    blocked_route.abort.assert_awaited_once()
+
+    allowed_route = AsyncMock()
+    await router.handle(allowed_route, make_request("https://dutchie.com/graphql", "fetch"))
+    allowed_route.fallback.assert_awaited_once()
+
+    document_route = AsyncMock()
+    await router.handle(document_route, make_request("https://dutchie.com/collect?x", "document", navigation=True))
+    document_route.fallback.assert_awaited_once()
+
+    snapshot = stats.snapshot()["test-bot:add_to_cart"]
+    assert snapshot["requests"] == 2
+    assert snapshot["blocked"] == 1
+    assert snapshot["bytes_skipped_estimate"] == 1000
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.utils.response_capture import ResponseCapture
+
+CAPTURES = {
+    "product": {"url": r"dutchie\.com/graphql", "operation": "^FilteredProducts$"},
+    "dispensary": {"url": r"dutchie\.com/graphql", "operation": "^ConsumerDispensaries$", "persistent": True},
+}
+
+
+def make_response(url, payload=None, post_data=None):
+    response = Mock(url=url)
+    response.json = AsyncMock(return_value=payload)
+    response.request.post_data_json = post_data
+    return response
+
+
+def make_page():
+    page = Mock()
+    page.listeners = []
+    page.on = lambda event, listener: page.listeners.append(listener)
+    return page
+
+
+def test_match_on_operation_name():
+    capture = ResponseCapture("test", CAPTURES)
+    assert capture.match(make_response("https://dutchie.com/graphql?operationName=FilteredProducts&variables=%7B%7D")) == "product"
+    assert capture.match(make_response("https://dutchie.com/graphql", post_data={"operationName": "ConsumerDispensaries"})) == "dispensary"
+    assert capture.match(make_response("https://dutchie.com/graphql?operationName=GetMenuSections")) is None
+    assert capture.match(make_response("https://cdn.dutchie.com/app.js")) is None
+    assert not ResponseCapture.for_bot("test-disabled", {"response_capture": {"captures": CAPTURES}}, enabled=False).enabled
+
+
+@pytest.mark.asyncio
+async def test_wait_for_returns_on_arrival():
+    capture = ResponseCapture("test", CAPTURES, timeout=2000)
+    page = make_page()
+    page_capture = capture.attach(page)
+    assert capture.attach(page) is page_capture
+
+    async def respond():
+        await asyncio.sleep(0.05)
+        for listener in page.listeners:
+            listener(make_response("https://dutchie.com/graphql?operationName=FilteredProducts", {"products": []}))
+            listener(make_response("https://dutchie.com/graphql?operationName=FilteredProducts", {"products": [{"Name": "Blue Dream"}]}))
+
+    responding = asyncio.ensure_future(respond())
+    started = asyncio.get_running_loop().time()
+    product = await page_capture.wait_for("product", lambda payload: payload["products"][0])
+    await responding
+
+    assert product == {"Name": "Blue Dream"}
+    assert asyncio.get_running_loop().time() - started < 1
+    assert capture.counters["product"] == {"captured": 2, "used": 1, "missed": 0}
+
+
+@pytest.mark.asyncio
+async def test_wait_for_times_out_and_reset_keeps_persistent_kinds():
+    capture = ResponseCapture("test", CAPTURES, timeout=2000)
+    page_capture = capture.attach(make_page())
+    page_capture.payloads = {"product": [{"products": []}], "dispensary": [{"name": "Green Leaf"}]}
+
+    assert await page_capture.wait_for("product", lambda payload: payload["products"][0], timeout=50) is None
+    assert capture.counters["product"]["missed"] == 1
+
+    page_capture.reset(route_change=True)
+    assert page_capture.payloads == {"dispensary": [{"name": "Green Leaf"}]}
+    page_capture.reset()
+    assert page_capture.payloads == {}
+
+
+@pytest.mark.asyncio
+async def test_wait_for_after_mark_skips_earlier_responses_still_read():
+    capture = ResponseCapture("test", {"cart": {"url": r"dutchie\.com/graphql", "operation": "Checkout"}}, timeout=2000)
+    page = make_page()
+    page_capture = capture.attach(page)
+
+    # The page-load cart is still being read when the mark is taken before the add to cart
+    read_slowly = asyncio.Event()
+    page_load = make_response("https://dutchie.com/graphql?operationName=Checkout")
+
+    async def slow_json():
+        await read_slowly.wait()
+        return {"items": []}
+
+    page_load.json = slow_json
+    page.listeners[0](page_load)
+    mark = page_capture.mark("cart")
+    assert mark == 1 and "cart" not in page_capture.payloads
+
+    read_slowly.set()
+    await asyncio.sleep(0.01)
+    page.listeners[0](make_response("https://dutchie.com/graphql?operationName=UpdateCheckout", {"items": ["Blue Dream"]}))
+
+    assert await page_capture.wait_for("cart", lambda payload: payload["items"], after=mark) == ["Blue Dream"]
+    assert page_capture.payloads["cart"] == [{"items": []}, {"items": ["Blue Dream"]}]
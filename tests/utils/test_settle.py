@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from playwright.async_api import Error
+from app.utils.settle import Settler, attribute_state, element_present
+
+
+class FakePage:
+    def __init__(self, results):
+        self.listeners = {}
+        self.evaluate = AsyncMock(side_effect=results)
+
+    def on(self, event, callback):
+        self.listeners[event] = callback
+
+    def emit(self, event, request):
+        self.listeners[event](request)
+
+
+def xhr():
+    request = Mock()
+    request.resource_type = "xhr"
+    return request
+
+
+@pytest.mark.asyncio
+async def test_settles_once_requests_are_done():
+    page = FakePage([{"settled": True, "elapsed": 250}])
+    settler = Settler("test", quiet_ms=10)
+    settler.track(page)
+    request = xhr()
+    page.emit("request", request)
+
+    async def respond():
+        await asyncio.sleep(0.05)
+        page.emit("requestfinished", request)
+
+    responding = asyncio.create_task(respond())
+    assert await settler.wait(page, max_wait=2000, until=element_present("li.time-option"))
+    await responding
+
+    # The DOM is only checked once the response is in
+    page.evaluate.assert_awaited_once()
+    args = page.evaluate.await_args.args[1]
+    assert args["quiet"] == 10 and args["predicate"] == {"selector": "li.time-option", "present": True}
+    assert settler.stats()["settled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_request_started_in_quiet_window_restarts_wait():
+    page = FakePage([{"settled": True, "elapsed": 10}, {"settled": True, "elapsed": 10}])
+    settler = Settler("test", quiet_ms=10)
+    settler.track(page)
+    request = xhr()
+
+    async def evaluate(script, args):
+        if page.evaluate.await_count == 1:
+            page.emit("request", request)
+            asyncio.get_running_loop().call_later(0.02, page.emit, "requestfailed", request)
+        return {"settled": True, "elapsed": 10}
+
+    page.evaluate.side_effect = evaluate
+    assert await settler.wait(page, max_wait=1000)
+    assert page.evaluate.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_wait_bounded_by_max():
+    page = FakePage([Error("Execution context was destroyed"), {"settled": False, "elapsed": 100}])
+    settler = Settler("test", quiet_ms=10, track_requests=False)
+    assert not await settler.wait(page, max_wait=100, until=attribute_state("button.continue", "disabled", present=False))
+    assert settler.stats()["timed_out"] == 1
+    assert "request" not in page.listeners
@@ -0,0 +1,64 @@
+import pytest
+from fastapi import HTTPException
+from playwright.async_api import TimeoutError
+from app.utils.step_timing import Histogram, StepTimer, collect_steps, instrument_steps, server_timing, set_step_domain
+
+
+class Handler:
+    bot_name = "test"
+    STEPS = {"navigate": "navigate", "bag_check": "bag_check"}
+
+    def __init__(self, step_timer: StepTimer):
+        self.step_timer = step_timer
+
+    async def navigate(self, url: str):
+        set_step_domain(url)
+        return "navigated"
+
+    async def bag_check(self, error: Exception):
+        raise error
+
+
+instrument_steps(Handler)
+
+
+def test_histogram_percentiles_within_precision():
+    histogram = Histogram()
+    for value_ms in range(1, 1001):
+        histogram.record(value_ms)
+
+    assert histogram.count == 1000
+    for percent in (50, 90, 99):
+        assert histogram.percentile(percent) == pytest.approx(percent * 10, rel=2 ** -histogram.precision)
+    assert histogram.percentile(100) == 1000
+    assert histogram.cumulative([100, 1000, 5000]) == [pytest.approx(100, abs=3), pytest.approx(1000, abs=3), 1000]
+    assert len(histogram.buckets) < 200
+
+
+@pytest.mark.asyncio
+async def test_steps_timed_with_outcome_and_summarized():
+    handler = Handler(StepTimer("test-steps"))
+    with collect_steps() as steps:
+        assert await handler.navigate("dutchie.com") == "navigated"
+        with pytest.raises(HTTPException):
+            await handler.bag_check(HTTPException(status_code=404))
+        with pytest.raises(TimeoutError):
+            await handler.bag_check(TimeoutError("bag"))
+
+    assert [(step["step"], step["outcome"]) for step in steps] == [
+        ("navigate", "ok"), ("bag_check", "http_404"), ("bag_check", "timeout"),
+    ]
+    assert set(handler.step_timer.histograms) == {
+        ("dutchie.com", "navigate", "ok"), ("dutchie.com", "bag_check", "http_404"), ("dutchie.com", "bag_check", "timeout"),
+    }
+    assert server_timing(steps).startswith("navigate;dur=")
+    assert server_timing(steps).count("bag_check") == 1
+
+
+@pytest.mark.asyncio
+async def test_disabled_timer_records_nothing():
+    handler = Handler(StepTimer("test-steps-disabled", enabled=False))
+    with collect_steps() as steps:
+        assert await handler.navigate("dutchie.com") == "navigated"
+    assert steps == []
+    assert handler.step_timer.histograms == {}
@@ -0,0 +1,55 @@
+from app.utils.storage_state_codec import CODEC_NAME, StorageStateCodec
+
+STORAGE_STATE = {
+    "cookies": [
+        {"name": "session", "value": "abc", "domain": ".dutchie.com", "path": "/"},
+        {"name": "_ga", "value": "GA1.2.3", "domain": ".google.com", "path": "/"},
+        {"name": "_fbp", "value": "fb.1.2", "domain": "facebook.com", "path": "/"},
+    ],
+    "origins": [
+        {"origin": "https://dutchie.com", "localStorage": [
+            {"name": "cart", "value": "{\"items\": [1, 2, 3]}"},
+            {"name": "ajs_anonymous_id", "value": "x" * 200},
+        ]},
+        {"origin": "https://www.googletagmanager.com", "localStorage": [{"name": "gtm", "value": "y" * 500}]},
+    ],
+}
+
+
+def make_codec(**kwargs):
+    return StorageStateCodec("test-bot", domains=["dutchie.com"], **kwargs)
+
+
+def test_keeps_only_bot_origins_and_keys():
+    codec = make_codec(local_storage_keys=["cart*"])
+    filtered = codec.filter(STORAGE_STATE)
+    assert [cookie["name"] for cookie in filtered["cookies"]] == ["session"]
+    assert filtered["origins"] == [{"origin": "https://dutchie.com", "localStorage": [STORAGE_STATE["origins"][0]["localStorage"][0]]}]
+
+
+def test_round_trip_and_plain_states_still_decoded():
+    codec = make_codec()
+    encoded = codec.encode(STORAGE_STATE)
+    assert encoded["codec"] == CODEC_NAME
+
+    decoded = StorageStateCodec.decode(encoded)
+    assert len(decoded["cookies"]) == 1
+    assert decoded["origins"][0]["localStorage"] == STORAGE_STATE["origins"][0]["localStorage"]
+
+    assert StorageStateCodec.decode(STORAGE_STATE) is STORAGE_STATE
+    assert StorageStateCodec.decode(None) is None
+    # Re-encoding an encoded state does not nest it
+    assert StorageStateCodec.decode(codec.encode(encoded)) == decoded
+
+
+def test_size_report():
+    codec = make_codec()
+    plain = StorageStateCodec.size_report(STORAGE_STATE, codec)
+    assert plain["codec"] is None
+    assert plain["stored_bytes"] == plain["decoded_bytes"]
+    assert plain["encoded_bytes"] < plain["stored_bytes"]
+
+    encoded = StorageStateCodec.size_report(codec.encode(STORAGE_STATE), codec)
+    assert encoded["codec"] == CODEC_NAME
+    assert encoded["stored_bytes"] == plain["encoded_bytes"]
+    assert codec.stored_bytes < codec.raw_bytes
@@ -0,0 +1,98 @@
+import json
+import httpx
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from app.utils.tracing import FileExporter, OtlpExporter, RatioSampler, Span, instrument_engine, traced, tracer
+
+
+class MemoryExporter:
+    name = "memory"
+
+    def __init__(self):
+        self.spans = []
+
+    async def export(self, spans):
+        self.spans.extend(spans)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def exporter():
+    exporter = MemoryExporter()
+    tracer.configure(exporter, RatioSampler(1.0))
+    yield exporter
+    tracer.configure(None, RatioSampler(1.0))
+
+
+@traced("Service.add_to_cart", ("cart_id", "product_url"))
+async def add_to_cart(cart_id, product_url, quantity):
+    with tracer.span("dutchie.bag_check", {"bot": "dutchie"}):
+        raise HTTPException(status_code=422, detail="Out of stock")
+
+
+@pytest.mark.asyncio
+async def test_nested_spans_inherit_request_attributes(exporter):
+    remote_parent = tracer.extract("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    with tracer.span("POST /carts/{cart_id}/add-product", remote_parent=remote_parent) as root:
+        with pytest.raises(HTTPException):
+            await add_to_cart("cart-1", "https://dutchie.com/dispensary/green-leaf/product/blue-dream", 1)
+    await tracer.flush()
+
+    step, service, route = exporter.spans
+    assert {span.trace_id for span in exporter.spans} == {"0af7651916cd43dd8448eb211c80319c"}
+    assert route.parent_id == "b7ad6b7169203331"
+    assert service.parent_id == root.span_id and step.parent_id == service.span_id
+    assert step.attributes == {"cart_id": "cart-1", "dispensary": "dutchie.com", "bot": "dutchie", "http.status_code": 422}
+    assert step.error is None
+
+
+@pytest.mark.asyncio
+async def test_unsampled_traces_record_nothing(exporter):
+    tracer.configure(exporter, RatioSampler(0.0))
+    with tracer.span("GET /variations") as root:
+        with tracer.span("variations.http") as child:
+            assert not child.recording and child.trace_id == root.trace_id
+    with tracer.span("GET /variations", remote_parent=tracer.extract("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")) as continued:
+        assert continued.recording
+    await tracer.flush()
+    assert [span.name for span in exporter.spans] == ["GET /variations"]
+
+
+@pytest.mark.asyncio
+async def test_sql_statements_traced_under_current_span(exporter, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tracing.db'}")
+    instrument_engine(engine)
+    with tracer.span("GET /carts/{cart_id}", {"cart_id": "cart-1"}) as root:
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+    await tracer.flush()
+
+    query = next(span for span in exporter.spans if span.name == "db.query")
+    assert query.parent_id == root.span_id
+    assert query.attributes["db.statement"] == "select 1"
+    assert query.attributes["cart_id"] == "cart-1"
+
+
+@pytest.mark.asyncio
+async def test_exporters(tmp_path):
+    span = Span("GET /carts/{cart_id}", "0af7651916cd43dd8448eb211c80319c", attributes={"http.method": "GET"})
+    span.end_ns = span.start_ns + 1000
+    spans = [span]
+
+    file_exporter = FileExporter(str(tmp_path / "traces" / "spans.jsonl"))
+    await file_exporter.export(spans)
+    assert json.loads((tmp_path / "traces" / "spans.jsonl").read_text())["name"] == "GET /carts/{cart_id}"
+
+    bodies = []
+    otlp_exporter = OtlpExporter(
+        "http://collector:4318/v1/traces", "uni-wtb",
+        transport=httpx.MockTransport(lambda request: bodies.append(json.loads(request.content)) or httpx.Response(200)),
+    )
+    await otlp_exporter.export(spans)
+    await otlp_exporter.close()
+    otlp_span = bodies[0]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["kind"] == 2 and otlp_span["status"] == {"code": 1}
+    assert otlp_span["attributes"] == [{"key": "http.method", "value": {"stringValue": "GET"}}]
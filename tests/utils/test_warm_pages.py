@@ -0,0 +1,97 @@
+import re
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.utils.warm_pages import WarmPagePool
+
+MENU = "https://dutchie.com/dispensary/cookies-harrison"
+OTHER_MENU = "https://dutchie.com/dispensary/other-store"
+
+
+class FakeHandler:
+    def __init__(self):
+        self.warm_up = AsyncMock()
+
+    def get_menu_url(self, url):
+        match = re.match(r"^(https://dutchie\.com/dispensary/[^/?#]+)", url)
+        return match.group(1) if match else None
+
+    def get_network_policy(self, operation):
+        return None
+
+
+class FakeHandlerFactory:
+    def __init__(self):
+        self.handler = FakeHandler()
+
+    def get_bot_handler(self, website_url):
+        if "dutchie.com" not in website_url:
+            raise ValueError(f"No bot handler available for the website: {website_url}")
+        return self.handler
+
+
+def make_context():
+    context = AsyncMock()
+    page = Mock()
+    page.is_closed.return_value = False
+    context.new_page.return_value = page
+    return context
+
+
+@pytest.fixture
+def handler_factory():
+    return FakeHandlerFactory()
+
+
+@pytest.fixture
+def context_factory():
+    return AsyncMock(side_effect=lambda policy: make_context())
+
+
+@pytest.mark.asyncio
+async def test_configured_dispensary_warmed_and_taken(context_factory, handler_factory):
+    pool = WarmPagePool(context_factory, handler_factory, hot_dispensaries=[MENU + "/products"])
+    await pool.refresh()
+    handler_factory.handler.warm_up.assert_awaited_once()
+    assert handler_factory.handler.warm_up.await_args.args[1] == MENU
+
+    warm_page = await pool.take(MENU + "/product/bat-sh-t")
+    assert warm_page is not None and warm_page.menu_url == MENU
+    assert await pool.take(OTHER_MENU + "/product/a") is None
+    assert await pool.take("https://unknown.com/product/a") is None
+
+    stats = pool.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_hot_dispensaries_learned_from_requests(context_factory, handler_factory):
+    pool = WarmPagePool(context_factory, handler_factory, max_pages=2, min_requests=2, half_life=0)
+    pool.record(OTHER_MENU + "/product/a")
+    assert pool.hot_menus() == []
+
+    pool.record(OTHER_MENU + "/product/b")
+    for _ in range(3):
+        pool.record(MENU + "/product/c")
+    assert pool.hot_menus() == [MENU, OTHER_MENU]
+
+    await pool.refresh()
+    assert pool.stats()["ready"] == 2
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_expired_pages_replaced_on_refresh(context_factory, handler_factory):
+    pool = WarmPagePool(context_factory, handler_factory, hot_dispensaries=[MENU], max_age=60)
+    await pool.refresh()
+    first = pool._pages[MENU]
+
+    with patch("app.utils.warm_pages.time.monotonic", return_value=first.warmed_at + 120):
+        assert await pool.take(MENU + "/product/a") is None
+        await pool.refresh()
+
+    first.context.close.assert_awaited()
+    assert pool._pages[MENU] is not first
+    assert pool.stats()["warmed"] == 2
+    await pool.stop()